@@ -2,20 +2,31 @@ from __future__ import annotations
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 from sklearn.decomposition import TruncatedSVD
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import normalize
 
 from sklearn.decomposition import TruncatedSVD
 from scipy import sparse
 from pathlib import Path
 import numpy as np
-import json, joblib
+import hashlib, json, joblib, os, struct, time
+from collections import Counter
 from datetime import datetime, timezone
+from itertools import islice
+from numbers import Integral
 
-from typing import Dict, List, Iterator, Any, Iterable, Optional
+from typing import Dict, List, Iterator, Any, Iterable, Optional, Sequence, Tuple
 from html import unescape
 from local_settings import settings
 
+STREAM_CHUNK_SIZE = 5000   # docs per block for the streaming fit/transform
+BUNDLE_FORMAT = 2          # Vectorizer.save default; load() reads 1 and 2
+SEARCH_ROW_CHUNK = 50000   # Vectorizer.search: doc rows per sparse product
+SEARCH_QUERY_CHUNK = 256   # Vectorizer.search: queries per sparse product
+ANALYZE_CHUNKS_PER_JOB = 4 # parallel fit_transform: chunks per worker, for load balance
+SILHOUETTE_SAMPLE = 10000  # k_means_on / kmeans_sweep: docs in a sampled silhouette
+
 
 class CorpusBuilder:
     """ 
@@ -24,43 +35,183 @@ class CorpusBuilder:
     We return a list of records -> list[dict]
     where the doc_ids has keys: 
         doc_id, doc_identifier, doc_title
+
+    Rows come through a named (server-side) cursor, itersize at a time.
+    With cache_path set, the first complete pass is also spilled to that file
+    (length-prefixed UTF-8 texts, doc_ids in a <cache_path>.doc_ids.json
+    sidecar) and every later pass -- or a later CorpusBuilder over the same
+    SELECT -- replays it from disk without touching Postgres. Delete the
+    file, change the SELECT, or pass refresh=True to re-read the database.
     """
-    def __init__(self, conn, select):
+    _LEN = struct.Struct("<I")
+    _NULL = 0xFFFFFFFF   # length marking a NULL text
+
+    def __init__(self, conn, select, *, cache_path: Optional[Path] = None, itersize: int = 1000,
+                 refresh: bool = False):
         self.conn = conn
         self.sql = select
+        self.itersize = itersize
+        self.cache_path: Optional[Path] = Path(cache_path) if cache_path else None
         self.doc_ids: list[dict[str]] = []
         self._pass = 0
+        self._complete = False   # doc_ids hold one whole pass
+        if refresh and self.cache_path is not None:   # drop an earlier run's spill; this one writes a new one
+            self._sidecar().unlink(missing_ok=True)
+            self.cache_path.unlink(missing_ok=True)
+        if self._cache_ready():
+            self.doc_ids = self._read_sidecar()["doc_ids"]
+            self._complete = True
     
     def __iter__(self) -> Iterator[str]:
         '''
         yield text, append metadata to self.doc_ids
         '''
         self._pass += 1
-        first_pass = (self._pass == 1)
+        if self._cache_ready():
+            yield from self._replay()
+            return
+        fill = not self._complete   # a pass abandoned part-way leaves doc_ids to the next one
+        if fill:
+            self.doc_ids = []
+        spill = self.cache_path is not None
+        out = self._open_spill() if spill else None
+        try:
+            with self.conn.cursor(name=f"corpus_builder_{id(self):x}_{self._pass}") as cur:
+                cur.itersize = self.itersize
+                cur.execute(self.sql)
+                for doc_id, identifier, title, text in cur:
+                    if fill:
+                        self.doc_ids.append({
+                            "doc_id": int(doc_id),
+                            "identifier": identifier,
+                            "title": unescape(title or ""),
+                        })
+                    if spill:
+                        self._write_text(out, text)
+                    yield text
+            self._complete = True
+            if spill:
+                out.close()
+                self._commit_spill(self.doc_ids)
+        finally:
+            if spill and not out.closed:   # pass abandoned part-way: no partial cache
+                out.close()
+                self._spill_tmp().unlink(missing_ok=True)
 
-        cur = self.conn.execute(self.sql)   # returns a cursor in psycopg3
-        while True:
-            rows = cur.fetchmany(1000)
-            if not rows:
-                break
-            for doc_id, identifier, title, text in rows:
-                if first_pass:
-                    self.doc_ids.append({
-                        "doc_id": int(doc_id),
-                        "identifier": identifier,
-                        "title": unescape(title or ""),
-                    })
-                yield text 
+    # ---------- replay cache ----------
+    def _sidecar(self) -> Path:
+        return self.cache_path.with_name(self.cache_path.name + ".doc_ids.json")
+
+    def _spill_tmp(self) -> Path:
+        return self.cache_path.with_name(self.cache_path.name + ".tmp")
+
+    def _read_sidecar(self) -> Dict[str, Any]:
+        return json.loads(self._sidecar().read_text(encoding="utf-8"))
+
+    def _cache_ready(self) -> bool:
+        if self.cache_path is None or not (self.cache_path.exists() and self._sidecar().exists()):
+            return False
+        return self._read_sidecar().get("sql") == self.sql
+
+    def _open_spill(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        return open(self._spill_tmp(), "wb")
+
+    def _write_text(self, out, text: Optional[str]) -> None:
+        if text is None:
+            out.write(self._LEN.pack(self._NULL))
+            return
+        data = text.encode("utf-8")
+        out.write(self._LEN.pack(len(data)))
+        out.write(data)
+
+    def _commit_spill(self, docs: List[Dict[str, Any]]) -> None:
+        """Texts into place first, sidecar last: the cache only counts as ready once both match the SELECT."""
+        os.replace(self._spill_tmp(), self.cache_path)
+        self._sidecar().write_text(
+            json.dumps({"sql": self.sql, "n_docs": len(docs), "doc_ids": docs}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+    def _replay(self) -> Iterator[Optional[str]]:
+        size = self._LEN.size
+        with open(self.cache_path, "rb") as f:
+            while True:
+                head = f.read(size)
+                if not head:
+                    break
+                (n,) = self._LEN.unpack(head)
+                yield None if n == self._NULL else f.read(n).decode("utf-8")
+
+
+class ColumnarDocIndex(Sequence):
+    """
+    doc_index stored as one array per field (ints as int64, everything else as
+    fixed-width unicode), so a format-2 bundle can memory-map it instead of
+    parsing JSON. Reads like the list of dicts it replaces: index[i]["title"].
+    """
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self._n = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> Optional["ColumnarDocIndex"]:
+        """Columns for records sharing one set of int/str fields; None if they don't (keep JSON)."""
+        if not records:
+            return None
+        keys = list(records[0])
+        columns = {}
+        for key in keys:
+            try:
+                values = [r[key] for r in records]
+            except (KeyError, TypeError):
+                return None
+            if all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in values):
+                columns[key] = np.asarray(values, dtype=np.int64)
+            elif all(isinstance(v, str) and not v.endswith("\0") for v in values):
+                columns[key] = np.asarray(values, dtype=str)
+            else:
+                return None
+        if any(len(r) != len(keys) for r in records):
+            return None
+        return cls(columns)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        return {key: col[i].item() for key, col in self.columns.items()}
+
+    def column(self, key: str) -> np.ndarray:
+        return self.columns[key]
 
 
 class Vectorizer:
-    """Thin wrapper around TfidfVectorizer with explicit save/load."""
-    def __init__(self, default_dir: Optional[Path] = None, **params):
-        self.params: Dict[str, Any] = params or settings["TFIDF"]
+    """
+    Thin wrapper around TfidfVectorizer with explicit save/load.
+    config is the settings dict to read TFIDF/BUNDLE/LSA/TFIDF_UPDATE from
+    (default: local_settings.settings); callers outside the repo root pass it in.
+    """
+    def __init__(self, default_dir: Optional[Path] = None, *, config: Optional[Dict[str, Any]] = None, **params):
+        self.config: Dict[str, Any] = config or settings
+        self.params: Dict[str, Any] = params or self.config["TFIDF"]
         self.default_dir: Optional[Path] = Path(default_dir) if default_dir else None
         self._sk = None          # fitted sklearn TfidfVectorizer
+        self._stale_rows = []    # [(start, stop, idf)] rows still weighted by an older idf (partial_update)
         self._x_csr = None       # csr_matrix of TF-IDF rows
-        self.doc_index: List[Dict[str, Any]] = []  # [{"doc_id", "identifier", "title"}, ...]
+        self._x_unit = None      # (source X, L2-normalized X) cached for search()
+        self._svd = None         # fitted TruncatedSVD behind the ANN index
+        self._lsa_svd = None     # cached LSA (Vectorizer.lsa): TruncatedSVD over X ...
+        self._lsa_z = None       # ... its doc vectors Z
+        self._lsa_info: Dict[str, Any] = {}   # ... and its manifest["lsa"] entry (key, x_hash, params)
+        self._x_digest = None    # (source X, sha1 of X) for the LSA cache key
+        self._ann = None         # AnnIndex over the LSA doc vectors
+        self._df = None          # per-term document frequencies behind idf_
+        self._idf_fit = None     # idf_ at the last full fit
+        self.fit_state: Dict[str, Any] = {}   # last full fit + drift since (partial_update)
+        self.doc_index: Sequence[Dict[str, Any]] = []  # [{"doc_id", "identifier", "title"}, ...]
 
     
     def feature_names(self) -> list[str]:
@@ -79,39 +230,63 @@ class Vectorizer:
         return self.doc_index
 
     def titles(self) -> List[str]:
-        return [r["title"] for r in self.doc_index]
+        return self._doc_field("title")
 
     def doc_ids(self) -> List[int]:
-        return [r["doc_id"] for r in self.doc_index]
+        return self._doc_field("doc_id")
 
     def identifiers(self) -> List[str]:
-        return [r["identifier"] for r in self.doc_index]
+        return self._doc_field("identifier")
+
+    def _doc_field(self, key: str) -> list:
+        if isinstance(self.doc_index, ColumnarDocIndex):
+            return self.doc_index.column(key).tolist()
+        return [r[key] for r in self.doc_index]
 
     # ---------- construction ----------
     @classmethod
-    def from_corpus(cls, corpus: Iterable[str], *, out_dir: Optional[Path] = None, docs: Optional[List[Dict[str, Any]]] = None, **params):
+    def from_corpus(cls, corpus: Iterable[str], *, out_dir: Optional[Path] = None, docs: Optional[List[Dict[str, Any]]] = None,
+                    streaming: bool = False, n_jobs: int = 1, config: Optional[Dict[str, Any]] = None, **params):
         """
         Fit on corpus and return an instance. Does not perform any I/O.
         Use .save(...) to persist artifacts.
+        streaming=True fits out-of-core (two passes over corpus, see fit_streaming).
+        n_jobs != 1 tokenizes in worker processes (see fit_transform).
         """
-        self = cls(default_dir=out_dir, **params)
-        self._fit_transform_inplace(corpus)
+        self = cls(default_dir=out_dir, config=config, **params)
+        if streaming or n_jobs != 1:
+            self._x_csr = self.fit_transform(corpus, streaming=streaming, n_jobs=n_jobs)
+        else:
+            self._fit_transform_inplace(corpus)
         if docs is not None:
             self.set_doc_index(docs)
         return self
 
     @classmethod
     def load(cls, bundle_dir: Path, *, strict: bool = True,
-             require_matrix: bool = False, require_index: bool = False):
+             require_matrix: bool = False, require_index: bool = False, mmap: bool = True,
+             config: Optional[Dict[str, Any]] = None):
         """
         strict=True  -> raise if vectorizer missing (recommended).
-        require_matrix/index -> also require X.npz / doc_index.json.
+        require_matrix/index -> also require the matrix / doc index files.
+        Format-2 bundles (manifest "format_version": 2) are memory-mapped
+        read-only unless mmap=False; format-1 bundles (X.npz, doc_index.json)
+        are read eagerly as before.
         """
         bundle_dir = Path(bundle_dir)
-        names = settings["BUNDLE"]
+        config = config or settings
+        names = config["BUNDLE"]
         vec_path = bundle_dir / names["vectorizer"]
-        x_path   = bundle_dir / names["x_csr"]
-        idx_path = bundle_dir / names["doc_index"]
+        mf_path  = bundle_dir / names["manifest"]
+        manifest = json.loads(mf_path.read_text(encoding="utf-8")) if mf_path.exists() else {}
+        version  = int(manifest.get("format_version", 1))
+        if version == 2:
+            x_path   = bundle_dir / names["x_indptr"]
+            columns  = manifest.get("doc_columns")   # absent: doc index kept as JSON
+            idx_path = bundle_dir / (names["doc_column"].format(column=columns[0]) if columns else names["doc_index"])
+        else:
+            x_path   = bundle_dir / names["x_csr"]
+            idx_path = bundle_dir / names["doc_index"]
 
         if strict and not vec_path.exists():
             raise FileNotFoundError(
@@ -119,7 +294,7 @@ class Vectorizer:
                 f"Expected bundle layout: {names}"
             )
 
-        self = cls(default_dir=bundle_dir)
+        self = cls(default_dir=bundle_dir, config=config)
 
         # Vectorizer is required (strict) or optional
         if vec_path.exists():
@@ -129,13 +304,38 @@ class Vectorizer:
         if require_matrix and not x_path.exists():
             raise FileNotFoundError(f"Missing matrix at {x_path}")
         if x_path.exists():
-            self._x_csr = sparse.load_npz(x_path)
+            self._x_csr = self._load_matrix_v2(bundle_dir, manifest, mmap, names) if version == 2 else sparse.load_npz(x_path)
 
         # Doc index: required/optional based on flags
         if require_index and not idx_path.exists():
             raise FileNotFoundError(f"Missing doc index at {idx_path}")
         if idx_path.exists():
-            self.doc_index = json.loads(idx_path.read_text(encoding="utf-8"))
+            if idx_path.suffix == ".json":
+                self.doc_index = json.loads(idx_path.read_text(encoding="utf-8"))
+            else:
+                mode = "r" if mmap else None
+                self.doc_index = ColumnarDocIndex({
+                    c: np.load(bundle_dir / names["doc_column"].format(column=c), mmap_mode=mode)
+                    for c in manifest["doc_columns"]
+                })
+
+        if (bundle_dir / names["df"]).exists():
+            self._df = np.load(bundle_dir / names["df"])
+        if (bundle_dir / names["idf_fit"]).exists():
+            self._idf_fit = np.load(bundle_dir / names["idf_fit"])
+        self.fit_state = dict(manifest.get("fit_state") or {})
+
+        # cached LSA, then the ANN index with its own SVD (svd.joblib)
+        if manifest.get("lsa") and (bundle_dir / names["lsa_components"]).exists():
+            mode = "r" if mmap else None
+            arrays = [np.load(bundle_dir / names[key], mmap_mode=mode) for key in LSA_FILES]
+            self._lsa_svd = _svd_from_arrays(manifest["lsa"]["params"], *arrays[:-1])
+            self._lsa_z = arrays[-1]
+            self._lsa_info = manifest["lsa"]
+        ann = manifest.get("ann")
+        if ann and (bundle_dir / names["svd"]).exists():
+            self._svd = joblib.load(bundle_dir / names["svd"])
+            self._ann = AnnIndex.load(bundle_dir, ann, mmap=mmap, names=names)
 
         # Sanity: if both present, rows must match
         if self._x_csr is not None and self.doc_index:
@@ -145,6 +345,13 @@ class Vectorizer:
 
         return self
 
+    @staticmethod
+    def _load_matrix_v2(bundle_dir: Path, manifest: Dict[str, Any], mmap: bool, names: Dict[str, str]) -> sparse.csr_matrix:
+        """CSR over the memory-mapped data/indices/indptr arrays (no copy)."""
+        mode = "r" if mmap else None
+        arrays = [np.load(bundle_dir / names[key], mmap_mode=mode) for key in ("x_data", "x_indices", "x_indptr")]
+        return sparse.csr_matrix(tuple(arrays), shape=tuple(manifest["x_shape"]), copy=False)
+
     # ---- transformer methods
     def fit(self, corpus: Iterable[str]):
         from sklearn.feature_extraction.text import TfidfVectorizer
@@ -155,30 +362,197 @@ class Vectorizer:
         assert self._sk is not None, "Vectorizer not fitted/loaded"
         return self._sk.transform(texts)
 
-    def fit_transform(self, corpus: Iterable[str]):
+    def fit_transform(self, corpus: Iterable[str], *, streaming: bool = False, chunk_size: int = STREAM_CHUNK_SIZE,
+                      n_jobs: int = 1):
         # single-pass fit+transform; does NOT store _x_csr unless you want to
+        # streaming=True: two passes over corpus, never holding it in memory (see fit_streaming)
+        # n_jobs != 1 (-1 = every core): tokenizing runs in worker processes; same output bit for bit
+        if streaming:
+            if iter(corpus) is corpus:
+                raise ValueError("streaming fit_transform reads corpus twice; pass a CorpusBuilder or list, not a generator")
+            self.fit_streaming(corpus, chunk_size=chunk_size, n_jobs=n_jobs)
+            return self.transform_streaming(corpus, chunk_size=chunk_size, n_jobs=n_jobs)
         from sklearn.feature_extraction.text import TfidfVectorizer
         self._sk = TfidfVectorizer(**self.params)
         texts = list(corpus)
         if not texts or not any(t.strip() for t in texts):
             raise ValueError("Corpus appears empty (no raw_text). Check your SELECT and iterator.")
 
-        X = self._sk.fit_transform(texts)
+        if n_jobs != 1:
+            X = self._fit_transform_parallel(texts, n_jobs, chunk_size)
+        else:
+            X = self._sk.fit_transform(texts)
+        self._reset_fit_state(len(texts))
         return X
 
+    def _fit_transform_parallel(self, texts: List[str], n_jobs: int, chunk_size: int):
+        """
+        TfidfVectorizer.fit_transform with the analysis (accent folding,
+        tokenizing, n-grams) split over worker processes. Each chunk comes back
+        as counts over its own terms; merged in corpus order they give the
+        matrix CountVectorizer._count_vocab builds, and the rest -- pruning,
+        idf, normalization -- is sklearn's own code.
+        """
+        from joblib import effective_n_jobs
+        from sklearn.feature_extraction.text import TfidfTransformer
+        sk = self._sk
+        if sk.vocabulary is not None:
+            raise ValueError("parallel fit learns the vocabulary; drop the fixed 'vocabulary' param")
+        sk._check_params()
+        sk._validate_ngram_range()
+        per_job = -(-len(texts) // (ANALYZE_CHUNKS_PER_JOB * effective_n_jobs(n_jobs)))
+        vocabulary, X = _merge_counts(_parallel_counts(self.params, texts, n_jobs, max(1, min(chunk_size, per_job))),
+                                      sk.dtype)
+        if sk.binary:
+            X.data.fill(1)
+
+        # as in CountVectorizer.fit_transform
+        n_doc = X.shape[0]
+        high = sk.max_df if isinstance(sk.max_df, Integral) else sk.max_df * n_doc
+        low = sk.min_df if isinstance(sk.min_df, Integral) else sk.min_df * n_doc
+        if high < low:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        if sk.max_features is not None:
+            X = sk._sort_features(X, vocabulary)
+        X = sk._limit_features(X, vocabulary, high, low, sk.max_features)
+        if isinstance(X, tuple):   # sklearn < 1.5 also returns the pruned terms
+            X = X[0]
+        if sk.max_features is None:
+            X = sk._sort_features(X, vocabulary)
+        sk.vocabulary_ = vocabulary
+        sk.fixed_vocabulary_ = False
+
+        # as in TfidfVectorizer.fit_transform
+        sk._tfidf = TfidfTransformer(norm=sk.norm, use_idf=sk.use_idf, smooth_idf=sk.smooth_idf,
+                                     sublinear_tf=sk.sublinear_tf)
+        sk._tfidf.fit(X)
+        return sk._tfidf.transform(X, copy=False)
+
+    # ---- out-of-core fit: two passes, corpus never materialized
+    def fit_streaming(self, corpus: Iterable[str], *, chunk_size: int = STREAM_CHUNK_SIZE, n_jobs: int = 1):
+        """
+        Fit the same vocabulary_ and idf_ as TfidfVectorizer(**params).fit(list(corpus)),
+        holding only the document frequencies: one pass counts per-term DF with
+        the vectorizer's own analyzer, then min_df/max_df/max_features are applied
+        the way CountVectorizer._limit_features does and idf_ is computed the way
+        TfidfTransformer.fit does.
+
+        corpus must be re-iterable (a CorpusBuilder, a list) if you go on to
+        transform_streaming it; a bare generator is consumed here.
+        n_jobs != 1 analyzes chunk_size docs at a time in worker processes.
+        """
+        from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+        sk = TfidfVectorizer(**self.params)
+        if sk.vocabulary is not None:
+            raise ValueError("fit_streaming learns the vocabulary; drop the fixed 'vocabulary' param")
+        sk._check_params()
+        sk._validate_ngram_range()
+        analyze = sk.build_analyzer()
+
+        df: Counter = Counter()
+        tf: Counter = Counter()   # only needed to rank terms for max_features
+        n_docs = 0
+        if n_jobs == 1:
+            for text in corpus:
+                terms = analyze(text)
+                df.update(set(terms))
+                if sk.max_features is not None:
+                    tf.update(set(terms) if sk.binary else terms)
+                n_docs += 1
+        else:
+            for chunk_terms, counts in _parallel_counts(self.params, corpus, n_jobs, chunk_size):
+                chunk_df = np.bincount(counts.indices, minlength=len(chunk_terms))
+                df.update(dict(zip(chunk_terms, chunk_df.tolist())))
+                if sk.max_features is not None:
+                    chunk_tf = chunk_df if sk.binary else np.asarray(counts.sum(axis=0)).ravel()
+                    tf.update(dict(zip(chunk_terms, chunk_tf.tolist())))
+                n_docs += counts.shape[0]
+        if not df:
+            raise ValueError("Corpus appears empty (no raw_text). Check your SELECT and iterator.")
+
+        terms = sorted(df)   # CountVectorizer._sort_features order
+        dfs = np.fromiter((df[t] for t in terms), dtype=np.int64, count=len(terms))
+        high = sk.max_df if isinstance(sk.max_df, Integral) else sk.max_df * n_docs
+        low = sk.min_df if isinstance(sk.min_df, Integral) else sk.min_df * n_docs
+        if high < low:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        mask = (dfs <= high) & (dfs >= low)
+        if sk.max_features is not None and mask.sum() > sk.max_features:
+            tfs = np.fromiter((tf[t] for t in terms), dtype=sk.dtype, count=len(terms))
+            keep = np.flatnonzero(mask)[(-tfs[mask]).argsort()[:sk.max_features]]
+            mask = np.zeros(len(terms), dtype=bool)
+            mask[keep] = True
+        kept = np.flatnonzero(mask)
+        if not kept.size:
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+
+        sk.fixed_vocabulary_ = False
+        sk.vocabulary_ = {terms[j]: i for i, j in enumerate(kept)}
+        # the same transformer TfidfVectorizer.fit builds; only idf_ needs learning
+        sk._tfidf = TfidfTransformer(norm=sk.norm, use_idf=sk.use_idf, smooth_idf=sk.smooth_idf,
+                                     sublinear_tf=sk.sublinear_tf)
+        if sk.use_idf:
+            sk._tfidf.idf_ = _idf_from_df(sk, dfs[kept], n_docs)
+        sk._tfidf.n_features_in_ = kept.size
+        self._sk = sk
+        self._reset_fit_state(n_docs, df=dfs[kept])
+        return self
+
+    def iter_transform(self, corpus: Iterable[str], *, chunk_size: int = STREAM_CHUNK_SIZE,
+                       n_jobs: int = 1) -> Iterator[sparse.csr_matrix]:
+        """TF-IDF rows of corpus as CSR blocks of up to chunk_size docs, in corpus order."""
+        assert self._sk is not None, "Vectorizer not fitted/loaded"
+        if n_jobs != 1:
+            for chunk_terms, counts in _parallel_counts(self.params, corpus, n_jobs, chunk_size):
+                yield sparse.csr_matrix(self._counts_to_tfidf(chunk_terms, counts))
+            return
+        it = iter(corpus)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                break
+            yield sparse.csr_matrix(self._sk.transform(chunk))
+
+    def transform_streaming(self, corpus: Iterable[str], *, chunk_size: int = STREAM_CHUNK_SIZE,
+                            n_jobs: int = 1) -> sparse.csr_matrix:
+        """transform() over corpus in chunks; only the CSR output (and one chunk of text) is in memory."""
+        blocks = list(self.iter_transform(corpus, chunk_size=chunk_size, n_jobs=n_jobs))
+        if not blocks:
+            return sparse.csr_matrix((0, len(self._sk.vocabulary_)), dtype=self._sk.dtype)
+        return sparse.vstack(blocks, format="csr")
+
+    def _counts_to_tfidf(self, chunk_terms: List[str], counts: sparse.csr_matrix):
+        """What transform() gives for a chunk counted by _count_chunk: its terms mapped onto vocabulary_."""
+        sk = self._sk
+        col = np.fromiter((sk.vocabulary_.get(t, -1) for t in chunk_terms), dtype=np.int64, count=len(chunk_terms))
+        cols = col[counts.indices]
+        keep = cols >= 0
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))[keep]
+        X = sparse.csr_matrix((counts.data[keep], (rows, cols[keep])),
+                              shape=(counts.shape[0], len(sk.vocabulary_)), dtype=sk.dtype)
+        X.sort_indices()
+        if sk.binary:
+            X.data.fill(1)
+        return sk._tfidf.transform(X, copy=False)
+
     def _fit_transform_inplace(self, corpus: Iterable[str]) -> None:
         """Fit + store matrix in self._x_csr (one pass)."""
         from sklearn.feature_extraction.text import TfidfVectorizer
         self._sk = TfidfVectorizer(**self.params)
         self._x_csr = self._sk.fit_transform(corpus)
+        self._reset_fit_state(self._x_csr.shape[0])
 
     # ---------- persistence ----------
-    def save(self, dirpath: Optional[Path] = None, X=None, docs: Optional[List[Dict[str, Any]]] = None, manifest: Optional[Dict[str, Any]] = None) -> Path:
+    def save(self, dirpath: Optional[Path] = None, X=None, docs: Optional[List[Dict[str, Any]]] = None,
+             manifest: Optional[Dict[str, Any]] = None, format_version: int = BUNDLE_FORMAT) -> Path:
         """
         Write vectorizer + (optionally) X and docs to dirpath.
         If X is None but self._x_csr is set, save that.
+        format_version=2 writes raw .npy arrays that load() memory-maps; each file
+        is written aside and renamed into place, so processes that have the old
+        bundle mapped keep reading valid data. format_version=1 is X.npz + JSON.
         """
-        names = settings["BUNDLE"]
+        names = self.config["BUNDLE"]
         out = Path(dirpath or self._timestamped_dir())
         out.mkdir(parents=True, exist_ok=True)
 
@@ -186,26 +560,432 @@ class Vectorizer:
         assert self._sk is not None, "Nothing to save: vectorizer not fitted/loaded"
         joblib.dump(self._sk, out / names["vectorizer"])
 
-        # matrix
-        X_to_save = X if X is not None else self._x_csr
-        if X_to_save is not None:
-            sparse.save_npz(out / names["x_csr"], X_to_save)
-
         # doc index
         if docs is not None:
             self.doc_index = list(docs)
-        if self.doc_index:
-            (out / names["doc_index"]).write_text(
-                json.dumps(self.doc_index, ensure_ascii=False, indent=2),
-                encoding="utf-8"
-            )
+        extra: Dict[str, Any] = {"format_version": format_version}
+
+        X_to_save = X if X is not None else self._x_csr
+        extra["has_matrix"] = X_to_save is not None
+        if format_version == 1:
+            # matrix
+            if X_to_save is not None:
+                sparse.save_npz(out / names["x_csr"], X_to_save)
+            if self.doc_index:
+                (out / names["doc_index"]).write_text(
+                    json.dumps(list(self.doc_index), ensure_ascii=False, indent=2),
+                    encoding="utf-8"
+                )
+        elif format_version == 2:
+            if X_to_save is not None:
+                X_to_save = sparse.csr_matrix(X_to_save)
+                if not X_to_save.has_sorted_indices:   # sort a copy: X may be the caller's or self._x_csr
+                    X_to_save = X_to_save.sorted_indices()
+                _replace_npy(out / names["x_data"], X_to_save.data)
+                _replace_npy(out / names["x_indices"], X_to_save.indices)
+                _replace_npy(out / names["x_indptr"], X_to_save.indptr)
+                extra["x_shape"] = list(X_to_save.shape)
+            if self.doc_index:
+                cols = self.doc_index if isinstance(self.doc_index, ColumnarDocIndex) \
+                    else ColumnarDocIndex.from_records(self.doc_index)
+                if cols is None:   # ragged or non-scalar fields: JSON still holds them
+                    (out / names["doc_index"]).write_text(
+                        json.dumps(list(self.doc_index), ensure_ascii=False), encoding="utf-8")
+                else:
+                    for column, values in cols.columns.items():
+                        _replace_npy(out / names["doc_column"].format(column=column), values)
+                    extra["doc_columns"] = list(cols.columns)
+        else:
+            raise ValueError(f"Unknown bundle format_version {format_version}")
+
+        if self._df is not None:
+            _replace_npy(out / names["df"], self._df)
+        if self._idf_fit is not None:
+            _replace_npy(out / names["idf_fit"], self._idf_fit)
+        if self.fit_state:
+            extra["fit_state"] = self.fit_state
+
+        if self._lsa_svd is not None:
+            self._write_lsa(out)
+            extra["lsa"] = self._lsa_info
+        if self._ann is not None:
+            joblib.dump(self._svd, out / names["svd"])
+            extra["ann"] = self._ann.save(out, names)
 
         # manifest (always write a minimal one)
-        mf = self._manifest_defaults(manifest)
+        mf = self._manifest_defaults({**extra, **(manifest or {})})
         (out / names["manifest"]).write_text(json.dumps(mf, ensure_ascii=False, indent=2), encoding="utf-8")
 
         return out
 
+    # ---------- incremental update ----------
+    @property
+    def _x_csr(self):
+        if self._stale_rows:
+            self._rescale_stale_rows()
+        return self._x
+
+    @_x_csr.setter
+    def _x_csr(self, X):
+        self._x = X
+        self._stale_rows = []
+
+    def _reset_fit_state(self, n_docs: int, df: Optional[np.ndarray] = None) -> None:
+        self._stale_rows = []
+        self._df = df   # None: counted from X on first use
+        self._idf_fit = self._sk.idf_.copy() if self._sk.use_idf else None
+        self.fit_state = {
+            "fitted_at": datetime.now(tz=timezone.utc).isoformat(),
+            "n_docs_fit": int(n_docs),
+            "n_docs": int(n_docs),
+            "docs_added": 0,
+            "docs_replaced": 0,
+            "tokens_added": 0,
+            "oov_tokens": 0,
+            "updates": 0,
+        }
+
+    def document_frequencies(self) -> np.ndarray:
+        """
+        Per-term DF behind idf_. Fits and partial updates keep it; for older
+        bundles it is counted from X's non-zeros (X rows are the fitted docs).
+        """
+        if self._df is None:
+            assert self._x is not None, "No document frequencies: bundle has neither df.npy nor X"
+            X = sparse.csr_matrix(self._x)
+            self._df = np.bincount(X.indices, minlength=X.shape[1]).astype(np.int64)
+        return self._df
+
+    def drift(self, state: Optional[Dict[str, Any]] = None, idf: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """How far the corpus has moved since the last full fit (see settings["TFIDF_UPDATE"])."""
+        st = state or self.fit_state
+        n_fit = max(1, st.get("n_docs_fit") or st.get("n_docs") or 1)
+        out = {
+            "added_ratio": (st.get("docs_added", 0) + st.get("docs_replaced", 0)) / n_fit,
+            "oov_rate": st.get("oov_tokens", 0) / max(1, st.get("tokens_added", 0)),
+        }
+        idf = idf if idf is not None else (self._sk.idf_ if self._sk is not None and self._sk.use_idf else None)
+        if idf is not None and self._idf_fit is not None:
+            out["idf_shift"] = float(np.abs(idf - self._idf_fit).mean() / self._idf_fit.mean())
+        return out
+
+    def partial_update(self, new_docs: Iterable[str], docs: Optional[List[Dict[str, Any]]] = None, *,
+                       refit_corpus: Optional[Iterable[str]] = None, **limits) -> Dict[str, Any]:
+        """
+        Add docs without refitting: their terms update the running DF counts,
+        idf_ is recomputed from them (O(vocab)), and their rows are appended
+        to X. Rows already in X are re-weighted to the new idf lazily, the next
+        time X is read. Docs whose doc_id is already in the index replace
+        their old row. The vocabulary stays the one of the last full fit;
+        terms outside it are counted as drift.
+
+        If drift since the last full fit passes a limit in settings["TFIDF_UPDATE"]
+        (max_added_ratio=, max_idf_shift=, max_oov_rate= override), nothing is changed:
+        the whole corpus is refit from refit_corpus (re-iterable, e.g. a
+        CorpusBuilder) if one was passed, else RefitRequired is raised.
+        """
+        assert self._sk is not None and self._x is not None, "partial_update needs a fitted vectorizer and X"
+        texts = list(new_docs)
+        if self.doc_index and (docs is None or len(docs) != len(texts)):
+            raise ValueError("Pass one doc_index record per new doc")
+        limits = {**self.config["TFIDF_UPDATE"], **limits}
+        sk = self._sk
+        n_vocab = len(sk.vocabulary_)
+
+        # rows of docs being replaced: their terms leave the DF counts
+        replace_rows = np.empty(0, dtype=np.int64)
+        if docs and self.doc_index:
+            new_ids = {d["doc_id"] for d in docs}
+            replace_rows = np.flatnonzero(np.fromiter((i in new_ids for i in self.doc_ids()), dtype=bool,
+                                                      count=len(self.doc_index)))
+        counts, oov, tokens = self._count_new(texts)
+
+        state = dict(self.fit_state or {"n_docs_fit": self._x.shape[0], "n_docs": self._x.shape[0]})
+        state.update(
+            n_docs=int(self._x.shape[0] - replace_rows.size + len(texts)),
+            docs_added=state.get("docs_added", 0) + len(texts) - int(replace_rows.size),
+            docs_replaced=state.get("docs_replaced", 0) + int(replace_rows.size),
+            tokens_added=state.get("tokens_added", 0) + tokens,
+            oov_tokens=state.get("oov_tokens", 0) + oov,
+            updates=state.get("updates", 0) + 1,
+        )
+        # new DF counts and idf, computed aside so a refused update changes nothing
+        df = self.document_frequencies().copy()
+        if replace_rows.size:
+            old = sparse.csr_matrix(self._x[replace_rows])   # rows' non-zeros = their in-vocab terms
+            df -= np.bincount(old.indices, minlength=n_vocab)
+        df += np.bincount(counts.indices, minlength=n_vocab)
+        new_idf = _idf_from_df(sk, df, state["n_docs"]) if sk.use_idf else None
+
+        drift = self.drift(state, new_idf)
+        over = [key for key, value in drift.items()
+                if limits.get(f"max_{key}") is not None and value > limits[f"max_{key}"]]
+        if over:
+            if refit_corpus is None:
+                raise RefitRequired(drift)
+            self._x_csr = self.fit_transform(refit_corpus, streaming=True)
+            if hasattr(refit_corpus, "doc_ids"):
+                self.set_doc_index(refit_corpus.doc_ids)
+            self._rows_changed()
+            return {"refit": True, "over": over, **self.drift()}
+
+        X = self._x_csr   # rows still stale from an earlier update are settled before any are dropped
+        if replace_rows.size:
+            keep = np.ones(X.shape[0], dtype=bool)
+            keep[replace_rows] = False
+            X = X[keep]
+            self.doc_index = [r for r, k in zip(self.doc_index, keep) if k]
+
+        old_idf = sk.idf_.copy() if sk.use_idf else None
+        if sk.use_idf:
+            sk._tfidf.idf_ = new_idf
+        X_new = sparse.csr_matrix(sk._tfidf.transform(counts))
+        n_old = X.shape[0]
+        self._x_csr = sparse.vstack([X, X_new], format="csr")
+        if sk.use_idf and n_old:
+            self._stale_rows = [(0, n_old, old_idf)]
+        if docs is not None and (self.doc_index or not n_old):
+            self.doc_index = list(self.doc_index) + list(docs)
+        self._df = df
+        self.fit_state = state
+        self._rows_changed()
+        return {"refit": False, "added": len(texts) - int(replace_rows.size),
+                "replaced": int(replace_rows.size), **drift}
+
+    def _rows_changed(self) -> None:
+        """
+        X's rows moved (appended, replaced, refit): drop what is indexed by row.
+        The ANN index goes -- save() then writes no manifest["ann"] -- until
+        build_ann() is run again; the LSA cache is keyed by X's hash already.
+        """
+        self._x_unit = None
+        self._ann = None
+        self._svd = None
+
+    def _count_new(self, texts: List[str]) -> Tuple[sparse.csr_matrix, int, int]:
+        """
+        Term counts of texts over the fitted vocabulary (what CountVectorizer.transform
+        gives), plus the number of words (unigrams) outside it and the word count.
+        """
+        sk = self._sk
+        analyze = sk.build_analyzer()
+        vocab = sk.vocabulary_
+        indptr, indices, values = [0], [], []
+        oov = tokens = 0
+        for text in texts:
+            row = Counter()
+            for term in analyze(text):
+                j = vocab.get(term)
+                if j is not None:
+                    row[j] += 1
+                if " " not in term:   # OOV is judged on words; most n-grams are pruned by design
+                    tokens += 1
+                    oov += j is None
+            for j in sorted(row):
+                indices.append(j)
+                values.append(row[j])
+            indptr.append(len(indices))
+        counts = sparse.csr_matrix((np.asarray(values, dtype=sk.dtype), np.asarray(indices, dtype=np.int64),
+                                    np.asarray(indptr, dtype=np.int64)), shape=(len(texts), len(vocab)))
+        if sk.binary:
+            counts.data.fill(1)
+        return counts, oov, tokens
+
+    def _rescale_stale_rows(self) -> None:
+        """Re-weight rows built under an older idf_ to the current one (column scale, then re-normalize)."""
+        X = sparse.csr_matrix(self._x, copy=True)
+        idf = self._sk.idf_
+        for start, stop, old_idf in self._stale_rows:
+            block = X[start:stop] @ sparse.diags((idf / old_idf).astype(X.dtype))
+            if self._sk.norm:
+                block = normalize(block, norm=self._sk.norm, copy=False)
+            X = sparse.vstack([X[:start], block, X[stop:]], format="csr")
+        self._x = X
+        self._stale_rows = []
+
+    # ---------- similarity search ----------
+    def normalized_matrix(self) -> sparse.csr_matrix:
+        """
+        L2-normalized rows of X, built once per matrix. A TfidfVectorizer with
+        norm="l2" (the default) already emits unit rows, so then this is X itself.
+        """
+        assert self._x_csr is not None, "No matrix: fit_transform into _x_csr or load a bundle with X"
+        if self._x_unit is None or self._x_unit[0] is not self._x_csr:
+            X = sparse.csr_matrix(self._x_csr, copy=False)
+            if getattr(self._sk, "norm", None) != "l2":
+                X = normalize(X, norm="l2", copy=True)
+            self._x_unit = (self._x_csr, X)
+        return self._x_unit[1]
+
+    def search(self, queries, k: int = 10, filters=None, *,
+               row_chunk: int = SEARCH_ROW_CHUNK, query_chunk: int = SEARCH_QUERY_CHUNK):
+        """
+        Cosine top-k over X for a batch of queries.
+
+        The queries are transformed together and scored with one sparse product
+        per (query_chunk x row_chunk) block, so peak memory is one block's
+        non-zero scores plus k candidates per query; the N x Q score matrix is
+        never densified. filters restricts the rows: {doc_index field: value or
+        collection of values}, or a boolean mask over the rows.
+
+        Returns, per query, up to k doc_index records with a "score", best first
+        (a single str query returns just its list).
+        """
+        single = isinstance(queries, str)
+        queries = [queries] if single else list(queries)
+        X = self.normalized_matrix()
+        n_docs = X.shape[0]
+        allowed = self._row_mask(filters)
+        results: List[List[Dict[str, Any]]] = []
+        for q0 in range(0, len(queries), query_chunk):
+            Q = normalize(sparse.csr_matrix(self.transform(queries[q0:q0 + query_chunk])), norm="l2")
+            best = [(np.empty(0, np.int64), np.empty(0, X.dtype))] * Q.shape[0]
+            for r0 in range(0, n_docs if k > 0 else 0, row_chunk):
+                S = sparse.csr_matrix(Q @ X[r0:r0 + row_chunk].T)   # (queries x rows), sparse
+                for i in range(S.shape[0]):
+                    lo, hi = S.indptr[i], S.indptr[i + 1]
+                    rows = S.indices[lo:hi].astype(np.int64) + r0
+                    scores = S.data[lo:hi]
+                    keep = scores > 0
+                    if allowed is not None:
+                        keep &= allowed[rows]
+                    if keep.any():
+                        best[i] = _top_k_merge(best[i], rows[keep], scores[keep], k)
+            for rows, scores in best:
+                order = np.lexsort((rows, -scores))   # score desc, then row for stable ties
+                results.append([dict(self.doc_index[int(r)], score=float(scores[j]))
+                                if self.doc_index else {"row": int(r), "score": float(scores[j])}
+                                for j, r in zip(order, rows[order])])
+        return results[0] if single else results
+
+    def _row_mask(self, filters) -> Optional[np.ndarray]:
+        if filters is None:
+            return None
+        n_docs = self._x_csr.shape[0]
+        if not isinstance(filters, dict):
+            mask = np.asarray(filters, dtype=bool)
+            if mask.shape != (n_docs,):
+                raise ValueError(f"filter mask has shape {mask.shape}, X has {n_docs} rows")
+            return mask
+        mask = np.ones(n_docs, dtype=bool)
+        for key, wanted in filters.items():
+            values = self._doc_field(key)
+            wanted = set(wanted) if isinstance(wanted, (list, tuple, set, frozenset)) else {wanted}
+            mask &= np.fromiter((v in wanted for v in values), dtype=bool, count=n_docs)
+        return mask
+
+    # ---------- cached LSA ----------
+    def lsa(self, n_components: Optional[int] = None, *, random_state: Optional[int] = None,
+            n_iter: Optional[int] = None, persist: bool = True):
+        """
+        fit_lsa over X, cached; returns (Z, components, evr, svd) as fit_lsa does.
+
+        The cache (manifest["lsa"] + the lsa_*.npy arrays) is keyed by a hash
+        of X plus the SVD params. For the same X and params the cached arrays
+        come back as they are, or their leading components when fewer are
+        asked for. Anything else -- more components, an X changed by
+        partial_update -- is fit warm-started from the cached basis (see
+        fit_lsa). persist=True writes a new fit into the bundle this
+        Vectorizer was loaded from right away; save() always includes it.
+        """
+        assert self._x_csr is not None, "No matrix: fit_transform into _x_csr or load a bundle with X"
+        cfg = self.config["LSA"]
+        X = self._x_csr
+        n = min(n_components or cfg["n_components"], X.shape[1] - 1)
+        params = {"random_state": cfg["random_state"] if random_state is None else random_state,
+                  "n_iter": n_iter or cfg["n_iter"]}
+        x_hash = self._x_hash()
+        info = self._lsa_info
+        if (self._lsa_svd is not None and info.get("x_hash") == x_hash and info.get("params") == params
+                and info["n_components"] >= n):
+            svd = _slice_svd(self._lsa_svd, n)
+            return self._lsa_z[:, :n], svd.components_, svd.explained_variance_ratio_, svd
+
+        warm = None
+        if self._lsa_svd is not None and self._lsa_svd.components_.shape[1] == X.shape[1]:
+            warm = self._lsa_svd.components_
+        Z, components, evr, svd = fit_lsa(X, n, params["random_state"], n_iter=params["n_iter"],
+                                          warm_start=warm, warm_n_iter=cfg["warm_n_iter"])
+        key = hashlib.sha1(json.dumps([x_hash, params, n], sort_keys=True).encode()).hexdigest()
+        self._lsa_svd, self._lsa_z = svd, Z
+        self._lsa_info = {
+            "key": key, "x_hash": x_hash, "params": params, "n_components": n,
+            "warm_start": None if warm is None else int(warm.shape[0]),
+            "explained_variance": round(float(evr.sum()), 6),
+            "fitted_at": datetime.now(tz=timezone.utc).isoformat(),
+        }
+        mf_path = self.default_dir / self.config["BUNDLE"]["manifest"] if self.default_dir else None
+        if persist and mf_path is not None and mf_path.exists():
+            self._write_lsa(self.default_dir)
+            mf = json.loads(mf_path.read_text(encoding="utf-8"))
+            mf["lsa"] = self._lsa_info
+            mf_path.write_text(json.dumps(mf, ensure_ascii=False, indent=2), encoding="utf-8")
+        return Z, components, evr, svd
+
+    def _write_lsa(self, out: Path) -> None:
+        names = self.config["BUNDLE"]
+        svd = self._lsa_svd
+        arrays = (svd.components_, svd.singular_values_, svd.explained_variance_,
+                  svd.explained_variance_ratio_, self._lsa_z)
+        for key, arr in zip(LSA_FILES, arrays):
+            _replace_npy(Path(out) / names[key], arr)
+
+    def _x_hash(self) -> str:
+        """
+        sha1 over X's shape, dtype and canonical CSR arrays (sorted indices,
+        int64), so the X that save() writes hashes the same after load();
+        computed once per matrix.
+        """
+        X = self._x_csr
+        if self._x_digest is None or self._x_digest[0] is not X:
+            csr = sparse.csr_matrix(X, copy=False)
+            if not csr.has_canonical_format:
+                csr = csr.copy()
+                csr.sum_duplicates()   # also sorts the indices
+            h = hashlib.sha1(repr((csr.shape, csr.dtype.str)).encode())
+            for arr in (csr.indptr.astype(np.int64, copy=False), csr.indices.astype(np.int64, copy=False), csr.data):
+                h.update(np.ascontiguousarray(arr))
+            self._x_digest = (X, h.hexdigest())
+        return self._x_digest[1]
+
+    # ---------- LSA "more like this" ----------
+    def build_ann(self, n_components: int = 200, *, n_lists: Optional[int] = None,
+                  n_probe: Optional[int] = None, random_state: int = 0) -> "AnnIndex":
+        """
+        LSA over X (cached, see lsa()), then an AnnIndex over the doc vectors Z;
+        both are kept on the Vectorizer and written by save(). The index's recall/latency
+        evaluation against exact cosine ends up in the manifest under "ann".
+        """
+        assert self._x_csr is not None, "No matrix: fit_transform into _x_csr or load a bundle with X"
+        Z, _, _, svd = self.lsa(n_components, random_state=random_state, persist=False)
+        # the index keeps its own copy: a later lsa() refit replaces the cached basis in place
+        self._svd = _slice_svd(svd, svd.components_.shape[0], copy=True)
+        self._ann = AnnIndex.build(Z, n_lists=n_lists, n_probe=n_probe, random_state=random_state)
+        return self._ann
+
+    def more_like_this(self, doc_id: Optional[int] = None, text: Optional[str] = None, k: int = 10, *,
+                       n_probe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Nearest docs in LSA space to a doc in the index (by doc_id, itself
+        excluded) or to free text projected through the fitted SVD.
+        """
+        assert self._ann is not None, "No ANN index: build_ann() or load a bundle built with one"
+        if (doc_id is None) == (text is None):
+            raise ValueError("Pass exactly one of doc_id or text")
+        exclude = None
+        if doc_id is not None:
+            rows = np.flatnonzero(np.asarray(self.doc_ids()) == doc_id)
+            if not rows.size:
+                raise KeyError(f"doc_id {doc_id} not in this bundle")
+            q = self._ann.vector(int(rows[0]))
+            exclude = rows[:1]
+        else:
+            q = self._svd.transform(self.transform([text]))[0]
+            if not np.any(q):
+                return []
+        found_rows, scores = self._ann.query(q, k, n_probe=n_probe, exclude=exclude)[0]
+        return [dict(self.doc_index[int(r)], score=float(sc)) for r, sc in zip(found_rows, scores)]
+
     # ---------- vocab utilities ----------
     @property
     def terms(self) -> list[str]:
@@ -239,32 +1019,511 @@ class Vectorizer:
         return m
 
 
-def fit_lsa(X_csr: sparse.csr_matrix, n_components=200, random_state=0):
-    svd = TruncatedSVD(n_components=n_components, random_state=random_state)
-    Z = svd.fit_transform(X_csr)
+class RefitRequired(RuntimeError):
+    """partial_update refused: drift since the last full fit is past the limits (args[0] is the drift)."""
+
+
+def _idf_from_df(sk, df: np.ndarray, n_docs: int) -> np.ndarray:
+    """idf_ exactly as TfidfTransformer.fit computes it from document frequencies."""
+    dtype = sk.dtype if np.dtype(sk.dtype) in (np.float64, np.float32) else np.float64
+    df = df.astype(dtype) + float(sk.smooth_idf)
+    idf = np.full_like(df, fill_value=n_docs + int(sk.smooth_idf), dtype=dtype)
+    idf /= df
+    np.log(idf, out=idf)
+    idf += 1.0
+    return idf
+
+
+def benchmark_parallel_fit(texts: Sequence[str], n_jobs_list: Sequence[int] = (1, 2, 4, 8), *,
+                           params: Optional[Dict[str, Any]] = None, repeat: int = 1) -> List[Dict[str, Any]]:
+    """
+    Time Vectorizer.fit_transform(texts, n_jobs=j) for each j (best of repeat)
+    and report the speedup over n_jobs=1 and whether X came out identical to it.
+    """
+    texts = list(texts)
+    report, serial = [], None
+    for n_jobs in [1] + [j for j in n_jobs_list if j != 1]:
+        best, X = np.inf, None
+        for _ in range(repeat):
+            v = Vectorizer(**(params or settings["TFIDF"]))
+            t0 = time.perf_counter()
+            X = sparse.csr_matrix(v.fit_transform(texts, n_jobs=n_jobs))
+            best = min(best, time.perf_counter() - t0)
+        if serial is None:
+            serial = (best, X)
+        identical = (X.shape == serial[1].shape and np.array_equal(X.indptr, serial[1].indptr)
+                     and np.array_equal(X.indices, serial[1].indices) and np.array_equal(X.data, serial[1].data))
+        report.append({"n_jobs": n_jobs, "seconds": round(best, 3), "speedup": round(serial[0] / best, 2),
+                       "identical": bool(identical)})
+    return report
+
+
+def _count_chunk(params: Dict[str, Any], texts: List[str]) -> Tuple[List[str], sparse.csr_matrix]:
+    """
+    Raw term counts of texts over the chunk's own terms, numbered in order of
+    first appearance exactly as CountVectorizer._count_vocab numbers them
+    (one worker's share of a parallel fit or transform).
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    analyze = TfidfVectorizer(**params).build_analyzer()
+    vocab: Dict[str, int] = {}
+    indptr, indices, values = [0], [], []
+    for text in texts:
+        row: Dict[int, int] = {}
+        for term in analyze(text):
+            j = vocab.setdefault(term, len(vocab))
+            row[j] = row.get(j, 0) + 1
+        indices.extend(row.keys())
+        values.extend(row.values())
+        indptr.append(len(indices))
+    counts = sparse.csr_matrix((np.asarray(values, dtype=np.intc), np.asarray(indices, dtype=np.int64),
+                                np.asarray(indptr, dtype=np.int64)), shape=(len(texts), len(vocab)))
+    counts.sort_indices()
+    return list(vocab), counts
+
+
+def _parallel_counts(params: Dict[str, Any], corpus: Iterable[str], n_jobs: int,
+                     chunk_size: int) -> Iterator[Tuple[List[str], sparse.csr_matrix]]:
+    """_count_chunk over chunk_size-doc chunks of corpus on joblib workers, yielded in corpus order."""
+    from joblib import Parallel, delayed
+    it = iter(corpus)
+    chunks = iter(lambda: list(islice(it, chunk_size)), [])
+    yield from Parallel(n_jobs=n_jobs, return_as="generator")(
+        delayed(_count_chunk)(params, chunk) for chunk in chunks
+    )
+
+
+def _merge_counts(chunks: Iterable[Tuple[List[str], sparse.csr_matrix]], dtype) -> Tuple[Dict[str, int], sparse.csr_matrix]:
+    """
+    Stack per-chunk counts over one vocabulary: chunks in corpus order, terms
+    in first-appearance order, i.e. the (vocabulary, X) of _count_vocab.
+    """
+    vocabulary: Dict[str, int] = {}
+    blocks = []
+    for chunk_terms, counts in chunks:
+        col = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in chunk_terms),
+                          dtype=np.int64, count=len(chunk_terms))
+        blocks.append((counts.data, col[counts.indices], counts.indptr))
+    if not vocabulary:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    X = sparse.vstack([sparse.csr_matrix(block, shape=(len(block[2]) - 1, len(vocabulary))) for block in blocks],
+                      format="csr").astype(dtype)
+    X.sort_indices()
+    return vocabulary, X
+
+
+def _top_k_merge(best, rows: np.ndarray, scores: np.ndarray, k: int):
+    """
+    Fold new (rows, scores) into a query's running top-k candidates. Ties at
+    the cut go to the lower row, so the result doesn't depend on chunking.
+    """
+    rows = np.concatenate((best[0], rows))
+    scores = np.concatenate((best[1], scores))
+    if scores.size > k:
+        keep = np.lexsort((rows, -scores))[:k]
+        rows, scores = rows[keep], scores[keep]
+    return rows, scores
+
+
+def _replace_npy(path: Path, arr: np.ndarray) -> None:
+    """np.save to a temp name, then rename over path (readers mapping the old file are unaffected)."""
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    with open(tmp, "wb") as f:
+        np.save(f, np.asarray(arr))
+    os.replace(tmp, path)
+
+
+LSA_FILES = ("lsa_components", "lsa_singular_values", "lsa_explained_variance",
+             "lsa_explained_variance_ratio", "lsa_z")   # settings["BUNDLE"] keys, in _svd_from_arrays order + Z
+
+
+def fit_lsa(X_csr: sparse.csr_matrix, n_components=200, random_state=0, *, n_iter: int = 5,
+            warm_start: Optional[np.ndarray] = None, warm_n_iter: int = 2):
+    """
+    TruncatedSVD over X; returns (Z, components, evr, svd).
+    warm_start: components_ of an earlier fit over the same columns (any
+    number of rows). The randomized range finder then starts from that basis,
+    topped up with random directions, and warm_n_iter power iterations
+    replace the n_iter a random start needs.
+    """
+    svd = TruncatedSVD(n_components=n_components, random_state=random_state, n_iter=n_iter)
+    if warm_start is None:
+        Z = svd.fit_transform(X_csr)
+    else:
+        Z = _warm_svd(svd, X_csr, np.asarray(warm_start), warm_n_iter)
     components = svd.components_                  # == V^T (components × terms)
     evr = svd.explained_variance_ratio_          # per-component variance share
     return Z, components, evr, svd
 
+class AnnIndex:
+    """
+    IVF-flat approximate nearest neighbours (cosine) over LSA document vectors.
+
+    A KMeans coarse quantizer splits the unit-normalized rows of Z into
+    n_lists cells; vectors are stored cell after cell (vectors[indptr[c]:indptr[c+1]],
+    with their X rows in rows[...]), so a query scans only the n_probe cells
+    whose centroids are closest. Every array is a plain .npy that load()
+    memory-maps, like the rest of a format-2 bundle.
+    """
+    FILES = ("ann_centroids", "ann_indptr", "ann_rows", "ann_vectors")
+
+    def __init__(self, centroids: np.ndarray, indptr: np.ndarray, rows: np.ndarray, vectors: np.ndarray,
+                 n_probe: int = 8, info: Optional[Dict[str, Any]] = None):
+        self.centroids = centroids
+        self.indptr = indptr
+        self.rows = rows
+        self.vectors = vectors
+        self.n_probe = n_probe
+        self.info: Dict[str, Any] = dict(info or {})
+        self._where = None   # X row -> position in vectors, built on first by-row lookup
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, Z: np.ndarray, *, n_lists: Optional[int] = None, n_probe: Optional[int] = None,
+              random_state: int = 0) -> "AnnIndex":
+        """n_lists defaults to ~sqrt(N); n_probe to the smallest probe count reaching 95% recall@10 (see tune)."""
+        Z = normalize(np.asarray(Z, dtype=np.float32))
+        n_docs = Z.shape[0]
+        n_lists = max(1, min(n_docs, n_lists or int(round(np.sqrt(n_docs)))))
+        km = KMeans(n_clusters=n_lists, n_init=1, random_state=random_state).fit(Z)
+        order = np.argsort(km.labels_, kind="stable")
+        indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(km.labels_, minlength=n_lists), out=indptr[1:])
+        self = cls(normalize(km.cluster_centers_.astype(np.float32)), indptr, order.astype(np.int64), Z[order],
+                   info={"n_docs": n_docs, "dim": int(Z.shape[1]), "n_lists": n_lists})
+        if n_probe:
+            self.n_probe = n_probe
+        else:
+            self.tune(Z, random_state=random_state)
+        return self
+
+    def query(self, Q: np.ndarray, k: int = 10, *, n_probe: Optional[int] = None,
+              exclude: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Per query row: (X rows, cosine scores) of the k best, best first. exclude[i] drops one row (the doc itself)."""
+        Q = normalize(np.atleast_2d(np.asarray(Q, dtype=np.float32)))
+        n_probe = max(1, min(n_probe or self.n_probe, self.n_lists))
+        if n_probe < self.n_lists:
+            probes = np.argpartition(-(Q @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(self.n_lists), (Q.shape[0], self.n_lists))
+        indptr = np.asarray(self.indptr)
+        out = []
+        for i, q in enumerate(Q):
+            pos = np.concatenate([np.arange(indptr[c], indptr[c + 1]) for c in probes[i]])
+            rows = np.asarray(self.rows[pos])
+            scores = np.asarray(self.vectors[pos]) @ q
+            if exclude is not None:
+                keep = rows != exclude[i]
+                rows, scores = rows[keep], scores[keep]
+            top = np.lexsort((rows, -scores))[:k]
+            out.append((rows[top], scores[top]))
+        return out
+
+    def vector(self, row: int) -> np.ndarray:
+        """Stored (unit) vector of X row `row`."""
+        if self._where is None:
+            self._where = np.empty(len(self.rows), dtype=np.int64)
+            self._where[np.asarray(self.rows)] = np.arange(len(self.rows))
+        return np.asarray(self.vectors[self._where[row]])
+
+    def evaluate(self, Z: np.ndarray, *, k: int = 10, n_probes: Iterable[int] = (1, 2, 4, 8, 16, 32),
+                 n_queries: int = 200, random_state: int = 0) -> List[Dict[str, Any]]:
+        """
+        Recall@k against exact cosine over Z, and ms/query for ANN vs exact,
+        on n_queries sampled docs (each query excludes itself).
+        """
+        Z = normalize(np.asarray(Z, dtype=np.float32))
+        rng = np.random.default_rng(random_state)
+        sample = rng.choice(Z.shape[0], size=min(n_queries, Z.shape[0]), replace=False)
+        t0 = time.perf_counter()
+        S = Z[sample] @ Z.T
+        S[np.arange(sample.size), sample] = -np.inf
+        truth = [set(np.argsort(-row, kind="stable")[:k].tolist()) for row in S]
+        exact_ms = 1000.0 * (time.perf_counter() - t0) / sample.size
+        report = []
+        for n_probe in sorted({min(p, self.n_lists) for p in n_probes}):
+            t0 = time.perf_counter()
+            found = self.query(Z[sample], k, n_probe=n_probe, exclude=sample)
+            ms = 1000.0 * (time.perf_counter() - t0) / sample.size
+            recall = np.mean([len(truth[i] & set(rows.tolist())) / max(1, len(truth[i]))
+                              for i, (rows, _) in enumerate(found)])
+            report.append({"n_probe": n_probe, "recall": round(float(recall), 4),
+                           "ms_per_query": round(ms, 3), "exact_ms_per_query": round(exact_ms, 3)})
+        return report
+
+    def tune(self, Z: np.ndarray, *, target_recall: float = 0.95, k: int = 10, random_state: int = 0) -> int:
+        """Set n_probe to the smallest measured value reaching target_recall; keep the report in info."""
+        report = self.evaluate(Z, k=k, random_state=random_state)
+        good = [r["n_probe"] for r in report if r["recall"] >= target_recall]
+        self.n_probe = good[0] if good else report[-1]["n_probe"]
+        self.info.update(n_probe=self.n_probe, recall_at=k, evaluation=report)
+        return self.n_probe
+
+    # ---------- persistence (inside a Vectorizer bundle) ----------
+    def save(self, out: Path, names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        names = names or settings["BUNDLE"]
+        for key, arr in zip(self.FILES, (self.centroids, self.indptr, self.rows, self.vectors)):
+            _replace_npy(Path(out) / names[key], arr)
+        return dict(self.info, n_probe=self.n_probe)
+
+    @classmethod
+    def load(cls, bundle_dir: Path, info: Dict[str, Any], *, mmap: bool = True,
+             names: Optional[Dict[str, str]] = None) -> "AnnIndex":
+        names = names or settings["BUNDLE"]
+        mode = "r" if mmap else None
+        arrays = [np.load(Path(bundle_dir) / names[key], mmap_mode=mode) for key in cls.FILES]
+        return cls(*arrays, n_probe=int(info.get("n_probe", 8)), info=info)
+
+
+def all_pairs_similarity(M, *, threshold: Optional[float] = None, top_k: Optional[int] = None,
+                         block_size: int = 1024, n_jobs: int = 1) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Cosine similarity join over the rows of M (TF-IDF csr or dense LSA Z),
+    computed one block of rows at a time and yielded as (i, j, score) arrays
+    per block, in row order. Self-pairs are never returned.
+
+      threshold only -> each pair with score >= threshold once, i < j
+      top_k          -> for every row i its top_k best j (>= threshold if given)
+
+    Peak memory is one block's scores (block_size x N, sparse for TF-IDF)
+    per worker, not N^2. n_jobs > 1 (or -1 for every core) spreads blocks
+    over joblib worker processes; M is memory-mapped to them, not copied.
+    """
+    if threshold is None and top_k is None:
+        raise ValueError("Pass a threshold, a top_k, or both")
+    M = normalize(M.astype(np.float32) if sparse.issparse(M) else np.asarray(M, dtype=np.float32))
+    if sparse.issparse(M):
+        M = sparse.csr_matrix(M)
+    n = M.shape[0]
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    if n_jobs == 1:
+        for start, stop in blocks:
+            yield _pair_block(M, start, stop, threshold, top_k)
+        return
+    from joblib import Parallel, delayed
+    yield from Parallel(n_jobs=n_jobs, return_as="generator")(
+        delayed(_pair_block)(M, start, stop, threshold, top_k) for start, stop in blocks
+    )
+
+
+def _pair_block(M, start: int, stop: int, threshold: Optional[float], top_k: Optional[int]):
+    """(i, j, score) for rows start:stop of unit-row M; see all_pairs_similarity."""
+    upper = top_k is None   # threshold-only: the pair (i, j) is reported by min(i, j)'s block
+    col0 = start if upper else 0
+    S = M[start:stop] @ M[col0:].T
+    if sparse.issparse(S):
+        S = sparse.csr_matrix(S)
+    else:
+        S = sparse.csr_matrix(np.where(S >= (threshold if threshold is not None else -np.inf), S, 0))
+    out_i, out_j, out_s = [], [], []
+    for r in range(stop - start):
+        i = start + r
+        lo, hi = S.indptr[r], S.indptr[r + 1]
+        cols = S.indices[lo:hi].astype(np.int64) + col0
+        vals = S.data[lo:hi]
+        keep = (cols > i) if upper else (cols != i)
+        if threshold is not None:
+            keep &= vals >= threshold
+        cols, vals = cols[keep], vals[keep]
+        if top_k is not None and vals.size > top_k:
+            best = np.lexsort((cols, -vals))[:top_k]
+            cols, vals = cols[best], vals[best]
+        out_i.append(np.full(cols.size, i, dtype=np.int64))
+        out_j.append(cols)
+        out_s.append(vals.astype(np.float32))
+    if not out_i:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    return np.concatenate(out_i), np.concatenate(out_j), np.concatenate(out_s)
+
+
+def _warm_svd(svd: TruncatedSVD, X, V0: np.ndarray, n_iter: int) -> np.ndarray:
+    """TruncatedSVD.fit_transform (randomized) with the range finder seeded by the rows of V0."""
+    from scipy import linalg
+    from sklearn.utils import check_random_state
+    from sklearn.utils.extmath import safe_sparse_dot, svd_flip
+    k = svd.n_components
+    size = min(k + svd.n_oversamples, min(X.shape))
+    V0 = V0[:size]
+    dtype = X.dtype if X.dtype in (np.float32, np.float64) else np.float64
+    omega = np.empty((X.shape[1], size), dtype=dtype)
+    omega[:, :V0.shape[0]] = V0.T
+    omega[:, V0.shape[0]:] = check_random_state(svd.random_state).standard_normal((X.shape[1], size - V0.shape[0]))
+    # like randomized_svd, work on X.T when there are more terms than docs; the
+    # sketch then lives in term space, where the cached basis already is
+    transpose = X.shape[0] < X.shape[1]
+    M = X.T if transpose else X
+    Q = omega if transpose else safe_sparse_dot(X, omega)
+    for _ in range(n_iter):   # LU-normalized power iterations, as randomized_range_finder does
+        Q, _ = linalg.lu(Q, permute_l=True)
+        Q, _ = linalg.lu(safe_sparse_dot(M.T, Q), permute_l=True)
+        Q = safe_sparse_dot(M, Q)
+    Q, _ = linalg.qr(Q, mode="economic")
+    U_b, sigma, VT_b = linalg.svd(safe_sparse_dot(M.T, Q).T, full_matrices=False)
+    if transpose:
+        U, VT = VT_b[:k].T, (Q @ U_b[:, :k]).T
+    else:
+        U, VT = Q @ U_b[:, :k], VT_b[:k]
+    _, VT = svd_flip(U, VT, u_based_decision=False)
+
+    # the attributes TruncatedSVD.fit_transform sets
+    Z = safe_sparse_dot(X, VT.T)
+    if sparse.issparse(X):
+        from sklearn.utils.sparsefuncs import mean_variance_axis
+        full_var = mean_variance_axis(sparse.csr_matrix(X), axis=0)[1].sum()
+    else:
+        full_var = np.var(X, axis=0).sum()
+    svd.components_ = VT
+    svd.explained_variance_ = np.var(Z, axis=0)
+    svd.explained_variance_ratio_ = svd.explained_variance_ / full_var
+    svd.singular_values_ = sigma[:k]
+    svd.n_features_in_ = X.shape[1]
+    return Z
+
+
+def _svd_from_arrays(params: Dict[str, Any], components, singular_values, explained_variance,
+                     explained_variance_ratio) -> TruncatedSVD:
+    """A fitted TruncatedSVD (transform() works) over cached arrays."""
+    svd = TruncatedSVD(n_components=components.shape[0], **params)
+    svd.components_ = components
+    svd.singular_values_ = singular_values
+    svd.explained_variance_ = explained_variance
+    svd.explained_variance_ratio_ = explained_variance_ratio
+    svd.n_features_in_ = components.shape[1]
+    return svd
+
+
+def _slice_svd(svd: TruncatedSVD, n: int, *, copy: bool = False) -> TruncatedSVD:
+    """The leading n components of a fitted TruncatedSVD (views unless copy=True)."""
+    if n == svd.components_.shape[0] and not copy:
+        return svd
+    arrays = (svd.components_[:n], svd.singular_values_[:n], svd.explained_variance_[:n],
+              svd.explained_variance_ratio_[:n])
+    return _svd_from_arrays({"random_state": svd.random_state, "n_iter": svd.n_iter},
+                            *(np.array(a) if copy else a for a in arrays))
+
+
 def top_terms_for_component(components, terms, j, n=12, with_weights=False):
-    w = components[j]
-    pos = np.argsort(w)[-n:][::-1]
-    neg = np.argsort(w)[:n]
+    w = np.asarray(components[j])
+    n = min(n, w.size)
+    pos = np.argpartition(w, -n)[-n:]
+    pos = pos[np.argsort(w[pos])[::-1]]
+    neg = np.argpartition(w, n - 1)[:n]
+    neg = neg[np.argsort(w[neg])]
     fmt = (lambda i: f"{terms[i]}:{w[i]:.3f}") if with_weights else (lambda i: terms[i])
     return [fmt(i) for i in pos], [fmt(i) for i in neg]
     
 def top_docs_for_component(Z, docs, j, n=8, side="pos"):
-    """Docs most aligned with component j. Z = svd.fit_transform(X)."""
-    col = Z[:, j]
-    order = np.argsort(-col) if side == "pos" else np.argsort(col)
-    idxs = order[:n]
+    """Docs most aligned with component j. Z = svd.fit_transform(X) or Vectorizer.lsa()'s Z."""
+    col = np.asarray(Z[:, j])
+    key = -col if side == "pos" else col
+    n = min(n, key.size)
+    idxs = np.argpartition(key, n - 1)[:n]
+    idxs = idxs[np.argsort(key[idxs])]
     return [(i, docs[i]["identifier"], docs[i]["title"], float(col[i])) for i in idxs]
 
 
-def k_means_on(Z, k):
-    """Cluster reduced features; return (labels, model, silhouette)."""
+def k_means_on(Z, k, *, sample_size: Optional[int] = SILHOUETTE_SAMPLE):
+    """
+    Cluster reduced features; return (labels, model, silhouette).
+    The silhouette is exact up to sample_size rows and estimated on a
+    sample_size-row sample beyond that (None: always exact, O(n^2)).
+    """
     km = KMeans(n_clusters=k, n_init="auto", random_state=0).fit(Z)
     labels = km.labels_
-    sil = silhouette_score(Z, labels, metric="euclidean")
+    sil = _sampled_silhouette(Z, labels, sample_size, random_state=0)
     return labels, km, sil
 
+
+def kmeans_sweep(Z, ks: Iterable[int], *, silhouette: str = "sampled", sample_size: int = SILHOUETTE_SAMPLE,
+                 batch_size: int = 4096, n_jobs: int = -1, random_state: int = 0,
+                 out_dir: Optional[Path] = None) -> Tuple[List[Dict[str, Any]], MiniBatchKMeans, np.ndarray]:
+    """
+    MiniBatchKMeans for every k in ks, one k per joblib worker process, and
+    the k with the best silhouette (ties: smaller k). Returns (table, model,
+    labels); table rows are {k, inertia, silhouette, fit_seconds, score_seconds}.
+
+    Z is shared, not copied: joblib memory-maps large arrays to the workers,
+    and a Z already on disk (Vectorizer.lsa() from a loaded bundle) is
+    passed as its np.memmap.
+
+      silhouette="sampled"    -> silhouette_score on sample_size rows
+      silhouette="simplified" -> distances to centroids instead of to every
+                                 point: O(n k), all rows
+
+    With out_dir (e.g. the bundle dir) the model, its labels and the table
+    are written there (settings["BUNDLE"] kmeans*).
+    """
+    if silhouette not in ("sampled", "simplified"):
+        raise ValueError(f"silhouette must be 'sampled' or 'simplified', not {silhouette!r}")
+    ks = sorted({int(k) for k in ks if 1 < k < Z.shape[0]})
+    if not ks:
+        raise ValueError("No k in 2..n_docs-1 to try")
+    from joblib import Parallel, delayed
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_sweep_one)(Z, k, silhouette, sample_size, batch_size, random_state) for k in ks
+    )
+    table = [row for row, _ in results]
+    best = max(range(len(ks)), key=lambda i: (table[i]["silhouette"], -ks[i]))
+    km = results[best][1]
+    labels = km.labels_
+    for i, row in enumerate(table):
+        row["chosen"] = i == best
+
+    if out_dir is not None:
+        names = settings["BUNDLE"]
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        joblib.dump(km, out / names["kmeans"])
+        _replace_npy(out / names["kmeans_labels"], labels)
+        (out / names["kmeans_sweep"]).write_text(json.dumps({
+            "silhouette": silhouette, "sample_size": sample_size if silhouette == "sampled" else None,
+            "batch_size": batch_size, "random_state": random_state, "n_docs": int(Z.shape[0]), "table": table,
+        }, indent=2), encoding="utf-8")
+    return table, km, labels
+
+
+def _sweep_one(Z, k: int, silhouette: str, sample_size: int, batch_size: int,
+               random_state: int) -> Tuple[Dict[str, Any], MiniBatchKMeans]:
+    """One kmeans_sweep row (and its model), run in a worker."""
+    t0 = time.perf_counter()
+    km = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, n_init="auto", random_state=random_state).fit(Z)
+    fit_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    if silhouette == "simplified":
+        sil = _simplified_silhouette(Z, km)
+    else:
+        sil = _sampled_silhouette(Z, km.labels_, sample_size, random_state)
+    row = {"k": k, "inertia": float(km.inertia_), "silhouette": round(float(sil), 6),
+           "fit_seconds": round(fit_s, 3), "score_seconds": round(time.perf_counter() - t0, 3)}
+    return row, km
+
+
+def _sampled_silhouette(Z, labels: np.ndarray, sample_size: Optional[int], random_state: int) -> float:
+    """silhouette_score, on a sample of sample_size rows once Z has more than that."""
+    if len(np.unique(labels)) < 2:
+        return -1.0
+    if sample_size is None or Z.shape[0] <= sample_size:
+        return float(silhouette_score(Z, labels, metric="euclidean"))
+    return float(silhouette_score(Z, labels, metric="euclidean", sample_size=sample_size,
+                                  random_state=random_state))
+
+
+def _simplified_silhouette(Z, km, chunk: int = 65536) -> float:
+    """
+    Mean of (b - a) / max(a, b) with a = distance to the own centroid and b =
+    distance to the nearest other centroid, over all rows, chunk rows at a time.
+    """
+    total, n = 0.0, Z.shape[0]
+    for start in range(0, n, chunk):
+        D = km.transform(Z[start:start + chunk])   # (rows, k) distances to centroids
+        own = km.labels_[start:start + chunk]
+        a = D[np.arange(D.shape[0]), own]
+        D[np.arange(D.shape[0]), own] = np.inf
+        b = D.min(axis=1)
+        denom = np.maximum(a, b)
+        total += np.where(denom > 0, (b - a) / np.where(denom > 0, denom, 1), 0.0).sum()
+    return total / n
+
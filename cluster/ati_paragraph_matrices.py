@@ -8,6 +8,7 @@ import psycopg
 from psycopg.rows import dict_row
 import json
 from base import CorpusBuilder, Vectorizer
+from topic_model import TopicModel
 from sklearn.pipeline import Pipeline
 import numpy as np
 
@@ -51,12 +52,15 @@ sql = """
 # X = v.fit_transform(builder)
 # v.save(bundle_dir, X=X, docs=builder.doc_ids) 
 
-def show_top_terms_per_topic(pipeline, n_top=15):
-    # Grab pieces
-    vectorizer = pipeline.named_steps["tfidf"]
-    model = pipeline.named_steps["nmf"]  # or "svd" if you're inspecting SVD components
+bundle_dir = Path("ati_para_run")
+
+def show_top_terms_per_topic(model, terms, n_top=15):
+    # model: fitted NMF (or TruncatedSVD if you're inspecting SVD components);
+    # a saved TopicModel prints from its top-term table instead
+    if isinstance(model, TopicModel):
+        model.show_top_terms(n_top)
+        return
     H = model.components_               # shape: (n_topics, n_terms)
-    terms = vectorizer.get_feature_names_out()
 
     for k, row in enumerate(H):
         top_idx = np.argsort(row)[::-1][:n_top]     # indices of largest weights
@@ -67,19 +71,29 @@ def show_top_terms_per_topic(pipeline, n_top=15):
         print()
 
 if __name__ == "__main__":
-    texts = list(CorpusBuilder(conn, sql))  # list of strings
-    pipe = Pipeline([
-        ("tfidf", TfidfVectorizer(**params)),
-        ("nmf", NMF(
-            n_components=200, init="nndsvd", random_state=0, max_iter=800, tol=1e-5, alpha_H=0.2, l1_ratio=0.5
-            # n_components=200, init="nndsvd", random_state=0, max_iter=400
-            ))
-    ])
-    W = pipe.fit_transform(texts)  # document-topic matrix
-    # H = pipe.named_steps["nmf"].components_
-
-
-    show_top_terms_per_topic(pipe)
+    # topics already in the bundle: load W/H/top terms, no refit (delete ati_para_run/topics.json to redo)
+    if TopicModel.exists(bundle_dir):
+        show_top_terms_per_topic(TopicModel.load(bundle_dir), None)
+        raise SystemExit
+
+    # streaming TF-IDF: two passes over the SELECT, paragraphs never all in memory;
+    # tokenizing (most of the fit) runs on every core, same X as serial
+    builder = CorpusBuilder(conn, sql)
+    v = Vectorizer(default_dir=bundle_dir, **params)
+    X = v.fit_transform(builder, streaming=True, n_jobs=-1)  # rows=paragraphs
+    v.save(bundle_dir, X=X, docs=builder.doc_ids)
+    v = Vectorizer.load(bundle_dir, strict=True, require_matrix=True)   # X memory-mapped
+
+    # online NMF: mini-batches of X rows instead of NMF(max_iter=800) over all of it;
+    # W, H and the top-term table are saved into the bundle
+    tm = TopicModel.fit(v, 200, alpha_H=0.2, l1_ratio=0.5)
+    tm.save(bundle_dir)
+    # nmf = NMF(
+    #     n_components=200, init="nndsvd", random_state=0, max_iter=800, tol=1e-5, alpha_H=0.2, l1_ratio=0.5
+    # )
+    # W = nmf.fit_transform(X)  # document-topic matrix
+
+    show_top_terms_per_topic(tm, v.feature_names())
 
     # vec = TfidfVectorizer(**params)              # your params
     # X = vec.fit_transform(list(CorpusBuilder(conn, sql)))            # rows=paragraphs
@@ -6,19 +6,16 @@ from typing import List, Dict, Any
 import numpy as np
 from scipy import sparse
 from sklearn.decomposition import NMF
-import spacy, unicodedata
-from spacy.pipeline import EntityRuler
+import unicodedata
 
 from base import Vectorizer, CorpusBuilder
 from local_settings import settings
+from topic_model import TopicModel
 
 
 def undiacritic(s):
     return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
 
-nlp = spacy.load("en_core_web_md")
-ruler = nlp.add_pipe("entity_ruler", before="ner")
-
 names = [
     ("PERSON", "Sāriputta"), ("PERSON", "Sariputta"),
     ("PERSON", "Ānanda"), ("PERSON", "Ananda"),
@@ -39,7 +36,16 @@ names = [
 
 ]
 patterns = [{"label": lbl, "pattern": pat} for lbl, pat in names]
-ruler.add_patterns(patterns)
+
+
+def load_ner():
+    """en_core_web_md with the names above as an entity_ruler (loaded on call, not at import)."""
+    import spacy
+
+    nlp = spacy.load("en_core_web_md")
+    ruler = nlp.add_pipe("entity_ruler", before="ner")
+    ruler.add_patterns(patterns)
+    return nlp
 
 
 def ensure_bundle(v: Vectorizer):
@@ -81,38 +87,50 @@ def top_docs(W: np.ndarray, docs: List[Dict[str,Any]], j: int, k: int = 5):
     idx = idx[np.argsort(-col[idx], kind="stable")]
     return [{**docs[i], "weight": float(col[i])} for i in idx]
 
+SPARSE_NMF = {"alpha_W": 0.1, "alpha_H": 0.1, "l1_ratio": 0.5}
+
+def load_or_fit_topics(v: Vectorizer, bundle_dir: Path, k_topics=20, sparsity=False) -> TopicModel:
+    """Topics saved in the bundle if fit on this X with these settings, else fit (mini-batch) and save."""
+    nmf_params = SPARSE_NMF if sparsity else {}
+    if TopicModel.exists(bundle_dir):
+        tm = TopicModel.load(bundle_dir)
+        if tm.matches(v, k_topics, **nmf_params):
+            return tm
+    tm = TopicModel.fit(v, k_topics, **nmf_params)
+    tm.save(bundle_dir)
+    return tm
+
+def print_topics(tm: TopicModel, docs: List[Dict[str, Any]], k_topics: int):
+    for j in range(min(k_topics, tm.H.shape[0])):
+        print(f"\nTopic {j:02d} terms:", [t for t, _ in tm.top_terms(j, 12)])
+        for row in tm.top_docs(j, 5, docs=docs):
+            print(f"{row['identifier']:<22} {row['title'][:48]:48}  w={row['weight']:.3f}")
+
 def run_from_bundle(bundle_dir: Path, k_topics=20, sparsity=False):
     v = Vectorizer.load(bundle_dir, strict=True, require_matrix=True, require_index=True)
     X, docs, terms = ensure_bundle(v)
-    nmf, W, H = fit_nmf(X, k=k_topics, sparsity=sparsity)
-
-    for j in range(min(k_topics, H.shape[0])):
-        tt = top_terms(H, terms, j, 12)
-        print(f"\nTopic {j:02d} terms:", [t for t,_ in tt])
-        for row in top_docs(W, docs, j, 5):
-            print(f"{row['identifier']:<22} {row['title'][:48]:48}  w={row['weight']:.3f}")
+    # saved W/H are reused: no refit on later runs
+    tm = load_or_fit_topics(v, bundle_dir, k_topics=k_topics, sparsity=sparsity)
+    print_topics(tm, docs, k_topics)
 
 def build_then_run(conn, sql: str, out_dir: Path, k_topics=25, sparsity=False):
-    # Build corpus once (materialize to avoid exhausted iterators)
-    builder = CorpusBuilder(conn, sql)
-    texts = list(builder)
-    docs = builder.doc_index if hasattr(builder, "doc_index") else builder.doc_ids
+    # Stream the corpus: the fit pass reads Postgres through a server-side cursor
+    # and spills to out_dir/corpus.bin; the transform pass replays that file.
+    # refresh: a spill left by an earlier run may predate edits to the rows
+    builder = CorpusBuilder(conn, sql, cache_path=out_dir / "corpus.bin", refresh=True)
 
     # Fit TF-IDF
     v = Vectorizer(default_dir=out_dir, **settings["TFIDF"])
-    X = v.fit_transform(texts)
+    X = v.fit_transform(builder, streaming=True)
+    docs = builder.doc_ids
     v.set_doc_index(docs)
     v.save(X=X, docs=docs)  # persist bundle for reuse
 
-    # Topic modeling
-    nmf, W, H = fit_nmf(X, k=k_topics, sparsity=sparsity)
-    terms = v.feature_names()
-
-    for j in range(min(k_topics, H.shape[0])):
-        tt = top_terms(H, terms, j, 12)
-        print(f"\nTopic {j:02d} terms:", [t for t,_ in tt])
-        for row in top_docs(W, docs, j, 5):
-            print(f"{row['identifier']:<22} {row['title'][:48]:48}  w={row['weight']:.3f}")
+    # Topic modeling: X is new, so fit (mini-batch over the saved X) and persist W/H next to it
+    v = Vectorizer.load(out_dir, strict=True, require_matrix=True, require_index=True)
+    tm = TopicModel.fit(v, k_topics, **(SPARSE_NMF if sparsity else {}))
+    tm.save(out_dir)
+    print_topics(tm, docs, k_topics)
 
 if __name__ == "__main__":
     # --- choose ONE path below ---
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Candidate related-sutta links from content similarity, next to the scraped
+ATI "See also" links in ati_related_links.
+
+All-pairs cosine over a saved Vectorizer bundle (TF-IDF rows, or the LSA
+vectors of Vectorizer.lsa, cached in the bundle, with --space lsa) is computed block by block with
+base.all_pairs_similarity, so memory follows --block-size rather than N^2,
+and blocks run on --jobs worker processes. Pairs are streamed into
+ati_related_links with source_kind='tfidf' (both spaces; context names the
+space, and --source-kind keeps an LSA run apart), score as confidence.
+
+    python graph/scripts/compute_tfidf_related.py --bundle tfidf_run --top-k 10 --threshold 0.2
+    python graph/scripts/compute_tfidf_related.py --bundle tfidf_run --threshold 0.5 --space lsa --dry-run
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import psycopg
+
+REPO_ROOT = Path(__file__).resolve().parents[2]  # scripts -> graph -> <repo root>
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+from base import Vectorizer, all_pairs_similarity  # noqa: E402
+
+PG_DSN_DEFAULT = "dbname=tipitaka user=alee"
+
+DELETE_SQL = """
+DELETE FROM ati_related_links WHERE source_kind = %(source_kind)s;
+"""
+
+INSERT_SQL = """
+INSERT INTO ati_related_links
+  (from_identifier, from_path, to_identifier, source_kind, confidence, context)
+VALUES
+  (%(from_identifier)s, '', %(to_identifier)s, %(source_kind)s, %(confidence)s, %(context)s)
+ON CONFLICT (from_identifier, to_identifier, to_href, to_ref_label, source_kind)
+DO UPDATE SET confidence = EXCLUDED.confidence, context = EXCLUDED.context;
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write all-pairs TF-IDF/LSA cosine candidates into ati_related_links.")
+    parser.add_argument("--bundle", required=True, help="Vectorizer bundle dir (X + doc index)")
+    parser.add_argument("--space", choices=("tfidf", "lsa"), default="tfidf")
+    parser.add_argument("--n-components", type=int, default=200, help="LSA dimensions for --space lsa")
+    parser.add_argument("--threshold", type=float, default=None, help="Keep pairs with cosine >= this")
+    parser.add_argument("--top-k", type=int, default=None, help="Keep each doc's k best (directed from -> to)")
+    parser.add_argument("--block-size", type=int, default=1024, help="Rows per block; memory ~ block x N scores")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 = all cores)")
+    parser.add_argument("--source-kind", default="tfidf",
+                        help="ati_related_links.source_kind to write (and replace); 'tfidf' for either --space")
+    parser.add_argument("--pg-dsn", default=PG_DSN_DEFAULT)
+    parser.add_argument("--keep-old", action="store_true", help="Don't delete earlier rows of this source_kind first")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.threshold is None and args.top_k is None:
+        parser.error("give --threshold, --top-k, or both")
+
+    v = Vectorizer.load(Path(args.bundle), strict=False, require_matrix=True, require_index=True)
+    M = v._x_csr
+    if args.space == "lsa":
+        M, _, evr, _ = v.lsa(args.n_components)
+        print(f"LSA: {M.shape[1]} components, {evr.sum():.1%} of variance")
+    identifiers = v.identifiers()
+    source_kind = args.source_kind
+    print(f"Docs: {len(identifiers)}, space: {args.space}, threshold: {args.threshold}, top-k: {args.top_k}")
+
+    started = time.perf_counter()
+    blocks = all_pairs_similarity(M, threshold=args.threshold, top_k=args.top_k,
+                                  block_size=args.block_size, n_jobs=args.jobs)
+    written = 0
+    if args.dry_run:
+        for rows_i, _, scores in blocks:
+            written += len(rows_i)
+    else:
+        with psycopg.connect(args.pg_dsn) as conn, conn.cursor() as cur:   # one transaction
+            if not args.keep_old:
+                cur.execute(DELETE_SQL, {"source_kind": source_kind})
+            for rows_i, rows_j, scores in blocks:
+                batch = [
+                    {
+                        "from_identifier": identifiers[i],
+                        "to_identifier": identifiers[j],
+                        "source_kind": source_kind,
+                        "confidence": float(score),
+                        "context": f"{args.space} cosine {score:.4f}",
+                    }
+                    for i, j, score in zip(rows_i.tolist(), rows_j.tolist(), scores.tolist())
+                ]
+                if batch:
+                    cur.executemany(INSERT_SQL, batch)
+                written += len(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"{'Would write' if args.dry_run else 'Wrote'} {written} candidate links "
+          f"(source_kind={source_kind}) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
+import argparse
 import csv
+import os
+import sys
 import spacy
 import unicodedata
 import psycopg
 from psycopg.rows import dict_row
-from collections import defaultdict
 import json
 
 nlp = spacy.load("en_sutta_ner")
@@ -25,9 +27,12 @@ def read_people_csv(filename):
         #     print (person.strip()) 
 
 
-def get_gold_persons():
-    people = defaultdict(list)
-
+def get_gold_persons(limit=None, itersize=100):
+    """
+    Yield (name, verses) for each gold PERSON span, verses being up to 16
+    (identifier, verse_num) pairs. The names come from a named (server-side)
+    cursor, so they stream in itersize at a time instead of via fetchall().
+    """
     sql = '''
         WITH spans AS (
         SELECT
@@ -43,39 +48,46 @@ def get_gold_persons():
         FROM spans
         WHERE label='PERSON'
         AND substring(text from s+1 for e-s) ~ '[A-Za-z]'
-        ORDER BY 1;
+        ORDER BY 1
+        LIMIT %(limit)s;  -- NULL = no limit
     '''
-    with CONN.cursor() as cur:
-        cur.execute(sql)
-        rows = cur.fetchall()
-        for (row,) in rows:
-            print(row)
-            name = row
-            params = {"term": name}
-            inner_sql = ''' 
-                WITH q AS (
-                    SELECT websearch_to_tsquery('english', %(term)s) AS tsq
-                    )
-                    SELECT s.identifier,
-                        t.ord AS verse_num
-                    FROM ati_suttas s
-                    CROSS JOIN LATERAL jsonb_array_elements(s.verses) WITH ORDINALITY AS t(v, ord)
-                    CROSS JOIN q
-                    WHERE to_tsvector('english', t.v->>'text') @@ q.tsq
-                    ORDER BY s.identifier, verse_num limit 16;
-                '''
-            cur.execute(inner_sql, params)
-            for csv_row in cur.fetchall():
-                people[name].append(csv_row)
-                # print(people)
-    return people
+    inner_sql = '''
+        WITH q AS (
+            SELECT websearch_to_tsquery('english', %(term)s) AS tsq
+            )
+            SELECT v.identifier,
+                v.ord AS verse_num
+            FROM ati_verse_search v
+            CROSS JOIN q
+            WHERE v.tsv @@ q.tsq
+            ORDER BY v.identifier, verse_num limit 16;
+        '''
+    with CONN, CONN.cursor(name="gold_persons") as cur, CONN.cursor() as verses:
+        cur.itersize = itersize
+        cur.execute(sql, {"limit": limit})
+        for (name,) in cur:
+            print(name, flush=True)
+            verses.execute(inner_sql, {"term": name})
+            matches = list(verses)
+            if matches:
+                yield name, matches
+
 
 if __name__ == "__main__":
-    people = get_gold_persons()
-    with open("people.jsonl", "w", encoding="utf-8") as f:
-        
-        for name, matches in people.items():
-            record = { "name" : name, "verses" : matches }
-            f.write(f"{json.dumps(record, ensure_ascii=False)}\n")
-            # line = f"{json.dumps(name, ensure_ascii=False)}, {json.dumps(matches, ensure_ascii=False)}\n"
-            # line
+    parser = argparse.ArgumentParser(description="Verses mentioning each gold PERSON name, written to people.jsonl.")
+    parser.add_argument("--out", default="people.jsonl")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after N names (0 = all)")
+    parser.add_argument("--itersize", type=int, default=100,
+                        help="Rows fetched per round-trip from the server-side cursor")
+    args = parser.parse_args()
+    try:
+        # one record per name as soon as its verses are in, not after the whole run
+        with open(args.out, "w", encoding="utf-8") as f:
+            for name, matches in get_gold_persons(args.limit or None, args.itersize):
+                record = { "name" : name, "verses" : matches }
+                f.write(f"{json.dumps(record, ensure_ascii=False)}\n")
+    except BrokenPipeError:
+        # reader of the name progress went away (head): closing the cursor above stops
+        # the server side; point stdout at devnull so the final flush doesn't raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(0)
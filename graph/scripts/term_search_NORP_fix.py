@@ -7,20 +7,14 @@ SQL = '''
     WITH q AS (
     SELECT websearch_to_tsquery('english', %(term)s) AS tsq
     ),
-    para AS (
-    SELECT s.nikaya, s.identifier, s.title,
-            t.ord AS verse_num, (t.v->>'text') AS ptext
-    FROM ati_suttas s
-    CROSS JOIN LATERAL jsonb_array_elements(s.verses) WITH ORDINALITY AS t(v, ord)
-    ),
     sutta_hits AS (
-    SELECT p.nikaya, p.identifier, p.title,
-            SUM(ts_rank_cd(to_tsvector('english', p.ptext), q.tsq)) AS rank,
-            STRING_AGG(p.ptext, E'\n' ORDER BY p.verse_num)        AS paragraph
-    FROM para p
+    SELECT v.nikaya, v.identifier, v.title,
+            SUM(ts_rank_cd(v.tsv, q.tsq))                  AS rank,
+            STRING_AGG(v.ptext, E'\n' ORDER BY v.ord)      AS paragraph
+    FROM ati_verse_search v
     CROSS JOIN q
-    WHERE to_tsvector('english', p.ptext) @@ q.tsq
-    GROUP BY p.nikaya, p.identifier, p.title
+    WHERE v.tsv @@ q.tsq
+    GROUP BY v.nikaya, v.identifier, v.title
     )
     SELECT regexp_replace(trim(paragraph), E'[\\t\\n\\r]+', ' ', 'g') AS paragraph
     FROM sutta_hits
@@ -2,14 +2,22 @@
 # run it through sutta-ner
 # write back the span json as a JSONB field
 
-import spacy
+import sys
+from pathlib import Path
 import psycopg
 import json
 
+NE_SCRIPTS = Path(__file__).resolve().parents[2] / "ne-data" / "scripts"
+sys.path.insert(0, str(NE_SCRIPTS))
+
+from local_settings import load_package  # noqa: E402
+
 conn = psycopg.connect("dbname=tipitaka user=alee")
 conn.autocommit = False
 
-nlp = spacy.load("en_sutta_ner")  # should be 1.2.3
+# ner_span (and the mention/co-mention tables built from it) is doc.ents only,
+# so the span_ruler is never constructed
+nlp = load_package("ents-only")  # should be 1.2.3
 assert nlp.meta.get("version") == "1.2.3", "Wrong en_sutta_ner version installed!"
 
 
@@ -662,6 +662,8 @@ class AtiHtmlDocument:
 # ======================
 # DB I/O
 # ======================
+# ati_verse_search (per-paragraph tsvector + GIN) follows these upserts via the
+# triggers in sql/ati_verse_search.sql, in the same transaction.
 UPSERT_SQL = """
 INSERT INTO ati_suttas
 (identifier, raw_path, nikaya, vagga, book_number, doc_type,
@@ -16,10 +16,82 @@ settings = {
         "max_df": 0.85,
         "dtype": "float32",
     },
+    # Vectorizer.partial_update: past any limit since the last full fit, refit instead (None = not enforced)
+    "TFIDF_UPDATE": {
+        "max_added_ratio": 0.25,   # docs added or replaced / docs in the last full fit
+        "max_idf_shift": 0.05,     # mean |idf - idf at fit| / mean idf at fit
+        "max_oov_rate": None,      # share of new docs' words outside the vocabulary (max_df-pruned words count too)
+    },
     "BUNDLE":{
         "vectorizer": "vectorizer.joblib",
+        # format 1: compressed matrix + JSON doc index (still readable)
         "x_csr": "X.npz",
         "doc_index": "doc_index.json",
+        # format 2: raw CSR arrays and one array per doc_index field, memory-mapped by load()
+        "x_data": "X_data.npy",
+        "x_indices": "X_indices.npy",
+        "x_indptr": "X_indptr.npy",
+        "doc_column": "doc_{column}.npy",
+        "df": "df.npy",   # running document frequencies, kept by Vectorizer.partial_update
+        "idf_fit": "idf_fit.npy",   # idf_ as of the last full fit, for the drift measure
+        # cached LSA (Vectorizer.lsa): TruncatedSVD arrays + doc vectors Z, keyed in manifest["lsa"]
+        "lsa_components": "lsa_components.npy",
+        "lsa_singular_values": "lsa_singular_values.npy",
+        "lsa_explained_variance": "lsa_explained_variance.npy",
+        "lsa_explained_variance_ratio": "lsa_explained_variance_ratio.npy",
+        "lsa_z": "lsa_Z.npy",
+        # LSA "more like this": the index's own TruncatedSVD + IVF index over its doc vectors (base.AnnIndex)
+        "svd": "svd.joblib",
+        # topic_model.TopicModel: MiniBatchNMF, doc-topic W, topic-term H, W's doc_ids, info + top-term table
+        "topics_model": "topics_nmf.joblib",
+        "topics_W": "topics_W.npy",
+        "topics_H": "topics_H.npy",
+        "topics_doc_ids": "topics_doc_ids.npy",
+        "topics": "topics.json",
+        # kmeans_sweep: the chosen MiniBatchKMeans, its labels over Z, and the k -> score table
+        "kmeans": "kmeans.joblib",
+        "kmeans_labels": "kmeans_labels.npy",
+        "kmeans_sweep": "kmeans_sweep.json",
+        "ann_centroids": "ann_centroids.npy",
+        "ann_indptr": "ann_indptr.npy",
+        "ann_rows": "ann_rows.npy",
+        "ann_vectors": "ann_vectors.npy",
+        "manifest": "manifest.json"
+    },
+    # Vectorizer.lsa / fit_lsa
+    "LSA": {
+        "n_components": 200,
+        "random_state": 0,
+        "n_iter": 5,          # power iterations from a random start (TruncatedSVD default)
+        "warm_n_iter": 2,     # power iterations when starting from a cached basis
+    },
+    # topic_model.TopicModel.fit defaults; other MiniBatchNMF params (alpha_H, l1_ratio, ...) pass through
+    "TOPICS": {
+        "n_components": 200,
+        "batch_size": 2048,   # X rows per partial_fit step, read from the bundle's mmap
+        "epochs": 5,          # passes over X
+        "init": "nndsvda",
+        "random_state": 0,
+        "top_terms": 20,      # terms per topic kept in topics.json
+    },
+    "SEARCH": {
+        "k1": 1.2,
+        "b": 0.75,
+    },
+    "SEARCH_BUNDLE": {
+        # one set of postings per stream ("exact", "folded"); {stream} is filled in
+        "indptr": "{stream}_indptr.npy",
+        "postings": "{stream}_docs.npy",
+        "tf": "{stream}_tf.npy",
+        "vocab": "{stream}_vocab.json",
+        "pos_indptr": "{stream}_pos_indptr.npy",
+        "positions": "{stream}_positions.npy",
+        "token_starts": "token_starts.npy",
+        "token_ends": "token_ends.npy",
+        "doc_len": "doc_len.npy",
+        "texts": "texts.bin",
+        "text_offsets": "text_offsets.npy",
+        "doc_index": "doc_index.json",
         "manifest": "manifest.json"
     }
-}
\ No newline at end of file
+}
@@ -1,50 +1,88 @@
+import argparse
+import os
 import psycopg
 from psycopg.rows import dict_row
 import json
 import sys
 
 
-term = sys.argv[1]
+parser = argparse.ArgumentParser(
+    description="Per-sutta matched paragraphs / total hits for a term.",
+    epilog="--index gives the same JSON records, but counts differ from Postgres where stemming "
+           "matters: the index matches word tokens, not Snowball stems, so 'aggregate' does not "
+           "count 'aggregates'. Stop words are PostgreSQL's English list on both paths, and a "
+           "stop-word-only query matches nothing. Without --exact the index also folds diacritics.",
+)
+parser.add_argument("term")
+parser.add_argument("--index", default="",
+                    help="Count hits from a positional search_index.py bundle instead of Postgres "
+                         "(build it with: search_index.py build --source paragraphs); tokens, not stems")
+parser.add_argument("--exact", action="store_true",
+                    help="With --index: diacritics must match (as in the Postgres 'english' config)")
+parser.add_argument("--limit", type=int, default=0, help="Stop after N suttas (0 = all)")
+parser.add_argument("--itersize", type=int, default=100,
+                    help="Rows fetched per round-trip from the server-side cursor")
+args = parser.parse_args()
+term = args.term
 if not term:
     sys.exit(-1)
 
-conn = psycopg.connect("dbname=tipitaka user=alee")
-sql = """
-          WITH q AS (
-            SELECT plainto_tsquery('english', %(term)s) AS tsq
-            ),
-            para AS (
-            SELECT
-                s.id,
-                s.nikaya,
-                s.identifier,
-                s.title,
-                (e.elem->>'text') AS ptext
-            FROM ati_suttas s
-            CROSS JOIN LATERAL jsonb_array_elements(s.verses) AS e(elem)
-            )
-            SELECT
-            p.nikaya,
-            p.identifier,
-            p.title,
-            COUNT(*) AS matched_paragraphs,
-            /* PG14- fallback: (length(h.hl)-length(replace(h.hl,'<<','')))/2 */
-            SUM(regexp_count(h.hl, '<<')) AS total_hits
-            FROM para p
-            JOIN q ON to_tsvector('english', p.ptext) @@ q.tsq
-            CROSS JOIN LATERAL (
-            SELECT ts_headline(
-                    'english',
-                    p.ptext,
-                    q.tsq,
-                    'StartSel=<<, StopSel=>>, HighlightAll=TRUE, MaxFragments=100000, MaxWords=100000, MinWords=1'
-                    ) AS hl
-            ) AS h
-            GROUP BY p.nikaya, p.identifier, p.title
-            ORDER BY total_hits DESC, matched_paragraphs DESC, p.identifier;
-                   """
-params = {"term": term}
-with conn.cursor(row_factory=dict_row) as cur:
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    print(json.dumps(rows, indent=2, ensure_ascii=False))
+
+def print_json_rows(rows) -> None:
+    """
+    The same JSON array json.dumps(list(rows), indent=2) would give, written
+    one record at a time as rows arrive instead of after the last one.
+    """
+    sep = "[\n"
+    for row in rows:
+        record = json.dumps(row, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        sys.stdout.write(f"{sep}  {record}")
+        sys.stdout.flush()
+        sep = ",\n"
+    print("[]" if sep == "[\n" else "\n]", flush=True)
+
+
+try:
+    if args.index:
+        # same JSON, from token positions: no ts_headline re-parse of every matched paragraph
+        from search_index import VerseIndex
+
+        print_json_rows(VerseIndex.load(args.index).hit_counts(term, exact=args.exact, limit=args.limit))
+        sys.exit(0)
+
+    conn = psycopg.connect("dbname=tipitaka user=alee")
+    sql = """
+              WITH q AS (
+                SELECT plainto_tsquery('english', %(term)s) AS tsq
+                )
+                SELECT
+                v.nikaya,
+                v.identifier,
+                v.title,
+                COUNT(*) AS matched_paragraphs,
+                /* PG14- fallback: (length(h.hl)-length(replace(h.hl,'<<','')))/2 */
+                SUM(regexp_count(h.hl, '<<')) AS total_hits
+                FROM ati_verse_search v          -- stored tsvector + GIN (sql/ati_verse_search.sql)
+                JOIN q ON v.tsv @@ q.tsq
+                CROSS JOIN LATERAL (
+                SELECT ts_headline(
+                        'english',
+                        v.ptext,
+                        q.tsq,
+                        'StartSel=<<, StopSel=>>, HighlightAll=TRUE, MaxFragments=100000, MaxWords=100000, MinWords=1'
+                        ) AS hl
+                ) AS h
+                GROUP BY v.nikaya, v.identifier, v.title
+                ORDER BY total_hits DESC, matched_paragraphs DESC, v.identifier
+                LIMIT %(limit)s;  -- NULL = no limit
+                       """
+    params = {"term": term, "limit": args.limit or None}
+    # named (server-side) cursor: no fetchall(), records print as they are fetched
+    with conn, conn.cursor(name="fuzzyish_search", row_factory=dict_row) as cur:
+        cur.itersize = args.itersize
+        cur.execute(sql, params)
+        print_json_rows(cur)
+except BrokenPipeError:
+    # reader went away (head): stop quietly, without a second error on the final flush
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    sys.exit(0)
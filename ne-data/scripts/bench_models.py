@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Throughput + accuracy benchmark across the packaged en_sutta_ner versions.
+
+Every version under dist/ (or the ones named with --version) is run in its own
+fresh process over the same DocBins, so load time and peak RSS are not
+polluted by the previous model. Per version and DocBin we record:
+
+    load_seconds, docs/sec, words/sec (best of --repeat), peak RSS,
+    ents_p / ents_r / ents_f and per-label P/R/F
+
+Each run appends one JSON line per version to --history. Every version is
+compared with the previous version in the run and with its own last entry in
+the history from the same host. A drop in docs/sec beyond --max-slowdown, or in
+any F (overall or per label) beyond --max-f-drop, is flagged, and with --strict
+the script exits 1. That lets it gate a release.
+
+    python ne-data/scripts/bench_models.py
+    python ne-data/scripts/bench_models.py --version 1.2.3 --version 1.2.4 --strict
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+# The spawned bench_version() child re-imports this module, and that child
+# imports config_helpers, so put both homes of it on the path here instead of
+# trusting how the parent was launched (cwd, python -m, an IDE runner).
+REPO_ROOT = Path(__file__).resolve().parents[2]  # scripts -> ne-data -> <repo root>
+for _path in (Path(__file__).resolve().parent, REPO_ROOT):
+    if str(_path) not in sys.path:
+        sys.path.append(str(_path))
+
+from local_settings import DIST, WORK, INFERENCE_PROFILES  # noqa: E402
+
+DEFAULT_DOCBINS = [WORK / "gold_training.spacy", WORK / "test_from_db.spacy"]
+DEFAULT_HISTORY = WORK / "bench" / "history.jsonl"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark dist/en_sutta_ner versions for speed and accuracy.")
+    parser.add_argument("--version", action="append", help="Version(s) to run, e.g. 1.2.4 (default: all in dist/)")
+    parser.add_argument("--docbin", action="append", type=Path,
+                        help="Gold DocBin(s) (default: gold_training.spacy, test_from_db.spacy)")
+    parser.add_argument("--profile", choices=sorted(INFERENCE_PROFILES), default="full-with-LOC_PHRASES",
+                        help="Inference profile to load each version with")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing per DocBin")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSONL results file (appended)")
+    parser.add_argument("--max-slowdown", type=float, default=0.10,
+                        help="Flag a docs/sec drop larger than this fraction (default 0.10)")
+    parser.add_argument("--max-f-drop", type=float, default=0.01,
+                        help="Flag an F drop larger than this, in absolute points of 0-1 F (default 0.01)")
+    parser.add_argument("--strict", action="store_true", help="Exit 1 if any regression is flagged")
+    return parser.parse_args()
+
+
+# ---------- versions ----------
+def _version_key(version: str) -> tuple[int, ...]:
+    return tuple(int(x) for x in version.split("."))
+
+
+def dist_versions() -> list[str]:
+    versions = []
+    for path in DIST.glob("en_sutta_ner-*"):
+        version = path.name.split("-", 1)[1]
+        if (path / "en_sutta_ner" / path.name).exists():
+            versions.append(version)
+    return sorted(versions, key=_version_key)
+
+
+def dist_model_path(version: str) -> Path:
+    path = DIST / f"en_sutta_ner-{version}" / "en_sutta_ner" / f"en_sutta_ner-{version}"
+    if not path.exists():
+        raise SystemExit(f"No packaged model for version {version} at {path}")
+    return path
+
+
+# ---------- one version, in a child process ----------
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024   # bytes on macOS, kB on Linux
+
+
+def bench_version(version: str, docbins: list[str], profile: str, batch_size: int, repeat: int) -> dict:
+    import spacy
+    import config_helpers  # noqa: F401  registers custom registry hooks for the packaged models
+    from spacy.scorer import Scorer
+    from spacy.tokens import DocBin
+    from spacy.training import Example
+
+    rss_before_load = _peak_rss_mb()
+    t0 = time.perf_counter()
+    nlp = spacy.load(dist_model_path(version), **INFERENCE_PROFILES[profile])
+    load_seconds = time.perf_counter() - t0
+    rss_after_load = _peak_rss_mb()
+    scorer = Scorer(nlp)
+
+    results = {}
+    for path in map(Path, docbins):
+        gold = list(DocBin().from_disk(path).get_docs(nlp.vocab))
+        texts = [doc.text for doc in gold]
+        n_words = sum(len(doc) for doc in gold)
+        list(nlp.pipe(texts[:20], batch_size=batch_size))   # warm-up
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            predicted = list(nlp.pipe(texts, batch_size=batch_size))
+            best = min(best, time.perf_counter() - t0)
+        scores = scorer.score([Example(pred, ref) for pred, ref in zip(predicted, gold)])
+        results[path.name] = {
+            "docs": len(gold),
+            "words": n_words,
+            "seconds": round(best, 4),
+            "docs_per_sec": round(len(gold) / best, 1),
+            "words_per_sec": round(n_words / best, 1),
+            "ents_p": scores.get("ents_p"),
+            "ents_r": scores.get("ents_r"),
+            "ents_f": scores.get("ents_f"),
+            "ents_per_type": scores.get("ents_per_type") or {},
+        }
+
+    return {
+        "version": version,
+        "profile": profile,
+        "pipeline": list(nlp.pipe_names),
+        "load_seconds": round(load_seconds, 3),
+        "load_rss_mb": round(rss_after_load - rss_before_load, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "docbins": results,
+    }
+
+
+def run_isolated(version: str, args: argparse.Namespace) -> dict:
+    # one process per version (spawned, not forked) so load time and ru_maxrss are its own
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(bench_version, version, [str(p) for p in args.docbin],
+                           args.profile, args.batch_size, args.repeat).result()
+
+
+# ---------- history + regressions ----------
+def read_history(path: Path) -> dict[tuple[str, str], dict]:
+    """Latest entry per (version, profile)."""
+    latest: dict[tuple[str, str], dict] = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    row = json.loads(line)
+                    latest[(row["version"], row.get("profile", ""))] = row
+    return latest
+
+
+def compare(row: dict, base: dict, max_slowdown: float, max_f_drop: float) -> list[str]:
+    problems = []
+    for name, cur in row["docbins"].items():
+        ref = base["docbins"].get(name)
+        if not ref:
+            continue
+        if ref["docs_per_sec"] and cur["docs_per_sec"] < ref["docs_per_sec"] * (1.0 - max_slowdown):
+            problems.append(f"{name}: docs/sec {ref['docs_per_sec']} -> {cur['docs_per_sec']}")
+        if (ref["ents_f"] or 0.0) - (cur["ents_f"] or 0.0) > max_f_drop:
+            problems.append(f"{name}: ents_f {ref['ents_f']:.4f} -> {cur['ents_f']:.4f}")
+        for label, ref_scores in ref["ents_per_type"].items():
+            cur_f = cur["ents_per_type"].get(label, {}).get("f", 0.0)
+            if ref_scores.get("f", 0.0) - cur_f > max_f_drop:
+                problems.append(f"{name}: {label} F {ref_scores['f']:.4f} -> {cur_f:.4f}")
+    return problems
+
+
+def print_row(row: dict) -> None:
+    print(f"\nen_sutta_ner {row['version']} [{row['profile']}]  load {row['load_seconds']:.2f}s  "
+          f"peak RSS {row['peak_rss_mb']:.0f} MB (model {row['load_rss_mb']:.0f} MB)")
+    for name, r in row["docbins"].items():
+        print(f"  {name:<24} {r['docs']:>6} docs  {r['docs_per_sec']:>8.1f} docs/s  {r['words_per_sec']:>9.1f} words/s  "
+              f"P={r['ents_p']:.4f} R={r['ents_r']:.4f} F={r['ents_f']:.4f}")
+        labels = "  ".join(f"{label}={s['f']:.3f}" for label, s in sorted(r["ents_per_type"].items()))
+        print(f"  {'':<24} {labels}")
+    for problem in row["regressions"]:
+        print(f"  REGRESSION {problem}")
+
+
+def main() -> None:
+    args = parse_args()
+    args.docbin = args.docbin or [p for p in DEFAULT_DOCBINS if p.exists()]
+    if not args.docbin:
+        raise SystemExit("No DocBins to benchmark.")
+    versions = sorted(args.version or dist_versions(), key=_version_key)
+    history = read_history(args.history)
+    run_id = datetime.now(tz=timezone.utc).isoformat()
+
+    rows = []
+    for version in versions:
+        row = run_isolated(version, args)
+        row["regressions"] = []
+        if rows:
+            row["regressions"] += [f"vs {rows[-1]['version']}: {p}"
+                                   for p in compare(row, rows[-1], args.max_slowdown, args.max_f_drop)]
+        previous = history.get((version, args.profile))
+        if previous and previous.get("host") == platform.node():   # speeds only compare on the same box
+            row["regressions"] += [f"vs history {previous['created_at'][:10]}: {p}"
+                                   for p in compare(row, previous, args.max_slowdown, args.max_f_drop)]
+        row.update({"created_at": run_id, "host": platform.node(), "python": platform.python_version(),
+                    "batch_size": args.batch_size, "repeat": args.repeat})
+        rows.append(row)
+        print_row(row)
+
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    with args.history.open("a", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+    flagged = [row["version"] for row in rows if row["regressions"]]
+    print(f"\nWrote {len(rows)} rows to {args.history}"
+          + (f"; regressions in {', '.join(flagged)}" if flagged else "; no regressions"))
+    if flagged and args.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
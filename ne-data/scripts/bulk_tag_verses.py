@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Re-tag ati_verses.ner_span in bulk.
+
+Verses are streamed from Postgres through a server-side cursor in id order,
+cut into chunks, and fanned out to worker processes that each load the model
+once and run nlp.pipe. Results are written back in chunk order (COPY into a
+temp table + one UPDATE, or a batched UPDATE ... FROM unnest), and the last
+written id is checkpointed so an interrupted run picks up where it stopped.
+
+Only stale verses are tagged: rows whose ner_model_fingerprint differs from
+the model being run, or whose cleaned_text_hash moved since they were tagged
+(see sql/ati_verses_ner_provenance.sql). --all re-tags everything.
+
+    python ne-data/scripts/bulk_tag_verses.py --workers 6
+    python ne-data/scripts/bulk_tag_verses.py --restart --model ne-data/work/models/2026_02_10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import psycopg
+import spacy
+
+from local_settings import INFERENCE_PROFILES
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT))
+
+from web.app.api.ner_cache import model_fingerprint
+
+DEFAULT_CHECKPOINT = REPO_ROOT / "ne-data" / "work" / "bulk_tag.checkpoint.json"
+
+SELECT_SQL = """
+    SELECT id, text, cleaned_text_hash
+    FROM ati_verses
+    WHERE id > %(after_id)s
+      AND (%(all)s
+           OR ner_span IS NULL
+           OR ner_model_fingerprint IS DISTINCT FROM %(fingerprint)s
+           OR ner_text_hash IS DISTINCT FROM cleaned_text_hash)
+    ORDER BY id
+"""
+
+UPDATE_SQL = """
+    UPDATE ati_verses AS v
+    SET ner_span = u.ner_span,
+        ner_text_hash = u.text_hash,
+        ner_model_version = %(version)s,
+        ner_model_fingerprint = %(fingerprint)s,
+        ner_tagged_at = now()
+    FROM (
+        SELECT unnest(%(ids)s::bigint[]) AS id,
+               unnest(%(spans)s::jsonb[]) AS ner_span,
+               unnest(%(hashes)s::text[]) AS text_hash
+    ) AS u
+    WHERE v.id = u.id
+"""
+
+COPY_TEMP_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS ner_span_load (
+        id        bigint PRIMARY KEY,
+        ner_span  jsonb NOT NULL,
+        text_hash text
+    ) ON COMMIT DELETE ROWS
+"""
+
+COPY_UPDATE_SQL = """
+    UPDATE ati_verses AS v
+    SET ner_span = l.ner_span,
+        ner_text_hash = l.text_hash,
+        ner_model_version = %(version)s,
+        ner_model_fingerprint = %(fingerprint)s,
+        ner_tagged_at = now()
+    FROM ner_span_load AS l
+    WHERE v.id = l.id
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk NER re-tag of ati_verses.ner_span.")
+    parser.add_argument("--dsn", default="dbname=tipitaka user=alee",
+                        help="Postgres DSN (default: dbname=tipitaka user=alee)")
+    parser.add_argument("--model", default="en_sutta_ner",
+                        help="spaCy model path or package name (default: en_sutta_ner)")
+    parser.add_argument("--profile", choices=sorted(INFERENCE_PROFILES), default="ents-only",
+                        help="Inference profile; ner_span only needs doc.ents (default: ents-only)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Worker processes, each holding one copy of the model")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="Verses per worker task / per DB write")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="nlp.pipe batch size inside each worker")
+    parser.add_argument("--write", choices=("copy", "update"), default="copy",
+                        help="COPY into a temp table then UPDATE, or a batched UPDATE ... FROM unnest")
+    parser.add_argument("--checkpoint", default=str(DEFAULT_CHECKPOINT),
+                        help="File holding the last written verse id")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and start from the first verse")
+    parser.add_argument("--all", action="store_true",
+                        help="Re-tag every verse, not just those with a stale model or changed text")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="Stop after this many verses (0 = no limit)")
+    return parser.parse_args()
+
+
+# ---------- model identity ----------
+def describe_model(model: str, profile: str) -> tuple[str, str]:
+    nlp = spacy.load(model, **INFERENCE_PROFILES[profile])
+    return nlp.meta.get("version") or "", model_fingerprint(nlp)
+
+
+# ---------- checkpoint ----------
+def read_checkpoint(path: Path, fingerprint: str) -> int:
+    if not path.exists():
+        return 0
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("fingerprint") != fingerprint:
+        # different model: the stale filter already skips finished rows, start from the top
+        return 0
+    return int(data.get("last_id") or 0)
+
+
+def write_checkpoint(path: Path, last_id: int, model: str, fingerprint: str, total: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({
+        "last_id": last_id,
+        "model": model,
+        "fingerprint": fingerprint,
+        "verses": total,
+        "updated_at": datetime.now(tz=timezone.utc).isoformat(),
+    }, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ---------- workers ----------
+_NLP = None
+_BATCH_SIZE = 64
+
+
+def _init_worker(model: str, profile: str, batch_size: int) -> None:
+    global _NLP, _BATCH_SIZE
+    _NLP = spacy.load(model, **INFERENCE_PROFILES[profile])
+    _BATCH_SIZE = batch_size
+
+
+def doc_to_spans(doc) -> list[dict]:
+    return [
+        {
+            "start": ent.start_char,
+            "end": ent.end_char,
+            "label": ent.label_,
+            "text": ent.text,
+        }
+        for ent in doc.ents
+    ]
+
+
+def tag_chunk(rows: list[tuple[int, str, str | None]]) -> list[tuple[int, str, str | None]]:
+    texts = [text or "" for _, text, _ in rows]
+    docs = _NLP.pipe(texts, batch_size=_BATCH_SIZE)
+    return [
+        (verse_id, json.dumps(doc_to_spans(doc), ensure_ascii=False), text_hash)
+        for (verse_id, _, text_hash), doc in zip(rows, docs)
+    ]
+
+
+# ---------- db i/o ----------
+def iter_chunks(conn: psycopg.Connection, params: dict, chunk_size: int, limit: int):
+    """Server-side cursor: only `itersize` rows are held client-side at a time."""
+    seen = 0
+    with conn.cursor(name="bulk_tag_verses") as cur:
+        cur.itersize = chunk_size
+        cur.execute(SELECT_SQL, params)
+        chunk: list[tuple[int, str, str | None]] = []
+        for verse_id, text, text_hash in cur:
+            chunk.append((int(verse_id), text, text_hash))
+            seen += 1
+            if len(chunk) >= chunk_size or (limit and seen >= limit):
+                yield chunk
+                chunk = []
+            if limit and seen >= limit:
+                break
+        if chunk:
+            yield chunk
+
+
+def write_results(conn: psycopg.Connection, results: list[tuple[int, str, str | None]], mode: str,
+                  version: str, fingerprint: str) -> None:
+    model_params = {"version": version, "fingerprint": fingerprint}
+    with conn.cursor() as cur:
+        if mode == "copy":
+            cur.execute(COPY_TEMP_SQL)
+            with cur.copy("COPY ner_span_load (id, ner_span, text_hash) FROM STDIN") as copy:
+                for row in results:
+                    copy.write_row(row)
+            cur.execute(COPY_UPDATE_SQL, model_params)
+        else:
+            cur.execute(UPDATE_SQL, {
+                **model_params,
+                "ids": [verse_id for verse_id, _, _ in results],
+                "spans": [spans for _, spans, _ in results],
+                "hashes": [text_hash for _, _, text_hash in results],
+            })
+    conn.commit()
+
+
+def main() -> None:
+    args = parse_args()
+    checkpoint = Path(args.checkpoint)
+    version, fingerprint = describe_model(args.model, args.profile)
+    print(f"Model {args.model} version={version} fingerprint={fingerprint[:12]}")
+    after_id = 0 if args.restart else read_checkpoint(checkpoint, fingerprint)
+    if after_id:
+        print(f"Resuming after verse id {after_id} ({checkpoint})")
+    params = {"after_id": after_id, "all": args.all, "fingerprint": fingerprint}
+
+    total = 0
+    started = time.perf_counter()
+    ctx = get_context("spawn")  # spaCy + fork-after-threads is fragile on macOS
+    with psycopg.connect(args.dsn) as read_conn, psycopg.connect(args.dsn) as write_conn, \
+            ctx.Pool(args.workers, initializer=_init_worker, initargs=(args.model, args.profile, args.batch_size)) as pool:
+        pending: deque = deque()
+        chunks = iter_chunks(read_conn, params, args.chunk_size, args.limit)
+        max_in_flight = args.workers * 2   # keeps memory flat no matter how big the table is
+
+        def drain_one():
+            nonlocal total
+            results = pending.popleft().get()
+            write_results(write_conn, results, args.write, version, fingerprint)
+            total += len(results)
+            last_id = results[-1][0]
+            write_checkpoint(checkpoint, last_id, args.model, fingerprint, total)
+            rate = total / max(time.perf_counter() - started, 1e-9)
+            print(f"{total} verses  {rate:.1f} verses/sec  last_id={last_id}", flush=True)
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(tag_chunk, (chunk,)))
+            if len(pending) >= max_in_flight:
+                drain_one()
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - started
+    if not total:
+        print("Nothing stale: every verse was tagged by this model from its current text.")
+    print(f"Done. Tagged {total} verses in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} verses/sec)")
+
+
+if __name__ == "__main__":
+    main()
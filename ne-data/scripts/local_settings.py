@@ -15,6 +15,7 @@ REPO_ROOT = Path(os.environ.get("REPO_ROOT", REPO_ROOT))
 NE_DATA     = REPO_ROOT / "ne-data"
 WORK        = NE_DATA / "work"
 SCRIPTS     = NE_DATA / "scripts"
+DIST        = REPO_ROOT / "dist"          # packaged en_sutta_ner-X.Y.Z versions
 
 MODELS_DIR  = WORK / "models" / "2026_02_10"
 PATTERNS    = NE_DATA / "patterns" / "entity_ruler" / "patterns.jsonl"
@@ -33,19 +34,46 @@ for p in ( NE_DATA, WORK, SCRIPTS,
     MODELS_DIR, PATTERNS.parent, ):
     p.mkdir(parents=True, exist_ok=True)
 
+##################################
+#### inference profiles
+##################################
+# name -> spacy.load() kwargs. Pick the smallest profile that covers what the
+# caller reads; excluded pipes are never constructed, so they cost nothing.
+#   ner-only               doc.ents from the statistical ner alone
+#   ents-only              doc.ents as stored in ati_verses.ner_span (ner + both entity rulers)
+#   full-with-LOC_PHRASES  ents + doc.spans["LOC_PHRASES"] from the span_ruler
+INFERENCE_PROFILES = {
+    "ner-only": {"exclude": ["entity_ruler", "norp_head_ruler", "span_ruler"]},
+    "ents-only": {"exclude": ["span_ruler"]},
+    "full-with-LOC_PHRASES": {},
+}
+DEFAULT_PROFILE = "full-with-LOC_PHRASES"
+
+
+def load_package(profile=DEFAULT_PROFILE, name="en_sutta_ner"):
+    """spacy.load() a packaged model (or model dir) with the profile's exclude/disable set."""
+    if profile not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {sorted(INFERENCE_PROFILES)}")
+    nlp = spacy.load(name, **INFERENCE_PROFILES[profile])
+    print(f"Loaded {name} [{profile}]:", nlp.pipe_names)
+    return nlp
+
+
 ##################################
 #### load_model 
 ##################################
 
-def load_model():
-    print(f"Loading local NER model from {MODELS_DIR}")
-    nlp = spacy.load(MODELS_DIR)
+def load_model(profile=DEFAULT_PROFILE):
+    if profile not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {sorted(INFERENCE_PROFILES)}")
+    excluded = set(INFERENCE_PROFILES[profile].get("exclude", []))
+    print(f"Loading local NER model from {MODELS_DIR} [{profile}]")
+    # the rulers are rebuilt from PATTERNS below, so don't pay to load the packaged copies
+    nlp = spacy.load(MODELS_DIR, exclude=["norp_head_ruler", "entity_ruler", "span_ruler"])
 
-    # clear the pipe
-    for name in ("norp_head_ruler", "entity_ruler", "span_ruler"):
-        if name in nlp.pipe_names:
-            print("remove", name)
-            nlp.remove_pipe(name)
+    if "entity_ruler" in excluded:
+        print("Final pipeline:", nlp.pipe_names)
+        return nlp
 
     # 1) Main entity_ruler AFTER <!BEFORE> ner
     er = nlp.add_pipe(
@@ -67,6 +95,10 @@ def load_model():
     print("add NORP ruler (after ner)")
     norp_ruler.from_disk(NORP_PATTERNS)
 
+    if "span_ruler" in excluded:
+        print("Final pipeline:", nlp.pipe_names)
+        return nlp
+
     # 3) span_ruler at the end
     sr = nlp.add_pipe(
         "span_ruler",
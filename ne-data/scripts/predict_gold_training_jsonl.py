@@ -3,12 +3,19 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
+import unicodedata
 from pathlib import Path
 
 import psycopg
 from psycopg.rows import dict_row
 import spacy
 
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT))
+
+from web.app.api.ner_cache import PredictionCache, model_key
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -35,6 +42,11 @@ def parse_args() -> argparse.Namespace:
         default=0,
         help="Optional row limit for quick checks (0 = no limit)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always run the model instead of reusing spans from ner_prediction_cache",
+    )
     parser.add_argument(
         "--where",
         default="",
@@ -74,25 +86,40 @@ def doc_to_spans(doc) -> list[dict]:
 def main() -> None:
     args = parse_args()
     nlp = spacy.load(args.model)
+    version = nlp.meta.get("version") or ""
+    key = model_key(nlp)
+    cache = PredictionCache(maxsize=0, persistent=not args.no_cache, dsn=args.dsn)
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     with psycopg.connect(args.dsn) as conn:
         rows = fetch_rows(conn, args.where, args.limit)
 
+        # cached spans are offsets into the NFC text, so only NFC-stable rows can use them
+        texts = [row["text"] or "" for row in rows]
+        cacheable = [i for i, text in enumerate(texts) if text == unicodedata.normalize("NFC", text)]
+        cached = cache.get_many([texts[i] for i in cacheable], key, conn)
+        spans_by_row: dict[int, list[dict]] = {i: spans for i, spans in zip(cacheable, cached) if spans is not None}
+        todo = [i for i in range(len(rows)) if i not in spans_by_row]
+
+        new_entries = []
+        for i, doc in zip(todo, nlp.pipe([texts[i] for i in todo], batch_size=64)):
+            spans_by_row[i] = doc_to_spans(doc)
+            if doc.text == unicodedata.normalize("NFC", doc.text):
+                new_entries.append((doc.text, spans_by_row[i]))
+        cache.put_many(new_entries, key, conn)
+
     with out_path.open("w", encoding="utf-8") as fh:
-        for row in rows:
-            text = row["text"] or ""
-            doc = nlp(text)
+        for i, row in enumerate(rows):
             payload = {
-                "text": text,
-                "spans": doc_to_spans(doc),
+                "text": row["text"] or "",
+                "spans": spans_by_row[i],
                 "meta": {"gold_id": row["id"]},
                 "source": row.get("source"),
             }
             fh.write(json.dumps(payload, ensure_ascii=False) + "\n")
 
-    print(f"Wrote {len(rows)} rows to {out_path}")
+    print(f"Wrote {len(rows)} rows to {out_path} ({len(rows) - len(todo)} from cache, model {version})")
 
 
 if __name__ == "__main__":
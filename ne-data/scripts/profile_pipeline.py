@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Per-component timing for each inference profile.
+
+Runs the same verses through every profile in INFERENCE_PROFILES (or the ones
+named with --profile) and reports load time plus milliseconds per 1k verses
+for the tokenizer and each pipe, so you can see what e.g. span_ruler costs
+before deciding a caller needs "full-with-LOC_PHRASES".
+
+    python ne-data/scripts/profile_pipeline.py
+    python ne-data/scripts/profile_pipeline.py --model ../../dist/en_sutta_ner-1.2.4/en_sutta_ner/en_sutta_ner-1.2.4 \\
+        --sample 2000 --json ../work/profile_report.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg
+import spacy
+
+from local_settings import WORK, INFERENCE_PROFILES
+
+SAMPLE_SQL = """
+    SELECT text
+    FROM ati_verses
+    WHERE char_length(text) > 40
+    ORDER BY md5(id::text)      -- stable "random" sample across runs
+    LIMIT %(n)s
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time each pipeline component per inference profile.")
+    parser.add_argument("--model", default="en_sutta_ner", help="Package name or model dir")
+    parser.add_argument("--profile", action="append", choices=sorted(INFERENCE_PROFILES),
+                        help="Profile(s) to time (default: all)")
+    parser.add_argument("--text", default=str(WORK / "text" / "lines.txt"),
+                        help="One verse per line (used unless --sample is given)")
+    parser.add_argument("--sample", type=int, default=0,
+                        help="Pull this many verses from ati_verses instead of --text")
+    parser.add_argument("--dsn", default="dbname=tipitaka user=alee")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing")
+    parser.add_argument("--json", default="", help="Append one JSON line per profile to this file")
+    return parser.parse_args()
+
+
+def load_texts(args) -> list[str]:
+    if args.sample:
+        with psycopg.connect(args.dsn) as conn, conn.cursor() as cur:
+            cur.execute(SAMPLE_SQL, {"n": args.sample})
+            return [text for (text,) in cur]
+    with open(args.text, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def time_components(nlp, texts: list[str], batch_size: int) -> dict[str, float]:
+    """Seconds spent in the tokenizer and in each pipe over `texts`."""
+    timings: dict[str, float] = {}
+    t0 = time.perf_counter()
+    docs = [nlp.make_doc(text) for text in texts]
+    timings["tokenizer"] = time.perf_counter() - t0
+    for name, proc in nlp.pipeline:
+        t0 = time.perf_counter()
+        if hasattr(proc, "pipe"):
+            docs = list(proc.pipe(docs, batch_size=batch_size))
+        else:
+            docs = [proc(doc) for doc in docs]
+        timings[name] = time.perf_counter() - t0
+    return timings
+
+
+def profile_one(model: str, profile: str, texts: list[str], batch_size: int, repeat: int) -> dict:
+    t0 = time.perf_counter()
+    nlp = spacy.load(model, **INFERENCE_PROFILES[profile])
+    load_seconds = time.perf_counter() - t0
+
+    time_components(nlp, texts[:50], batch_size)   # warm caches / lazy init
+    best: dict[str, float] = {}
+    for _ in range(max(1, repeat)):
+        for name, seconds in time_components(nlp, texts, batch_size).items():
+            best[name] = min(seconds, best.get(name, float("inf")))
+
+    per_1k = 1000.0 / len(texts)
+    return {
+        "created_at": datetime.now(tz=timezone.utc).isoformat(),
+        "model": model,
+        "version": nlp.meta.get("version"),
+        "profile": profile,
+        "pipeline": list(nlp.pipe_names),
+        "n_verses": len(texts),
+        "load_seconds": round(load_seconds, 3),
+        "ms_per_1k": {name: round(seconds * per_1k * 1000.0, 1) for name, seconds in best.items()},
+        "total_ms_per_1k": round(sum(best.values()) * per_1k * 1000.0, 1),
+    }
+
+
+def print_report(rows: list[dict]) -> None:
+    components = []
+    for row in rows:
+        for name in row["ms_per_1k"]:
+            if name not in components:
+                components.append(name)
+    width = max(len(c) for c in components + ["load (s)", "total"])
+    header = f"{'':{width}}  " + "  ".join(f"{row['profile']:>22}" for row in rows)
+    print(f"\nms per 1k verses ({rows[0]['n_verses']} verses, {rows[0]['model']} {rows[0]['version']})")
+    print(header)
+    for name in components:
+        cells = []
+        for row in rows:
+            value = row["ms_per_1k"].get(name)
+            cells.append(f"{value:>22.1f}" if value is not None else f"{'-':>22}")
+        print(f"{name:{width}}  " + "  ".join(cells))
+    print(f"{'total':{width}}  " + "  ".join(f"{row['total_ms_per_1k']:>22.1f}" for row in rows))
+    print(f"{'load (s)':{width}}  " + "  ".join(f"{row['load_seconds']:>22.3f}" for row in rows))
+
+
+def main() -> None:
+    args = parse_args()
+    texts = load_texts(args)
+    if not texts:
+        raise SystemExit("No verses to profile.")
+    rows = [
+        profile_one(args.model, profile, texts, args.batch_size, args.repeat)
+        for profile in (args.profile or list(INFERENCE_PROFILES))
+    ]
+    print_report(rows)
+    if args.json:
+        out = Path(args.json)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("a", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
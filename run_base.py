@@ -10,10 +10,12 @@ import psycopg
 from base import Vectorizer
 from base import CorpusBuilder
 from base import fit_lsa, top_docs_for_component, top_terms_for_component
+from base import benchmark_parallel_fit, kmeans_sweep
 
 from local_settings import settings
 
 import numpy as np
+import os
 from pathlib import Path
 
 conn = psycopg.connect("dbname=tipitaka user=alee")
@@ -41,43 +43,70 @@ def some_queries():
     docs = v.get_doc_index()
     assert X.shape[0] == len(docs), "Row mismatch"
 
-    for q in ["bhikkhu Ambalaṭṭhika wholesome", "five aggregates"]:
-        qv = v.transform([q])  # (1 x V) query vector
-        scores = (X @ qv.T).toarray().ravel()        # (N,) one score per doc
-        k = min(5, scores.size)
-        idx = np.argpartition(-scores, k-1)[:k]
-        idx = idx[np.argsort(-scores[idx], kind="stable")]
-
+    queries = ["bhikkhu Ambalaṭṭhika wholesome", "five aggregates"]
+    for q, hits in zip(queries, v.search(queries, k=5)):   # one batched sparse product
         print("\n{}\n\n".format(q))
-        for i in idx:
-            rec = docs[i]
-            print(f"{rec['title'][:60]:60}  {rec['identifier']:<24}  doc_id={rec['doc_id']}  score={scores[i]:.3f}")
+        for rec in hits:
+            print(f"{rec['title'][:60]:60}  {rec['identifier']:<24}  doc_id={rec['doc_id']}  score={rec['score']:.3f}")
 
 def try_lsa():
     bundle_dir = "test_data"
     v = Vectorizer.load(bundle_dir, strict=True, require_matrix=False, require_index=True)
     docs = v.get_doc_index()
     # X = Normalizer(copy=False).fit_transform(v._x_csr)
-    Z, components, evr, svd = fit_lsa(v._x_csr)
+    Z, components, evr, svd = v.lsa()   # cached in the bundle after the first run
     terms = v.terms
     pos, neg = top_terms_for_component(components, terms, j=0, n=12)
     return pos, neg
 
+def cluster_lsa():
+    # k sweep over the bundle's cached LSA vectors; the chosen model lands in the bundle
+    bundle_dir = Path("test_data")
+    v = Vectorizer.load(bundle_dir, strict=True, require_matrix=True, require_index=True)
+    Z, *_ = v.lsa()
+    table, km, labels = kmeans_sweep(Z, range(10, 101, 10), out_dir=bundle_dir)
+    for row in table:
+        print(f"k={row['k']:<4} inertia={row['inertia']:12.1f}  silhouette={row['silhouette']:.4f}  "
+              f"{row['fit_seconds'] + row['score_seconds']:6.2f}s{'  <-' if row['chosen'] else ''}")
+
+def bench_parallel_fit():
+    # paragraph-level corpus, where tokenizing dominates the fit
+    sql = """
+        SELECT s.id, s.identifier, s.title, (e.elem->>'text') AS paragraph_text
+        FROM ati_suttas s
+        CROSS JOIN LATERAL jsonb_array_elements(s.verses) AS e(elem)
+        WHERE LENGTH(e.elem->>'text') > 300
+        """
+    texts = list(CorpusBuilder(conn, sql))
+    cores = os.cpu_count() or 1
+    n_jobs_list = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    print(f"{len(texts)} paragraphs, {cores} cores")
+    for row in benchmark_parallel_fit(texts, n_jobs_list):
+        print(f"n_jobs={row['n_jobs']:<3} {row['seconds']:8.2f}s  x{row['speedup']:<5}  identical={row['identical']}")
+
 def run_pipeline():
     sql = """
          select id, identifier, title, body from ati_suttas where translator = 'Thanissaro Bhikkhu';
         """
     
-    texts = list(CorpusBuilder(conn, sql))  # list of strings
-    pipe = Pipeline([("tfidf", TfidfVectorizer(**settings["TFIDF"])),
-                 ("svd", TruncatedSVD(n_components=200, random_state=0))])
-    Z = pipe.fit_transform(texts)
+    # TF-IDF + LSA kept in a bundle: later runs load X and the cached SVD instead of refitting
+    bundle_dir = Path("ati_pipeline_run")
+    if (bundle_dir / settings["BUNDLE"]["manifest"]).exists():
+        v = Vectorizer.load(bundle_dir, strict=True, require_matrix=True, require_index=True)
+    else:
+        builder = CorpusBuilder(conn, sql)
+        v = Vectorizer.from_corpus(builder, out_dir=bundle_dir, **settings["TFIDF"])
+        v.set_doc_index(builder.doc_ids)
+        v.save(bundle_dir)
+    Z, *_ = v.lsa(200)
 
     return Z
 
 if __name__ == "__main__":
     # build_small_matrix()
     # some_queries()
+    # bench_parallel_fit()
+    # cluster_lsa()
     # pos, neg = try_lsa()
     # print("Comp 0 ++", ", ".join(pos))
     # print("Comp 0 --", ", ".join(neg))
@@ -0,0 +1,778 @@
+"""
+In-process BM25 search over ati_verses.
+
+The index is a term-major CSR: for term t, its postings are
+docs[indptr[t]:indptr[t+1]] (row numbers into doc_index, ascending) with the
+matching term frequencies in tf[...]. Every array is a plain .npy file that
+load() memory-maps, so opening an index is instant and the OS page cache
+is shared between processes (CLI runs, gunicorn workers).
+
+Two streams of postings are stored side by side: "exact" (lowercased tokens)
+and "folded" (the same tokens through graph/scripts/normalize.py's
+strip_diacritics). Queries use the folded stream by default, so "Sāriputta"
+and "Sariputta" are one lookup; --exact keeps the diacritics significant.
+
+Postings are positional: positions[pos_indptr[j]:pos_indptr[j+1]] are the
+token numbers of posting j's term in its doc, and token_starts/token_ends map
+a doc's token numbers to character offsets in its text. hit_counts() uses
+them for my_fuzzyish_search-style per-sutta counts without re-parsing text,
+and for exact-phrase ("thus have I heard", stop words included) and
+NEAR/k proximity queries whose matches come back as character spans that
+web/app/render.py's render_highlighted can draw.
+
+Bundle layout follows Vectorizer.save: array files named in
+settings["SEARCH_BUNDLE"], a doc_index.json with one record per verse, and a
+manifest.json. Verse text is kept in the bundle too (one UTF-8 blob plus
+offsets), so a query never needs a Postgres round-trip.
+
+    python search_index.py build --out verse_index
+    python search_index.py query "five clinging aggregates" -k 10
+    python search_index.py query "Sāriputta" --exact
+    python search_index.py query '"thus have I heard"'
+    python search_index.py query "sariputta NEAR/5 moggallana"
+    python search_index.py build --source paragraphs --out paragraph_index
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from graph.scripts.normalize import strip_diacritics
+from local_settings import settings
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent / "verse_index"
+
+VERSES_SQL = """
+    SELECT v.id, v.identifier, COALESCE(s.title, '') AS title, v.nikaya, v.verse_num, v.text
+    FROM ati_verses AS v
+    LEFT JOIN ati_suttas AS s ON s.identifier = v.identifier
+    WHERE v.text IS NOT NULL AND v.text <> ''
+    ORDER BY v.id
+"""
+
+# one doc per ati_suttas.verses element, the unit my_fuzzyish_search counts as a paragraph
+PARAGRAPHS_SQL = """
+    SELECT p.sutta_id, p.identifier, p.title, p.nikaya, p.ord, p.ptext
+    FROM ati_verse_search AS p
+    WHERE p.ptext <> ''
+    ORDER BY p.sutta_id, p.ord
+"""
+
+SOURCES = {"verses": VERSES_SQL, "paragraphs": PARAGRAPHS_SQL}
+
+STREAMS = ("exact", "folded")
+
+# PostgreSQL's tsearch_data/english.stop: the words plainto_tsquery('english', ...) drops
+PG_ENGLISH_STOP_WORDS = frozenset("""
+    i me my myself we our ours ourselves you your yours yourself yourselves he him his himself
+    she her hers herself it its itself they them their theirs themselves what which who whom
+    this that these those am is are was were be been being have has had having do does did
+    doing a an the and but if or because as until while of at by for with about against
+    between into through during before after above below to from up down in out on off over
+    under again further then once here there when where why how all any both each few more
+    most other some such no nor not only own same so than too very s t can will just don
+    should now
+""".split())
+
+_token_re = re.compile(r"\w+")
+_near_re = re.compile(r"\s+NEAR/(\d+)\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of the NFC text. Stop words are kept (BM25 idf discounts them)."""
+    return _token_re.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def tokenize_with_offsets(text: str) -> List[Tuple[str, int, int]]:
+    """(lowercased token, start, end) with offsets into `text`, which should already be NFC."""
+    return [(m.group().lower(), m.start(), m.end()) for m in _token_re.finditer(text)]
+
+
+def fold(term: str) -> str:
+    """Folded form of an exact-stream term; same rules as the entity normalizer."""
+    return unicodedata.normalize("NFC", strip_diacritics(term))
+
+
+def parse_query(query: str) -> Tuple[str, str, int]:
+    """
+    (mode, text, window) from query syntax:
+      "thus have I heard"        -> ("phrase", ..., 0)   exact word sequence, stop words included
+      sariputta NEAR/5 moggallana -> ("near", "sariputta moggallana", 5)
+      anything else              -> ("bm25", query, 0)
+    """
+    query = query.strip()
+    if len(query) > 1 and query[0] == query[-1] == '"':
+        return "phrase", query[1:-1], 0
+    near = _near_re.search(query)
+    if near:
+        return "near", _near_re.sub(" ", query), int(near.group(1))
+    return "bm25", query, 0
+
+
+def _near_windows(per_term: List[np.ndarray], window: int) -> List[Tuple[int, int]]:
+    """
+    Non-overlapping minimal token windows (first, last) holding every term
+    with last - first <= window. per_term[i] are term i's positions in one doc.
+    """
+    events = sorted((int(pos), t) for t, positions in enumerate(per_term) for pos in positions)
+    counts = [0] * len(per_term)
+    covered, left, last_end = 0, 0, -1
+    out = []
+    for pos, t in events:
+        counts[t] += 1
+        covered += counts[t] == 1
+        if covered < len(per_term):
+            continue
+        while counts[events[left][1]] > 1:    # drop left events whose term is repeated further right
+            counts[events[left][1]] -= 1
+            left += 1
+        first = events[left][0]
+        if pos - first <= window and first > last_end:
+            out.append((first, pos))
+            last_end = pos
+    return out
+
+
+def _drop_overlaps(keys: np.ndarray, length: int) -> np.ndarray:
+    """
+    Sorted (doc << 32) | first-token phrase keys with every match that starts
+    inside the previous kept match of the same doc removed, leftmost first.
+    """
+    if length < 2 or keys.size < 2:
+        return keys
+    gaps = np.diff(keys)   # same doc: token gap; a new doc is always >= 1 << 32
+    if gaps.min() >= length:
+        return keys
+    keep = np.ones(keys.size, dtype=bool)
+    end = -1
+    for i, key in enumerate(keys.tolist()):
+        if key < end:
+            keep[i] = False
+        else:
+            end = key + length
+    return keys[keep]
+
+
+class Postings:
+    """One stream's term-major CSR (with token positions) plus its vocabulary and idf."""
+
+    def __init__(self, indptr, docs, tf, terms: List[str], n_docs: int, pos_indptr=None, positions=None):
+        self.indptr = indptr
+        self.docs = docs
+        self.tf = tf
+        self.pos_indptr = pos_indptr
+        self.positions = positions
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        df = np.diff(indptr).astype(np.float64)
+        n = max(n_docs, 1)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return int(len(self.docs))
+
+    def span(self, term: str):
+        """Posting range [start, end) for a term, or None if it is not in this stream."""
+        t = self.term_ids.get(term)
+        if t is None:
+            return None
+        return int(self.indptr[t]), int(self.indptr[t + 1])
+
+    def lookup(self, term: str):
+        """(term_id, docs, tf) for a term, or None if it is not in this stream."""
+        span = self.span(term)
+        if span is None:
+            return None
+        start, end = span
+        return self.term_ids[term], np.asarray(self.docs[start:end]), np.asarray(self.tf[start:end], dtype=np.float32)
+
+    def doc_positions(self, j: int) -> np.ndarray:
+        """Token numbers for posting j."""
+        return np.asarray(self.positions[int(self.pos_indptr[j]):int(self.pos_indptr[j + 1])])
+
+    def gather(self, span: Tuple[int, int], docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (doc, position) for every occurrence of the term in `span` inside `docs`
+        (doc-sorted, each doc known to hold the term), in doc then position order.
+        """
+        start, end = span
+        js = start + np.searchsorted(np.asarray(self.docs[start:end]), docs)
+        pos_indptr = np.asarray(self.pos_indptr)
+        lo, hi = pos_indptr[js], pos_indptr[js + 1]
+        lengths = hi - lo
+        if not lengths.sum():
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        run_starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        idx = run_starts + np.arange(int(lengths.sum()))
+        return np.repeat(np.asarray(docs, dtype=np.int64), lengths), np.asarray(self.positions)[idx].astype(np.int64)
+
+    @classmethod
+    def from_tokens(cls, tok_doc: np.ndarray, tok_term: np.ndarray, tok_pos: np.ndarray,
+                    terms: List[str], n_docs: int) -> "Postings":
+        """
+        One entry per token occurrence -> postings sorted by (term, doc) with
+        positions ascending inside each posting. tf is the number of positions.
+        """
+        order = np.lexsort((tok_pos, tok_doc, tok_term))
+        term_sorted, doc_sorted = tok_term[order], tok_doc[order]
+        new_posting = np.ones(len(order), dtype=bool)
+        new_posting[1:] = (term_sorted[1:] != term_sorted[:-1]) | (doc_sorted[1:] != doc_sorted[:-1])
+        first = np.flatnonzero(new_posting)
+        pos_indptr = np.append(first, len(order)).astype(np.int64)
+        posting_terms = term_sorted[first]
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(terms)), out=indptr[1:])
+        return cls(
+            indptr,
+            doc_sorted[first].astype(np.int32),
+            np.minimum(np.diff(pos_indptr), np.iinfo(np.uint16).max).astype(np.uint16),
+            terms,
+            n_docs,
+            pos_indptr=pos_indptr,
+            positions=tok_pos[order].astype(np.int32),
+        )
+
+
+class VerseIndex:
+    """
+    BM25 over one document per verse; arrays may be np.memmap (see load).
+    config is the settings dict holding SEARCH and SEARCH_BUNDLE (default:
+    local_settings.settings); callers outside the repo root pass it in.
+    """
+
+    def __init__(self, *, streams: Dict[str, Postings], doc_len, doc_index: List[Dict[str, Any]],
+                 texts=None, text_offsets=None, token_starts=None, token_ends=None,
+                 params: Optional[Dict[str, Any]] = None, manifest: Optional[Dict[str, Any]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        self.config: Dict[str, Any] = config or settings
+        self.params: Dict[str, Any] = dict(params or self.config["SEARCH"])
+        self.streams = streams
+        self.doc_len = doc_len
+        self.doc_index = doc_index
+        self.texts = texts
+        self.text_offsets = text_offsets
+        self.token_starts = token_starts   # char offsets of every token, doc after doc
+        self.token_ends = token_ends
+        self.manifest: Dict[str, Any] = manifest or {}
+        self._prepare()
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    @property
+    def terms(self) -> List[str]:
+        return self.streams["exact"].terms
+
+    def _prepare(self) -> None:
+        """Per-load BM25 length norm per doc (idf lives on each stream)."""
+        k1, b = float(self.params["k1"]), float(self.params["b"])
+        avgdl = float(self.doc_len.mean()) if self.n_docs else 1.0
+        self.avgdl = avgdl or 1.0
+        self._norm = (k1 * (1.0 - b + b * np.asarray(self.doc_len, dtype=np.float32) / self.avgdl)).astype(np.float32)
+        self._k1 = np.float32(k1)
+        # first token number of each doc in token_starts/token_ends
+        self.token_indptr = np.zeros(self.n_docs + 1, dtype=np.int64)
+        np.cumsum(np.asarray(self.doc_len, dtype=np.int64), out=self.token_indptr[1:])
+        self._groups: Optional[Tuple[np.ndarray, List[Dict[str, Any]]]] = None
+
+    # ---------- construction ----------
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, str, str, Optional[str], Optional[int], str]], *,
+              config: Optional[Dict[str, Any]] = None, **params) -> "VerseIndex":
+        """
+        rows: (doc_id, identifier, title, nikaya, verse_num, text), e.g. from VERSES_SQL.
+        One pass; every token occurrence is recorded as (doc, term, position)
+        and sorted into a term-major positional CSR per stream.
+        """
+        vocab: Dict[str, int] = {}
+        tok_doc, tok_term, tok_pos = array("i"), array("i"), array("i")
+        tok_start, tok_end = array("i"), array("i")
+        doc_len = array("I")
+        doc_index: List[Dict[str, Any]] = []
+        blob = bytearray()
+        offsets = array("q", [0])
+
+        for doc_id, identifier, title, nikaya, verse_num, text in rows:
+            text = unicodedata.normalize("NFC", text or "")
+            row = len(doc_index)
+            tokens = tokenize_with_offsets(text)
+            for pos, (term, start, end) in enumerate(tokens):
+                tok_doc.append(row)
+                tok_term.append(vocab.setdefault(term, len(vocab)))
+                tok_pos.append(pos)
+                tok_start.append(start)
+                tok_end.append(end)
+            doc_len.append(len(tokens))
+            doc_index.append({
+                "doc_id": int(doc_id),
+                "identifier": identifier,
+                "title": title or "",
+                "nikaya": nikaya,
+                "verse_num": verse_num,
+            })
+            blob += text.encode("utf-8")
+            offsets.append(len(blob))
+
+        # sort the vocabulary so term ids are stable across rebuilds of the same corpus
+        terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        for new_id, term in enumerate(terms):
+            remap[vocab[term]] = new_id
+        term_ids = remap[np.frombuffer(tok_term, dtype=np.int32)] if len(tok_term) else np.empty(0, np.int64)
+        docs = np.frombuffer(tok_doc, dtype=np.int32)
+        positions = np.frombuffer(tok_pos, dtype=np.int32)
+
+        # folded stream: exact term id -> folded term id, then the same token stream
+        folded_terms = sorted({fold(term) for term in terms})
+        folded_ids = {term: i for i, term in enumerate(folded_terms)}
+        to_folded = np.fromiter((folded_ids[fold(term)] for term in terms), dtype=np.int64, count=len(terms))
+
+        n_docs = len(doc_index)
+        return cls(
+            streams={
+                "exact": Postings.from_tokens(docs, term_ids, positions, terms, n_docs),
+                "folded": Postings.from_tokens(docs, to_folded[term_ids], positions, folded_terms, n_docs),
+            },
+            doc_len=np.frombuffer(doc_len, dtype=np.uint32).astype(np.float32),
+            doc_index=doc_index,
+            texts=np.frombuffer(bytes(blob), dtype=np.uint8),
+            text_offsets=np.frombuffer(offsets, dtype=np.int64),
+            token_starts=np.frombuffer(tok_start, dtype=np.int32),
+            token_ends=np.frombuffer(tok_end, dtype=np.int32),
+            params=params or None,
+            config=config,
+        )
+
+    # ---------- persistence ----------
+    def save(self, dirpath: Path, manifest: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        Write the bundle to a sibling temp dir and swap it into place, so a
+        process that has the old index memory-mapped keeps reading valid files.
+        """
+        names = self.config["SEARCH_BUNDLE"]
+        out = Path(dirpath)
+        tmp = out.with_name(f".{out.name}.tmp-{os.getpid()}")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        for stream, p in self.streams.items():
+            np.save(tmp / names["indptr"].format(stream=stream), np.asarray(p.indptr))
+            np.save(tmp / names["postings"].format(stream=stream), np.asarray(p.docs))
+            np.save(tmp / names["tf"].format(stream=stream), np.asarray(p.tf))
+            np.save(tmp / names["pos_indptr"].format(stream=stream), np.asarray(p.pos_indptr))
+            np.save(tmp / names["positions"].format(stream=stream), np.asarray(p.positions))
+            (tmp / names["vocab"].format(stream=stream)).write_text(json.dumps(p.terms, ensure_ascii=False), encoding="utf-8")
+        np.save(tmp / names["doc_len"], np.asarray(self.doc_len))
+        np.save(tmp / names["token_starts"], np.asarray(self.token_starts))
+        np.save(tmp / names["token_ends"], np.asarray(self.token_ends))
+        if self.texts is not None:
+            (tmp / names["texts"]).write_bytes(np.asarray(self.texts).tobytes())
+            np.save(tmp / names["text_offsets"], np.asarray(self.text_offsets))
+        (tmp / names["doc_index"]).write_text(json.dumps(self.doc_index, ensure_ascii=False, indent=2), encoding="utf-8")
+        mf = self._manifest_defaults(manifest)
+        (tmp / names["manifest"]).write_text(json.dumps(mf, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        old = out.with_name(f".{out.name}.old-{os.getpid()}")
+        if out.exists():
+            out.rename(old)
+        tmp.rename(out)
+        if old.exists():
+            shutil.rmtree(old)
+        self.manifest = mf
+        return out
+
+    @classmethod
+    def load(cls, bundle_dir: Path, *, mmap: bool = True, config: Optional[Dict[str, Any]] = None) -> "VerseIndex":
+        bundle_dir = Path(bundle_dir)
+        config = config or settings
+        names = config["SEARCH_BUNDLE"]
+        mf_path = bundle_dir / names["manifest"]
+        if not mf_path.exists():
+            raise FileNotFoundError(f"No search index at {bundle_dir} (missing {names['manifest']})")
+        manifest = json.loads(mf_path.read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+
+        texts = text_offsets = None
+        if (bundle_dir / names["texts"]).exists():
+            texts = np.memmap(bundle_dir / names["texts"], dtype=np.uint8, mode="r") if mmap \
+                else np.fromfile(bundle_dir / names["texts"], dtype=np.uint8)
+            text_offsets = np.load(bundle_dir / names["text_offsets"], mmap_mode=mode)
+
+        doc_len = np.load(bundle_dir / names["doc_len"], mmap_mode=mode)
+        streams = {}
+        for stream in manifest.get("streams", STREAMS):
+            streams[stream] = Postings(
+                np.load(bundle_dir / names["indptr"].format(stream=stream), mmap_mode=mode),
+                np.load(bundle_dir / names["postings"].format(stream=stream), mmap_mode=mode),
+                np.load(bundle_dir / names["tf"].format(stream=stream), mmap_mode=mode),
+                json.loads((bundle_dir / names["vocab"].format(stream=stream)).read_text(encoding="utf-8")),
+                len(doc_len),
+                pos_indptr=np.load(bundle_dir / names["pos_indptr"].format(stream=stream), mmap_mode=mode),
+                positions=np.load(bundle_dir / names["positions"].format(stream=stream), mmap_mode=mode),
+            )
+
+        self = cls(
+            streams=streams,
+            doc_len=doc_len,
+            doc_index=json.loads((bundle_dir / names["doc_index"]).read_text(encoding="utf-8")),
+            texts=texts,
+            text_offsets=text_offsets,
+            token_starts=np.load(bundle_dir / names["token_starts"], mmap_mode=mode),
+            token_ends=np.load(bundle_dir / names["token_ends"], mmap_mode=mode),
+            params=manifest.get("params"),
+            manifest=manifest,
+            config=config,
+        )
+        if len(self.doc_index) != self.n_docs:
+            raise ValueError(f"Row mismatch: doc_len has {self.n_docs} rows, doc_index has {len(self.doc_index)}")
+        return self
+
+    def _manifest_defaults(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        m = {
+            "created_at": datetime.now(tz=timezone.utc).isoformat(),
+            "kind": "bm25_verse_index",
+            "params": self.params,
+            "n_docs": self.n_docs,
+            "streams": list(self.streams),
+            "vocab_size": {stream: len(p.terms) for stream, p in self.streams.items()},
+            "n_postings": {stream: len(p) for stream, p in self.streams.items()},
+            "n_tokens": int(self.token_indptr[-1]),
+            "avgdl": round(self.avgdl, 3),
+            "has_texts": self.texts is not None,
+        }
+        if extra:
+            m.update(extra)
+        return m
+
+    # ---------- query ----------
+    def text(self, row: int) -> str:
+        if self.texts is None:
+            return ""
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def query_terms(self, query: str, *, exact: bool = False) -> List[str]:
+        tokens = tokenize(query)
+        return tokens if exact else [fold(token) for token in tokens]
+
+    def scores(self, query: str, *, exact: bool = False) -> np.ndarray:
+        """
+        BM25 score per doc row; query terms missing from the vocabulary are ignored.
+        Default is the folded stream (diacritics ignored on both sides).
+        """
+        stream = self.streams["exact" if exact else "folded"]
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, qtf in Counter(self.query_terms(query, exact=exact)).items():
+            hit = stream.lookup(term)
+            if hit is None:
+                continue
+            t, docs, tf = hit
+            scores[docs] += qtf * stream.idf[t] * tf * (self._k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Rows of the k best non-zero scores, best first (partition, then sort only
+        the k). Ties go to the lower row, also at the cut.
+        """
+        hits = np.flatnonzero(scores)
+        if not hits.size or k <= 0:
+            return hits[:0]
+        if hits.size > k:
+            neg = -scores[hits]
+            kth = np.partition(neg, k - 1)[k - 1]
+            above = hits[neg < kth]
+            hits = np.concatenate((above, hits[neg == kth][:k - above.size]))   # hits ascending
+        return hits[np.lexsort((hits, -scores[hits]))]
+
+    def search(self, query: str, k: int = 10, *, exact: bool = False, with_text: bool = True) -> List[Dict[str, Any]]:
+        scores = self.scores(query, exact=exact)
+        results = []
+        for row in self.top_k(scores, k):
+            rec = dict(self.doc_index[row], score=round(float(scores[row]), 4))
+            if with_text:
+                rec["text"] = self.text(int(row))
+            results.append(rec)
+        return results
+
+    # ---------- hit counting ----------
+    def _sutta_groups(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Doc row -> sutta group id, and one {nikaya, identifier, title} per group (built once)."""
+        if self._groups is None:
+            ids: Dict[str, int] = {}
+            groups: List[Dict[str, Any]] = []
+            row_group = np.empty(self.n_docs, dtype=np.int32)
+            for row, rec in enumerate(self.doc_index):
+                g = ids.get(rec["identifier"])
+                if g is None:
+                    g = ids[rec["identifier"]] = len(groups)
+                    groups.append({"nikaya": rec.get("nikaya"), "identifier": rec["identifier"], "title": rec.get("title", "")})
+                row_group[row] = g
+            self._groups = (row_group, groups)
+        return self._groups
+
+    def _candidates(self, stream: Postings, spans: List[Tuple[int, int]]) -> np.ndarray:
+        """Docs in every span's posting list. Lists are doc-sorted: intersect shortest first."""
+        ordered = sorted(set(spans), key=lambda span: span[1] - span[0])
+        docs = np.asarray(stream.docs[ordered[0][0]:ordered[0][1]])
+        for start, end in ordered[1:]:
+            docs = np.intersect1d(docs, np.asarray(stream.docs[start:end]), assume_unique=True)
+            if not docs.size:
+                break
+        return docs
+
+    def matching_docs(self, terms: List[str], *, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Docs containing every term (AND), and the total number of query-term
+        occurrences in each.
+        """
+        stream = self.streams["exact" if exact else "folded"]
+        spans = [stream.span(term) for term in dict.fromkeys(terms)]
+        if not spans or any(span is None for span in spans):
+            return np.empty(0, np.int32), np.empty(0, np.int64)
+        docs = self._candidates(stream, spans)
+        hits = np.zeros(docs.size, dtype=np.int64)
+        if not docs.size:
+            return docs, hits
+        for start, end in spans:
+            at = np.searchsorted(np.asarray(stream.docs[start:end]), docs)
+            hits += np.diff(np.asarray(stream.pos_indptr[start:end + 1]))[at]
+        return docs, hits
+
+    def hit_counts(self, query: str, *, exact: bool = False, limit: int = 0) -> List[Dict[str, Any]]:
+        """
+        my_fuzzyish_search's report without ts_headline: per sutta, the number
+        of paragraphs (docs) holding every query word and the total number of
+        query-word occurrences in them. Like plainto_tsquery('english', ...),
+        PostgreSQL's English stop words are dropped from the query, and a query
+        of nothing but stop words matches nothing.
+
+        Where the counts differ from the Postgres report: words are matched as
+        tokens, not Snowball stems ("aggregate" does not count "aggregates"),
+        and by default diacritics are folded on both sides (exact=True keeps
+        them significant, as the 'english' text search config does).
+        """
+        terms = self.query_terms(query, exact=exact)
+        terms = [term for term in terms if term not in PG_ENGLISH_STOP_WORDS]
+        if not terms:
+            return []
+        docs, hits = self.matching_docs(terms, exact=exact)
+        if not docs.size:
+            return []
+        row_group, groups = self._sutta_groups()
+        g = row_group[docs]
+        paragraphs = np.bincount(g, minlength=len(groups))
+        total = np.bincount(g, weights=hits, minlength=len(groups)).astype(np.int64)
+        found = np.flatnonzero(paragraphs)
+        # ORDER BY total_hits DESC, matched_paragraphs DESC, identifier
+        found = sorted(found, key=lambda i: (-total[i], -paragraphs[i], groups[i]["identifier"]))
+        if limit:
+            found = found[:limit]
+        return [dict(groups[i], matched_paragraphs=int(paragraphs[i]), total_hits=int(total[i])) for i in found]
+
+    # ---------- phrase / proximity ----------
+    def phrase_matches(self, phrase: str, *, exact: bool = False) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        (docs, first token of each match, phrase length) for every occurrence of
+        the phrase's words in order and adjacent. Each word's (doc, position - i)
+        keys are intersected, so a match is where all of them line up. Matches
+        never overlap: "thus thus" in "thus thus thus" is one match, leftmost first.
+        """
+        stream = self.streams["exact" if exact else "folded"]
+        terms = self.query_terms(phrase, exact=exact)
+        spans = [stream.span(term) for term in terms]
+        if not spans or any(span is None for span in spans):
+            return np.empty(0, np.int64), np.empty(0, np.int64), len(terms)
+        docs = self._candidates(stream, spans)
+        keys = None
+        for i, span in enumerate(spans):
+            if not docs.size:
+                break
+            d, pos = stream.gather(span, docs)
+            pos = pos - i
+            keep = pos >= 0
+            term_keys = np.unique((d[keep] << 32) | pos[keep])
+            keys = term_keys if keys is None else np.intersect1d(keys, term_keys, assume_unique=True)
+            if not keys.size:
+                break
+        if keys is None or not docs.size:
+            return np.empty(0, np.int64), np.empty(0, np.int64), len(terms)
+        keys = _drop_overlaps(keys, len(terms))
+        return keys >> 32, keys & 0xFFFFFFFF, len(terms)
+
+    def near_matches(self, query: str, window: int, *, exact: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(docs, first token, last token) of non-overlapping windows holding every query word within `window` tokens."""
+        stream = self.streams["exact" if exact else "folded"]
+        terms = list(dict.fromkeys(self.query_terms(query, exact=exact)))
+        spans = [stream.span(term) for term in terms]
+        empty = np.empty(0, np.int64)
+        if not spans or any(span is None for span in spans):
+            return empty, empty, empty
+        docs = self._candidates(stream, spans)
+        if not docs.size:
+            return empty, empty, empty
+        gathered = [stream.gather(span, docs) for span in spans]
+        cuts = [np.searchsorted(d, docs, side="right") for d, _ in gathered]
+        out_docs, out_first, out_last = [], [], []
+        for n, doc in enumerate(docs):
+            per_term = [pos[(cut[n - 1] if n else 0):cut[n]] for (_, pos), cut in zip(gathered, cuts)]
+            for first, last in _near_windows(per_term, window):
+                out_docs.append(int(doc))
+                out_first.append(first)
+                out_last.append(last)
+        return np.asarray(out_docs, np.int64), np.asarray(out_first, np.int64), np.asarray(out_last, np.int64)
+
+    def char_span(self, doc: int, first: int, last: int) -> Tuple[int, int]:
+        """Character offsets in text(doc) covering tokens first..last."""
+        base = int(self.token_indptr[doc])
+        return int(self.token_starts[base + first]), int(self.token_ends[base + last])
+
+    def _rank_matches(self, docs: np.ndarray, firsts: np.ndarray, lasts: np.ndarray, idf: float,
+                      k: int, with_text: bool, label: str) -> List[Dict[str, Any]]:
+        """
+        One result per doc, BM25-shaped over the match count (matches play the
+        role of tf), carrying a render_highlighted-ready span per match.
+        """
+        if not docs.size:
+            return []
+        uniq, first_idx, counts = np.unique(docs, return_index=True, return_counts=True)
+        tf = counts.astype(np.float32)
+        scores = idf * tf * (self._k1 + 1) / (tf + self._norm[uniq])
+        results = []
+        for i in self.top_k(scores, k):
+            doc = int(uniq[i])
+            rows = range(first_idx[i], first_idx[i] + counts[i])
+            spans = [dict(zip(("start", "end"), self.char_span(doc, int(firsts[r]), int(lasts[r]))), label=label)
+                     for r in rows]
+            rec = dict(self.doc_index[doc], score=round(float(scores[i]), 4), matches=int(counts[i]), spans=spans)
+            if with_text:
+                rec["text"] = self.text(doc)
+            results.append(rec)
+        return results
+
+    def phrase_search(self, phrase: str, k: int = 10, *, exact: bool = False, with_text: bool = True) -> List[Dict[str, Any]]:
+        docs, starts, length = self.phrase_matches(phrase, exact=exact)
+        idf = self._idf_sum(phrase, exact)
+        return self._rank_matches(docs, starts, starts + length - 1, idf, k, with_text, "PHRASE")
+
+    def near_search(self, query: str, window: int, k: int = 10, *, exact: bool = False,
+                    with_text: bool = True) -> List[Dict[str, Any]]:
+        docs, firsts, lasts = self.near_matches(query, window, exact=exact)
+        return self._rank_matches(docs, firsts, lasts, self._idf_sum(query, exact), k, with_text, "NEAR")
+
+    def _idf_sum(self, query: str, exact: bool) -> float:
+        stream = self.streams["exact" if exact else "folded"]
+        return float(sum(stream.idf[stream.term_ids[t]] for t in set(self.query_terms(query, exact=exact))
+                         if t in stream.term_ids))
+
+    def query(self, query: str, k: int = 10, *, exact: bool = False, mode: str = "auto", window: int = 0,
+              with_text: bool = True) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Dispatch on query syntax (see parse_query) unless `mode` forces one of
+        bm25 / phrase / near. Returns (mode used, results).
+        """
+        parsed_mode, text, parsed_window = parse_query(query)
+        if mode == "auto":
+            mode = parsed_mode
+        if mode == parsed_mode:
+            window = window or parsed_window
+        else:
+            text = query   # forced mode over plain words
+        if mode == "phrase":
+            return mode, self.phrase_search(text, k, exact=exact, with_text=with_text)
+        if mode == "near":
+            return mode, self.near_search(text, window or 5, k, exact=exact, with_text=with_text)
+        return "bm25", self.search(text, k, exact=exact, with_text=with_text)
+
+
+# ---------- CLI ----------
+def iter_verse_rows(dsn: str, limit: int = 0, source: str = "verses"):
+    import psycopg
+
+    sql = SOURCES[source] + (" LIMIT %(limit)s" if limit else "")
+    with psycopg.connect(dsn) as conn, conn.cursor(name="search_index_build") as cur:
+        cur.itersize = 5000
+        cur.execute(sql, {"limit": limit} if limit else None)
+        yield from cur
+
+
+def build_main(args) -> None:
+    started = time.perf_counter()
+    index = VerseIndex.build(iter_verse_rows(args.dsn, args.limit, args.source), **settings["SEARCH"])
+    out = index.save(Path(args.out), manifest={"source": args.source, "dsn": args.dsn,
+                                               "build_seconds": round(time.perf_counter() - started, 2)})
+    exact, folded = index.streams["exact"], index.streams["folded"]
+    print(f"Indexed {index.n_docs} verses, {len(exact.terms)} terms ({len(folded.terms)} folded), "
+          f"{len(exact)} postings -> {out} in {time.perf_counter() - started:.1f}s")
+
+
+def query_main(args) -> None:
+    t0 = time.perf_counter()
+    index = VerseIndex.load(Path(args.index))
+    t1 = time.perf_counter()
+    mode = "hits"
+    if args.hits:
+        results = index.hit_counts(args.query, exact=args.exact, limit=args.k)
+    else:
+        mode, results = index.query(args.query, k=args.k, exact=args.exact, mode=args.mode, window=args.window)
+    t2 = time.perf_counter()
+    if args.json or args.hits:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for rec in results:
+            text = rec.get("text", "")
+            if rec.get("spans"):   # phrase / near: show the first match in context
+                start, end = rec["spans"][0]["start"], rec["spans"][0]["end"]
+                text = f"{text[max(0, start - 40):start]}[{text[start:end]}]{text[end:end + 40]}"
+            text = " ".join(text.split())
+            print(f"{rec['score']:7.3f}  {rec['identifier']:<24} {str(rec['verse_num'] or ''):>4}  {text[:100]}")
+    print(f"[load {1000 * (t1 - t0):.1f} ms, query {1000 * (t2 - t1):.1f} ms, "
+          f"{mode}, {index.n_docs} verses]", file=sys.stderr)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="BM25 verse search with memory-mapped postings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="(Re)build the index from ati_verses")
+    b.add_argument("--dsn", default="dbname=tipitaka user=alee")
+    b.add_argument("--out", default=os.environ.get("VERSE_INDEX_DIR", str(DEFAULT_INDEX_DIR)))
+    b.add_argument("--source", choices=sorted(SOURCES), default="verses",
+                   help="ati_verses rows, or ati_suttas paragraphs (ati_verse_search) as my_fuzzyish_search counts them")
+    b.add_argument("--limit", type=int, default=0, help="Index only the first N verses (0 = all)")
+    b.set_defaults(func=build_main)
+
+    q = sub.add_parser("query", help="Search the index")
+    q.add_argument("query")
+    q.add_argument("-k", type=int, default=10)
+    q.add_argument("--index", default=os.environ.get("VERSE_INDEX_DIR", str(DEFAULT_INDEX_DIR)))
+    q.add_argument("--exact", action="store_true", help="Match diacritics exactly (default: folded)")
+    q.add_argument("--mode", choices=("auto", "bm25", "phrase", "near"), default="auto",
+                   help='auto: "quoted" = phrase, a NEAR/k b = proximity, else BM25')
+    q.add_argument("--window", type=int, default=0, help="Token window for --mode near (default: NEAR/k, else 5)")
+    q.add_argument("--json", action="store_true")
+    q.add_argument("--hits", action="store_true",
+                   help="Per-sutta matched paragraphs / total hits instead of BM25 verses "
+                        "(tokens, not stems: see VerseIndex.hit_counts)")
+    q.set_defaults(func=query_main)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,90 @@
+-- -------------------------------------------------------------------
+-- ati_verse_search: one row per element of ati_suttas.verses, with a
+-- stored tsvector and a GIN index. Term searches (term_search_db.py,
+-- my_fuzzyish_search.py, graph/scripts/person_search.py, ...) look up
+-- this index instead of exploding every sutta's jsonb and running
+-- to_tsvector() on each paragraph per query.
+--
+-- ord is the 1-based WITH ORDINALITY position in ati_suttas.verses (the
+-- web app's verse_num is ord - 1).
+--
+-- Kept in sync by triggers on ati_suttas, so the load_ati.py upserts
+-- (INSERT ... ON CONFLICT DO UPDATE) refresh a sutta's rows in the same
+-- transaction. Upserts that leave verses/title/nikaya untouched are a no-op.
+-- -------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS ati_verse_search (
+  sutta_id    BIGINT  NOT NULL REFERENCES ati_suttas(id) ON DELETE CASCADE,
+  ord         INTEGER NOT NULL,
+  identifier  TEXT    NOT NULL,
+  nikaya      TEXT,
+  doc_type    doc_type NOT NULL,
+  title       TEXT    NOT NULL,
+  ptext       TEXT    NOT NULL,
+  tsv         TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', ptext)) STORED,
+  PRIMARY KEY (sutta_id, ord)
+);
+
+CREATE INDEX IF NOT EXISTS ati_verse_search_tsv_idx        ON ati_verse_search USING gin (tsv);
+CREATE INDEX IF NOT EXISTS ati_verse_search_identifier_idx ON ati_verse_search (identifier, ord);
+CREATE INDEX IF NOT EXISTS ati_verse_search_nikaya_idx     ON ati_verse_search (nikaya);
+
+-- -------------------------------------------------------------------
+-- Sync
+-- -------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION ati_verse_search_sync(p_sutta_id BIGINT)
+RETURNS void
+LANGUAGE sql
+AS $$
+  DELETE FROM ati_verse_search WHERE sutta_id = p_sutta_id;
+  INSERT INTO ati_verse_search (sutta_id, ord, identifier, nikaya, doc_type, title, ptext)
+  SELECT s.id, t.ord, s.identifier, s.nikaya, s.doc_type, s.title,
+         COALESCE(t.v->>'text', '')
+  FROM ati_suttas s
+  CROSS JOIN LATERAL jsonb_array_elements(s.verses) WITH ORDINALITY AS t(v, ord)
+  WHERE s.id = p_sutta_id;
+$$;
+
+CREATE OR REPLACE FUNCTION ati_suttas_sync_verse_search()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM ati_verse_search_sync(NEW.id);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS ati_suttas_verse_search_ins ON ati_suttas;
+CREATE TRIGGER ati_suttas_verse_search_ins
+AFTER INSERT ON ati_suttas
+FOR EACH ROW EXECUTE FUNCTION ati_suttas_sync_verse_search();
+
+DROP TRIGGER IF EXISTS ati_suttas_verse_search_upd ON ati_suttas;
+CREATE TRIGGER ati_suttas_verse_search_upd
+AFTER UPDATE OF verses, identifier, nikaya, doc_type, title ON ati_suttas
+FOR EACH ROW
+WHEN (OLD.verses     IS DISTINCT FROM NEW.verses
+   OR OLD.identifier IS DISTINCT FROM NEW.identifier
+   OR OLD.nikaya     IS DISTINCT FROM NEW.nikaya
+   OR OLD.doc_type   IS DISTINCT FROM NEW.doc_type
+   OR OLD.title      IS DISTINCT FROM NEW.title)
+EXECUTE FUNCTION ati_suttas_sync_verse_search();
+
+-- -------------------------------------------------------------------
+-- Backfill (idempotent; re-run after bulk edits that bypassed the triggers)
+-- -------------------------------------------------------------------
+DO $$
+DECLARE
+  r record;
+BEGIN
+  FOR r IN SELECT id FROM ati_suttas LOOP
+    PERFORM ati_verse_search_sync(r.id);
+  END LOOP;
+END $$;
+
+ANALYZE ati_verse_search;
+
+-- a term search is now a bitmap scan on ati_verse_search_tsv_idx:
+-- EXPLAIN ANALYZE
+-- SELECT identifier, ord FROM ati_verse_search
+-- WHERE tsv @@ websearch_to_tsquery('english', 'Sariputta');
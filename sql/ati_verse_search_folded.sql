@@ -0,0 +1,31 @@
+-- -------------------------------------------------------------------
+-- Diacritic-folded lexemes for ati_verse_search, so 'Sāriputta' and
+-- 'Sariputta' match in one query instead of running the search twice
+-- (once for the term and once for its stripped form).
+--
+-- ati_fold_diacritics() mirrors graph/scripts/normalize.py::strip_diacritics:
+-- NFKD, then drop combining marks. Search with the same function on both sides:
+--   WHERE v.tsv_folded @@ websearch_to_tsquery('english', ati_fold_diacritics(%(term)s))
+-- -------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION ati_fold_diacritics(t text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+STRICT
+PARALLEL SAFE
+AS $$
+  -- combining diacritical marks (+ extended, supplement, for symbols, half marks)
+  SELECT regexp_replace(
+           normalize(t, NFKD),
+           E'[\\u0300-\\u036F\\u1AB0-\\u1AFF\\u1DC0-\\u1DFF\\u20D0-\\u20FF\\uFE20-\\uFE2F]',
+           '', 'g')
+$$;
+
+ALTER TABLE ati_verse_search
+  ADD COLUMN IF NOT EXISTS tsv_folded TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', ati_fold_diacritics(ptext))) STORED;
+
+CREATE INDEX IF NOT EXISTS ati_verse_search_tsv_folded_idx
+  ON ati_verse_search USING gin (tsv_folded);
+
+ANALYZE ati_verse_search;
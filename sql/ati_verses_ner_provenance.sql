@@ -0,0 +1,21 @@
+-- -------------------------------------------------------------------
+-- Which model and which text produced ati_verses.ner_span.
+-- bulk_tag_verses.py only re-tags rows where either one has moved:
+--   ner_model_fingerprint <> fingerprint of the model being run
+--   ner_text_hash         <> cleaned_text_hash (text edited since tagging)
+-- The fingerprint hashes the tokenizer and the components that write
+-- doc.ents, so a release that only bumps meta.json / span_ruler is a no-op.
+-- -------------------------------------------------------------------
+ALTER TABLE ati_verses
+  ADD COLUMN IF NOT EXISTS ner_model_version     TEXT,
+  ADD COLUMN IF NOT EXISTS ner_model_fingerprint TEXT,
+  ADD COLUMN IF NOT EXISTS ner_text_hash         TEXT,
+  ADD COLUMN IF NOT EXISTS ner_tagged_at         TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS ati_verses_ner_fingerprint_idx
+  ON ati_verses (ner_model_fingerprint, id);
+
+-- what is stale for a given fingerprint
+-- SELECT count(*) FROM ati_verses
+-- WHERE ner_model_fingerprint IS DISTINCT FROM :'fingerprint'
+--    OR ner_text_hash IS DISTINCT FROM cleaned_text_hash;
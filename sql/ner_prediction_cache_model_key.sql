@@ -0,0 +1,9 @@
+-- -------------------------------------------------------------------
+-- ner_prediction_cache used to be keyed on en_sutta_ner's meta version,
+-- which every dev build leaves at 0.0.0, so two different dev models
+-- shared cached spans. It is now keyed on ner_cache.model_key:
+-- "<meta version>+<fingerprint of the tokenizer and ents components>".
+-- Old rows cannot be attributed to a fingerprint, so they are dropped.
+-- -------------------------------------------------------------------
+ALTER TABLE ner_prediction_cache RENAME COLUMN model_version TO model_key;
+DELETE FROM ner_prediction_cache WHERE model_key NOT LIKE '%+%';
@@ -1,22 +1,21 @@
+import argparse
+import os
 import psycopg
 # from psycopg.rows import dict_row
 # import json
 import sys
-import unicodedata
 
-conn = psycopg.connect("dbname=tipitaka user=alee")
-
-term = sys.argv[1]
+parser = argparse.ArgumentParser(description="Best-matching suttas for a term, one paragraph per line.")
+parser.add_argument("term")
+parser.add_argument("--limit", type=int, default=200, help="Stop after N suttas (0 = all)")
+parser.add_argument("--itersize", type=int, default=50,
+                    help="Rows fetched per round-trip from the server-side cursor")
+args = parser.parse_args()
+term = args.term
 if not term:
     sys.exit(-1)
 
-
-def strip_diacritics(s):
-    return "".join(
-        c
-        for c in unicodedata.normalize("NFD", s)
-        if unicodedata.category(c) != "Mn"
-    )
+conn = psycopg.connect("dbname=tipitaka user=alee")
 
 
 
@@ -48,39 +47,36 @@ def strip_diacritics(s):
 
 sql = '''
 WITH q AS (
-  SELECT websearch_to_tsquery('english', %(term)s) AS tsq
-),
-para AS (  -- flatten with ordinality
-  SELECT s.nikaya, s.identifier, s.title,
-         t.ord AS verse_num, (t.v->>'text') AS ptext
-  FROM ati_suttas s
-  CROSS JOIN LATERAL jsonb_array_elements(s.verses) WITH ORDINALITY AS t(v, ord)
+  -- fold the query the same way tsv_folded was built, so "Sāriputta" and
+  -- "Sariputta" are one search (sql/ati_verse_search_folded.sql)
+  SELECT websearch_to_tsquery('english', ati_fold_diacritics(%(term)s)) AS tsq
 ),
-sutta_hits AS (
-  SELECT p.nikaya, p.identifier, p.title,
-         SUM(ts_rank_cd(to_tsvector('english', p.ptext), q.tsq)) AS rank,
-         STRING_AGG(p.ptext, E'\n' ORDER BY p.verse_num)        AS paragraph
-  FROM para p
+sutta_hits AS (  -- GIN lookup on the stored tsvector (sql/ati_verse_search.sql)
+  SELECT v.nikaya, v.identifier, v.title,
+         SUM(ts_rank_cd(v.tsv_folded, q.tsq))           AS rank,
+         STRING_AGG(v.ptext, E'\n' ORDER BY v.ord)      AS paragraph
+  FROM ati_verse_search v
   CROSS JOIN q
-  WHERE to_tsvector('english', p.ptext) @@ q.tsq
-  GROUP BY p.nikaya, p.identifier, p.title
+  WHERE v.tsv_folded @@ q.tsq
+  GROUP BY v.nikaya, v.identifier, v.title
 )
 SELECT regexp_replace(trim(paragraph), E'[\\t\\n\\r]+', ' ', 'g') AS paragraph
 FROM sutta_hits
 ORDER BY rank DESC, length(paragraph) DESC, gen_random_uuid()
-LIMIT 200;
+LIMIT %(limit)s;  -- NULL = no limit
 '''
 
-params = {"term": term}
-with conn.cursor() as cur:
-    cur.execute(sql, params)
-    for (paragraph,) in cur:
-        print(paragraph)
-
-s_term = strip_diacritics(term)
-if s_term != term:
-    params = {"term": s_term}
-    with conn.cursor() as cur:
+params = {"term": term, "limit": args.limit or None}
+# named (server-side) cursor: rows arrive itersize at a time and are printed as
+# they come, so `| head` or `| tag_from_stdin.py` starts at once in constant memory
+try:
+    with conn, conn.cursor(name="term_search") as cur:
+        cur.itersize = args.itersize
         cur.execute(sql, params)
-        for (paragraph,) in cur:  # tuple-unpack the single column
+        for (paragraph,) in cur:
             print(paragraph, flush=True)
+except BrokenPipeError:
+    # reader went away (head): closing the cursor above stops the server side;
+    # point stdout at devnull so the interpreter's final flush doesn't raise again
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    sys.exit(0)
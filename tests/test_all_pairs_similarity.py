@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+
+from sutta_nlp.base import all_pairs_similarity
+
+N = 53   # prime: no block size below divides it
+rng = np.random.RandomState(7)
+DENSE = rng.rand(N, 30) * (rng.rand(N, 30) < 0.3)
+DENSE[[10, 40]] = DENSE[3]   # exact duplicates of row 3: score 1.0 with each other, ties in top-k
+DENSE[20] = 0.0              # an empty row has no neighbours
+MARGIN = 1e-4                # float32 scores vs float64 cosine_similarity
+
+
+def collect(blocks):
+    parts = list(blocks)
+    return tuple(np.concatenate(p) for p in zip(*parts))
+
+
+def expected_top_k(S, k, threshold=None):
+    out = {}
+    for i in range(N):
+        cols = np.array([j for j in range(N) if j != i and S[i, j] > 0
+                         and (threshold is None or S[i, j] >= threshold)], dtype=np.int64)
+        order = np.lexsort((cols, -S[i, cols])) if cols.size else cols
+        out[i] = cols[order][:k].tolist()
+    return out
+
+
+@pytest.fixture(params=["csr", "dense"])
+def M(request):
+    return sparse.csr_matrix(DENSE) if request.param == "csr" else DENSE
+
+
+@pytest.mark.parametrize("block_size", [1, 7, N, 1000])
+def test_threshold_pairs_match_dense_cosine(M, block_size):
+    S = cosine_similarity(DENSE)
+    threshold = 0.4
+    i, j, s = collect(all_pairs_similarity(M, threshold=threshold, block_size=block_size))
+    assert np.all(i < j)   # each pair once, never (i, i)
+    got = dict(zip(zip(i.tolist(), j.tolist()), s.tolist()))
+    assert len(got) == len(i)
+    for (a, b), score in got.items():
+        assert score == pytest.approx(S[a, b], abs=MARGIN)
+    want = {(a, b) for a in range(N) for b in range(a + 1, N) if S[a, b] >= threshold + MARGIN}
+    assert want <= set(got)
+    assert all(S[a, b] >= threshold - MARGIN for a, b in got)
+    assert (3, 10) in got and (3, 40) in got and (10, 40) in got
+
+
+@pytest.mark.parametrize("threshold", [None, 0.3])
+@pytest.mark.parametrize("block_size", [1, 7, N, 1000])
+def test_top_k_matches_dense_cosine(M, block_size, threshold):
+    S = cosine_similarity(DENSE)
+    k = 4
+    i, j, s = collect(all_pairs_similarity(M, top_k=k, threshold=threshold, block_size=block_size))
+    assert np.all(i != j)
+    assert np.all(np.diff(i) >= 0)   # blocks come back in row order
+    got = {row: j[i == row].tolist() for row in range(N)}
+    assert got == expected_top_k(S, k, threshold)
+    assert got[20] == []
+    assert got[3][:2] == [10, 40]   # ties at 1.0 broken by column
+    assert np.allclose(s, S[i, j], atol=MARGIN)
+
+
+def test_parallel_blocks_match_serial():
+    M = sparse.csr_matrix(DENSE)
+    serial = collect(all_pairs_similarity(M, top_k=5, block_size=7))
+    parallel = collect(all_pairs_similarity(M, top_k=5, block_size=7, n_jobs=2))
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b)
+
+
+def test_needs_threshold_or_top_k():
+    with pytest.raises(ValueError):
+        next(all_pairs_similarity(DENSE))
@@ -39,13 +39,17 @@ scores = (X2 @ qv.T).toarray().ravel()        # (N,) one score per doc
 
 assert X2.shape[0] == len(docs)
 k = min(5, scores.size)
-idx = np.argpartition(-scores, k-1)[:k]
-idx = idx[np.argsort(-scores[idx], kind="stable")]
+hits = v2.search("bhikkhu Ambalaṭṭhika wholesome", k=k)
+idx = [i for i in np.lexsort((np.arange(scores.size), -scores))[:k] if scores[i] > 0]
+assert [rec["doc_id"] for rec in hits] == [docs[i]["doc_id"] for i in idx]
+assert np.allclose([rec["score"] for rec in hits], scores[idx], atol=1e-6)
 
+# batched + chunked gives the same answer
+assert v2.search(["bhikkhu Ambalaṭṭhika wholesome", "five aggregates"], k=k, row_chunk=100, query_chunk=1)[0] == hits
 
-for i in idx:
-    rec = docs[i]
-    print(f"{rec['title'][:60]:60}  {rec['identifier']:<24}  doc_id={rec['doc_id']}  score={scores[i]:.3f}")
+
+for rec in hits:
+    print(f"{rec['title'][:60]:60}  {rec['identifier']:<24}  doc_id={rec['doc_id']}  score={rec['score']:.3f}")
 
 n_docs, n_terms = X2.shape
 
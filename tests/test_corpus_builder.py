@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from sutta_nlp.base import CorpusBuilder, Vectorizer
+from sutta_nlp.cluster import middle_length_cluster
+
+SQL = "SELECT doc_id, identifier, title, raw_text FROM suttas"
+
+
+class FakeConn:
+    """Just enough of a psycopg connection for CorpusBuilder's named cursor; counts the reads."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+
+    def cursor(self, name=None):
+        assert name, "CorpusBuilder should stream through a server-side cursor"
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.conn.reads += 1
+
+    def __iter__(self):
+        return iter(self.conn.rows)
+
+
+def make_rows(n, seed, prefix="mn"):
+    r = np.random.RandomState(seed)
+    words = [f"{prefix}word{i}" for i in range(40)]
+    return [(i, f"{prefix}{i}", f"Title &amp; {i}", " ".join(r.choice(words, 30))) for i in range(n)]
+
+
+def test_spill_round_trips_exactly(tmp_path):
+    rows = [
+        (1, "mn1", "M&#257;la", "Sāriputta said: “friends”\n\ttabs and newlines"),
+        (2, "mn2", None, ""),
+        (3, "mn3", "Null text", None),
+        (4, "mn4", "Long", "x" * 100_000),
+    ]
+    conn = FakeConn(rows)
+    builder = CorpusBuilder(conn, SQL, cache_path=tmp_path / "corpus.bin")
+    first = list(builder)
+    assert first == [row[3] for row in rows]
+    assert list(builder) == first and conn.reads == 1   # second pass replays the spill
+
+    # a later builder over the same SELECT never touches the database
+    replay = CorpusBuilder(FakeConn([]), SQL, cache_path=tmp_path / "corpus.bin")
+    assert replay.doc_ids == builder.doc_ids
+    assert replay.doc_ids[0] == {"doc_id": 1, "identifier": "mn1", "title": "Māla"}
+    assert list(replay) == first
+
+
+def test_build_then_run_rebuilds_a_stale_spill(tmp_path, capsys):
+    out = tmp_path / "run"
+    old, new = make_rows(60, 1, "old"), make_rows(80, 2, "new")
+    middle_length_cluster.build_then_run(FakeConn(old), SQL, out, k_topics=3)
+
+    conn = FakeConn(new)   # same SELECT, same work dir, rows edited since
+    middle_length_cluster.build_then_run(conn, SQL, out, k_topics=3)
+    assert conn.reads == 1   # fit pass read Postgres, transform pass replayed the new spill
+
+    sidecar = json.loads((out / "corpus.bin.doc_ids.json").read_text(encoding="utf-8"))
+    assert [d["identifier"] for d in sidecar["doc_ids"]] == [row[1] for row in new]
+    assert list(CorpusBuilder(FakeConn([]), SQL, cache_path=out / "corpus.bin")) == [row[3] for row in new]
+
+    v = Vectorizer.load(out, require_matrix=True, require_index=True)
+    assert v._x_csr.shape[0] == len(new)
+    assert v.identifiers() == [row[1] for row in new]
+    assert all(term.startswith("new") for term in v.feature_names())
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_blobs
+
+from sutta_nlp.base import kmeans_sweep
+from sutta_nlp.local_settings import settings
+
+# stand-in for LSA doc vectors: four well-separated clusters
+Z, TRUTH = make_blobs(n_samples=600, n_features=8, centers=4, cluster_std=0.6, random_state=5)
+Z = Z.astype(np.float32)
+
+
+def test_one_row_per_k(tmp_path):
+    table, km, labels = kmeans_sweep(Z, [6, 2, 3, 4, 4, 5, 1, 600], sample_size=200, n_jobs=2, out_dir=tmp_path)
+    # duplicates dropped, k outside 2..n_docs-1 skipped, ascending
+    assert [row["k"] for row in table] == [2, 3, 4, 5, 6]
+    assert all({"k", "inertia", "silhouette", "fit_seconds", "score_seconds", "chosen"} <= set(row) for row in table)
+    assert [row["chosen"] for row in table].count(True) == 1
+    chosen = next(row for row in table if row["chosen"])
+    assert chosen["k"] == 4 == km.n_clusters
+    assert labels.shape == (len(Z),)
+
+    names = settings["BUNDLE"]
+    saved = json.loads((tmp_path / names["kmeans_sweep"]).read_text(encoding="utf-8"))
+    assert saved["table"] == table
+    assert np.array_equal(np.load(tmp_path / names["kmeans_labels"]), labels)
+
+
+def test_sampled_silhouette_is_deterministic():
+    def silhouettes(random_state):
+        table, _, _ = kmeans_sweep(Z, [3, 4, 5], sample_size=150, n_jobs=2, random_state=random_state)
+        return [row["silhouette"] for row in table]
+
+    first = silhouettes(11)
+    assert silhouettes(11) == first
+    assert silhouettes(12) != first   # the sample (and the fit) follow random_state
+
+
+def test_simplified_silhouette_and_bad_args():
+    table, _, _ = kmeans_sweep(Z, [3, 4], silhouette="simplified", n_jobs=1)
+    assert [row["k"] for row in table] == [3, 4]
+    assert table[1]["chosen"]
+    with pytest.raises(ValueError):
+        kmeans_sweep(Z, [3], silhouette="full")
+    with pytest.raises(ValueError):
+        kmeans_sweep(Z, [1, 600])
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from sutta_nlp.web.app.api.batcher import MicroBatcher
+
+
+class Recorder:
+    """Handler that records every batch it gets and answers (item, batch number)."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        with self.lock:
+            self.batches.append(list(items))
+            n = len(self.batches)
+        if self.fail_on is not None and self.fail_on in items:
+            raise ValueError(f"model failed on {self.fail_on}")
+        return [(item, n) for item in items]
+
+
+def test_every_caller_gets_its_own_results_in_order():
+    handler = Recorder()
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=2)
+    n_threads, per_thread = 12, 30
+    got = {}
+    start = threading.Barrier(n_threads)
+
+    def caller(t):
+        start.wait()
+        got[t] = [batcher((t, i), timeout=10)[0] for i in range(per_thread)]
+
+    threads = [threading.Thread(target=caller, args=(t,)) for t in range(n_threads)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(timeout=30)
+    assert got == {t: [(t, i) for i in range(per_thread)] for t in range(n_threads)}
+    assert sum(len(b) for b in handler.batches) == n_threads * per_thread
+    assert max(len(b) for b in handler.batches) <= 8
+    assert any(len(b) > 1 for b in handler.batches)   # concurrent calls did share batches
+    assert batcher.stats()["items"] == n_threads * per_thread
+
+
+def test_flushes_at_max_batch_size_without_waiting():
+    handler = Recorder()
+    batcher = MicroBatcher(handler, max_batch_size=4, max_wait_ms=10_000)
+    started = time.monotonic()
+    futures = [batcher.submit(i) for i in range(4)]
+    assert [f.result(timeout=2) for f in futures] == [(i, 1) for i in range(4)]
+    assert time.monotonic() - started < 2   # nowhere near the 10 s wait
+    assert handler.batches == [[0, 1, 2, 3]]
+
+
+def test_flushes_a_partial_batch_at_the_timeout():
+    handler = Recorder()
+    batcher = MicroBatcher(handler, max_batch_size=100, max_wait_ms=150)
+    started = time.monotonic()
+    futures = [batcher.submit(i) for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == [(0, 1), (1, 1), (2, 1)]
+    elapsed = time.monotonic() - started
+    assert 0.1 <= elapsed < 2
+    assert handler.batches == [[0, 1, 2]]
+
+
+def test_model_error_reaches_every_waiter_in_the_batch():
+    handler = Recorder(fail_on="boom")
+    batcher = MicroBatcher(handler, max_batch_size=3, max_wait_ms=10_000)
+    futures = [batcher.submit(item) for item in ("a", "boom", "c")]
+    for f in futures:
+        with pytest.raises(ValueError, match="model failed on boom"):
+            f.result(timeout=2)   # raises instead of hanging
+    # the worker thread survives for the next batch
+    assert [f.result(timeout=2) for f in [batcher.submit(x) for x in "xyz"]] == [("x", 2), ("y", 2), ("z", 2)]
+
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=10_000)
+    futures = [batcher.submit(i) for i in range(2)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="1 results for 2 items"):
+            f.result(timeout=2)
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+
+from sutta_nlp.web.app.api import ner_cache
+from sutta_nlp.web.app.api.ner_cache import PredictionCache, model_key, text_hash
+
+SPANS = [{"start": 0, "end": 9, "label": "PERSON"}]
+
+
+class FakeTable:
+    """In-memory ner_prediction_cache standing in for the db helpers."""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = 0
+
+    def fetch_one(self, hash_value, key, dsn=None):
+        self.queries += 1
+        return self.rows.get((hash_value, key))
+
+    def save_one(self, hash_value, key, spans, dsn=None):
+        self.rows[(hash_value, key)] = spans
+
+    def fetch_many(self, conn, hashes, key):
+        self.queries += 1
+        return {h: self.rows[(h, key)] for h in hashes if (h, key) in self.rows}
+
+    def save_many(self, conn, key, items):
+        for h, spans in items:
+            self.rows[(h, key)] = spans
+
+
+class FakeConn:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeTable()
+    monkeypatch.setattr(ner_cache.db, "fetch_cached_prediction", table.fetch_one)
+    monkeypatch.setattr(ner_cache.db, "save_cached_prediction", table.save_one)
+    monkeypatch.setattr(ner_cache.db, "fetch_cached_predictions", table.fetch_many)
+    monkeypatch.setattr(ner_cache.db, "save_cached_predictions", table.save_many)
+    return table
+
+
+def key(version, fingerprint):
+    return model_key(SimpleNamespace(meta={"version": version}), fingerprint)
+
+
+def test_fingerprint_change_misses_same_key_hits(table):
+    cache = PredictionCache(maxsize=8)
+    old = key("0.0.0", "aaa")
+    cache.put("Sāriputta went", old, SPANS)
+
+    assert cache.get("Sāriputta went", old) == SPANS
+    assert cache.hits == 1 and table.queries == 0   # LRU hit, no DB round trip
+
+    # retrained weights under the same meta version: new fingerprint, new key
+    retrained = key("0.0.0", "bbb")
+    assert retrained != old
+    assert cache.get("Sāriputta went", retrained) is None
+    assert cache.misses == 1
+
+    # a fresh worker with the old model finds the spans in the shared table
+    other = PredictionCache(maxsize=8)
+    assert other.get("Sāriputta went", key("0.0.0", "aaa")) == SPANS
+    assert other.db_hits == 1
+    assert other.get("Sāriputta went", retrained) is None
+
+
+def test_lookup_uses_the_nfc_form():
+    cache = PredictionCache(maxsize=8, persistent=False)
+    k = key("1.0.0", "aaa")
+    cache.put("Sāriputta", k, SPANS)   # decomposed ā
+    assert cache.get("Sāriputta", k) == SPANS
+    assert text_hash("Sāriputta") == text_hash("Sāriputta")
+
+
+def test_get_many_put_many_round_trip_keeps_order(table):
+    cache = PredictionCache()
+    conn = FakeConn()
+    k = key("0.0.0", "aaa")
+    texts = [f"verse {i}" for i in range(6)]
+    stored = [(texts[i], [{"start": 0, "end": i, "label": "GPE"}]) for i in (4, 1, 5)]
+
+    cache.put_many(stored, k, conn)
+    assert conn.commits == 1
+
+    got = cache.get_many(texts, k, conn)
+    assert got == [None, stored[1][1], None, None, stored[0][1], stored[2][1]]
+    assert table.queries == 1   # one query for the whole list
+    assert (cache.db_hits, cache.misses) == (3, 3)
+    assert cache.get_many(texts[::-1], k, conn) == got[::-1]
+    assert cache.get_many(texts, key("0.0.0", "bbb"), conn) == [None] * 6
@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+import pytest
+
+from sutta_nlp.search_index import VerseIndex
+from sutta_nlp.local_settings import settings
+
+# synthetic verses: no Postgres needed
+# (doc_id, identifier, title, nikaya, verse_num, text)
+ROWS = [
+    (10, "mn1", "Root", "MN", 1, "the monk sat under the tree"),
+    (11, "mn1", "Root", "MN", 2, "monk monk walked"),
+    (12, "mn2", "Fire", "MN", 1, "a tree by the river"),
+    (13, "sn1", "Sāriputta", "SN", 1, "Sāriputta taught the monk"),
+    (14, "sn2", "Twins", "SN", 1, "river and tree"),
+    (15, "sn3", "Twins", "SN", 2, "river and tree"),
+]
+
+
+@pytest.fixture
+def index():
+    return VerseIndex.build(ROWS, **settings["SEARCH"])
+
+
+def bm25(tf, dl, df, n_docs, avgdl):
+    k1, b = settings["SEARCH"]["k1"], settings["SEARCH"]["b"]
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+
+
+def test_save_load_round_trip_is_memory_mapped(index, tmp_path):
+    index.save(tmp_path / "idx")
+    loaded = VerseIndex.load(tmp_path / "idx")
+    for stream in ("exact", "folded"):
+        p, q = index.streams[stream], loaded.streams[stream]
+        assert isinstance(q.docs, np.memmap) and isinstance(q.positions, np.memmap)
+        assert q.terms == p.terms
+        for name in ("indptr", "docs", "tf", "pos_indptr", "positions"):
+            assert np.array_equal(getattr(q, name), getattr(p, name))
+    assert loaded.doc_index == index.doc_index
+    assert [loaded.text(i) for i in range(loaded.n_docs)] == [row[5] for row in ROWS]
+    assert loaded.search("river tree", k=6) == index.search("river tree", k=6)
+
+
+def test_bm25_matches_hand_computed_scores(index):
+    lens = [len(row[5].split()) for row in ROWS]
+    avgdl = sum(lens) / len(lens)
+    # "monk": tf 1 in row 0 (6 tokens), 2 in row 1 (3 tokens), 1 in row 3 (4 tokens); df 3
+    expected = {row: bm25(tf, lens[row], 3, len(ROWS), avgdl) for row, tf in ((0, 1), (1, 2), (3, 1))}
+    scores = index.scores("monk")
+    for row, score in expected.items():
+        assert scores[row] == pytest.approx(score, rel=1e-5)
+    assert np.count_nonzero(scores) == 3
+
+    hits = index.search("monk", k=10)
+    assert [h["doc_id"] for h in hits] == [11, 13, 10]   # higher tf, then shorter doc
+    assert hits[0]["score"] == pytest.approx(expected[1], abs=1e-4)
+
+
+def test_top_k_orders_ties_by_row(index):
+    # rows 4 and 5 are the same text, so they score the same
+    hits = index.search("river and tree", k=2, with_text=False)
+    assert [h["doc_id"] for h in hits] == [14, 15]
+    assert hits[0]["score"] == hits[1]["score"]
+    # a tie straddling the cut keeps the lower row
+    assert [h["doc_id"] for h in index.search("and", k=1)] == [14]
+
+    scores = np.array([0.0, 2.0, 1.0, 2.0, 1.0, 3.0], dtype=np.float32)
+    assert index.top_k(scores, 3).tolist() == [5, 1, 3]
+    assert index.top_k(scores, 4).tolist() == [5, 1, 3, 2]
+    assert index.top_k(scores, 10).tolist() == [5, 1, 3, 2, 4]
+
+
+def test_empty_and_unknown_queries(index):
+    for query in ("", "   ", "nibbana", "!!!"):
+        assert not index.scores(query).any()
+        assert index.search(query) == []
+    assert index.top_k(index.scores("monk"), 0).size == 0
+    # an unknown word next to a known one is ignored
+    assert index.search("monk nibbana") == index.search("monk")
+
+
+PHRASE_ROWS = [
+    (20, "an1", "Repeats", "AN", 1, "a a a"),
+    (21, "an1", "Repeats", "AN", 2, "a a a a"),
+    (22, "an2", "Gone", "AN", 1, "the Tathagata, well-gone, teaches"),
+    (23, "an3", "Near", "AN", 1, "monk one two tree"),
+    (24, "an4", "Ascii", "AN", 1, "Sariputta went to Savatthi"),
+]
+
+
+@pytest.fixture
+def phrases():
+    return VerseIndex.build(PHRASE_ROWS, **settings["SEARCH"])
+
+
+def test_repeated_phrase_matches_do_not_overlap(phrases):
+    hits = {h["doc_id"]: h for h in phrases.phrase_search("a a", k=10)}
+    assert {doc: h["matches"] for doc, h in hits.items()} == {20: 1, 21: 2}
+    assert [(s["start"], s["end"]) for s in hits[21]["spans"]] == [(0, 3), (4, 7)]
+    assert {h["doc_id"]: h["matches"] for h in phrases.phrase_search("a a a", k=10)} == {20: 1, 21: 1}
+
+
+def test_phrase_across_a_hyphen(phrases):
+    # "well-gone" is the tokens well, gone: either spelling of the phrase finds it
+    for phrase in ("well gone", "well-gone", "tathagata well gone"):
+        hits = phrases.phrase_search(phrase, k=10)
+        assert [h["doc_id"] for h in hits] == [22], phrase
+    span = phrases.phrase_search("well gone")[0]["spans"][0]
+    assert PHRASE_ROWS[2][5][span["start"]:span["end"]] == "well-gone"
+    assert phrases.phrase_search("gone well") == []
+
+
+def test_near_window_boundary(phrases):
+    # monk at token 0, tree at token 3: three tokens apart
+    assert [h["doc_id"] for h in phrases.near_search("monk tree", 3)] == [23]
+    assert [h["doc_id"] for h in phrases.near_search("tree monk", 3)] == [23]
+    assert phrases.near_search("monk tree", 2) == []
+    mode, hits = phrases.query("monk NEAR/3 tree")
+    assert mode == "near" and hits[0]["spans"][0] == {"start": 0, "end": 17, "label": "NEAR"}
+    assert phrases.query("monk NEAR/2 tree") == ("near", [])
+
+
+def test_folded_and_exact_streams(phrases):
+    # diacritic query against a plain-ASCII row
+    assert [h["doc_id"] for h in phrases.search("Sāriputta")] == [24]
+    assert [h["doc_id"] for h in phrases.phrase_search("Sāriputta went to Sāvatthī")] == [24]
+    assert phrases.search("Sāriputta", exact=True) == []
+    assert phrases.phrase_search("Sāriputta went", exact=True) == []
+    assert [h["doc_id"] for h in phrases.search("sariputta", exact=True)] == [24]
+
+
+# ati_verse_search rows for my_fuzzyish_search: (sutta_id, identifier, title, nikaya, ord, ptext)
+PARAGRAPHS = [
+    (1, "mn9", "Right View", "MN", 1, "The five clinging aggregates are suffering."),
+    (1, "mn9", "Right View", "MN", 2, "Form is one aggregate; feeling is another aggregate."),
+    (2, "sn22.1", "Nakulapita", "SN", 1, "Sariputta spoke of the aggregates to the householder."),
+    (2, "sn22.1", "Nakulapita", "SN", 2, "The householder listened to Sariputta, and Sariputta taught."),
+    (3, "mn28", "Elephant Footprint", "MN", 1, "Sariputta said: the five aggregates, friends."),
+]
+
+# my_fuzzyish_search.py's Postgres report over PARAGRAPHS (plainto_tsquery('english') +
+# ts_headline HighlightAll), worked out by hand for queries whose words are their own stems
+PG_REPORT = {
+    "sariputta": [
+        {"nikaya": "SN", "identifier": "sn22.1", "title": "Nakulapita", "matched_paragraphs": 2, "total_hits": 3},
+        {"nikaya": "MN", "identifier": "mn28", "title": "Elephant Footprint", "matched_paragraphs": 1, "total_hits": 1},
+    ],
+    # "five" is not a Postgres stop word (it is one of sklearn's)
+    "the five aggregates": [
+        {"nikaya": "MN", "identifier": "mn28", "title": "Elephant Footprint", "matched_paragraphs": 1, "total_hits": 2},
+        {"nikaya": "MN", "identifier": "mn9", "title": "Right View", "matched_paragraphs": 1, "total_hits": 2},
+    ],
+    # stop words only: plainto_tsquery is empty and matches nothing
+    "the": [],
+    "to the": [],
+}
+
+
+@pytest.fixture
+def paragraphs():
+    return VerseIndex.build(PARAGRAPHS, **settings["SEARCH"])
+
+
+@pytest.mark.parametrize("query", sorted(PG_REPORT))
+def test_hit_counts_match_postgres_report(paragraphs, query):
+    assert paragraphs.hit_counts(query) == PG_REPORT[query]
+    assert paragraphs.hit_counts(query, limit=1) == PG_REPORT[query][:1]
+
+
+def test_hit_counts_match_tokens_not_stems(paragraphs):
+    # Postgres stems "aggregate" and "aggregates" alike and reports all three suttas;
+    # the index counts the surface word only (documented in hit_counts and --help)
+    assert paragraphs.hit_counts("aggregate") == [
+        {"nikaya": "MN", "identifier": "mn9", "title": "Right View", "matched_paragraphs": 1, "total_hits": 2},
+    ]
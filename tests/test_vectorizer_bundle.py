@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pytest
+
+from sutta_nlp.base import Vectorizer
+from sutta_nlp.local_settings import settings
+
+# synthetic corpus: no Postgres needed
+rng = np.random.RandomState(0)
+WORDS = [f"term{i}" for i in range(400)]
+TOPICS = rng.dirichlet(np.full(len(WORDS), 0.05), 8)
+
+
+def make_texts(n, seed):
+    r = np.random.RandomState(seed)
+    return [" ".join(r.choice(WORDS, 60, p=r.dirichlet(np.full(8, 0.2)) @ TOPICS)) for _ in range(n)]
+
+
+def make_docs(n, start=0):
+    return [{"doc_id": start + i, "identifier": f"doc{start + i}", "title": "t"} for i in range(n)]
+
+
+PARAMS = dict(settings["TFIDF"], min_df=1, max_df=1.0, ngram_range=(1, 1))
+TEXTS = make_texts(300, 1)
+
+
+@pytest.fixture
+def bundle(tmp_path):
+    v = Vectorizer(default_dir=tmp_path, **PARAMS)
+    v._x_csr = v.fit_transform(TEXTS)
+    v.set_doc_index(make_docs(len(TEXTS)))
+    v.save(tmp_path)
+    return tmp_path
+
+
+def manifest(bundle_dir):
+    return json.loads((bundle_dir / settings["BUNDLE"]["manifest"]).read_text(encoding="utf-8"))
+
+
+def test_lsa_cache_survives_save_and_load(tmp_path):
+    v = Vectorizer(default_dir=tmp_path, **PARAMS)
+    v._x_csr = v.fit_transform(TEXTS)   # sklearn leaves the indices unsorted; save() writes them sorted
+    v.set_doc_index(make_docs(len(TEXTS)))
+    v.lsa(30)
+    v.save(tmp_path)
+    fitted_at = manifest(tmp_path)["lsa"]["fitted_at"]
+
+    w = Vectorizer.load(tmp_path, require_matrix=True)
+    assert w._x_hash() == manifest(tmp_path)["lsa"]["x_hash"]
+    w.lsa(30)
+    assert manifest(tmp_path)["lsa"]["fitted_at"] == fitted_at   # cache hit, no refit
+
+
+def test_lsa_refit_keeps_ann_valid(bundle):
+    v = Vectorizer.load(bundle, require_matrix=True, require_index=True)
+    v.build_ann(40)
+    v.save(bundle)
+
+    w = Vectorizer.load(bundle, require_matrix=True, require_index=True)
+    w.lsa(60)   # refit + persist into the same bundle
+
+    u = Vectorizer.load(bundle, require_matrix=True, require_index=True)
+    hits = u.more_like_this(text=TEXTS[7], k=3)
+    assert hits[0]["doc_id"] == 7
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_save_does_not_reorder_callers_matrix(tmp_path):
+    v = Vectorizer(**PARAMS)
+    X = v.fit_transform(TEXTS)
+    indices = X.indices.copy()
+    v.save(tmp_path, X=X, docs=make_docs(len(TEXTS)))
+    assert np.array_equal(X.indices, indices)
+
+
+def test_partial_update_drops_stale_ann(bundle):
+    v = Vectorizer.load(bundle, require_matrix=True, require_index=True, mmap=False)
+    v.build_ann(20)
+    v.save(bundle)
+
+    w = Vectorizer.load(bundle, require_matrix=True, require_index=True, mmap=False)
+    new = make_texts(10, 2)
+    docs = make_docs(5, start=100) + make_docs(5, start=1000)   # 5 replaced, 5 appended
+    w.partial_update(new, docs)
+    with pytest.raises(AssertionError, match="No ANN index"):
+        w.more_like_this(doc_id=110)
+    w.save(bundle)
+    assert "ann" not in manifest(bundle)
+
+    w.build_ann(20)
+    hits = w.more_like_this(doc_id=1004, k=3)
+    assert all(h["doc_id"] != 1004 for h in hits)
+    assert len(hits) == 3
+
+
+def test_saved_topics_match_only_same_params_and_x(bundle):
+    from sutta_nlp.topic_model import TopicModel
+
+    v = Vectorizer.load(bundle, require_matrix=True, require_index=True, mmap=False)
+    TopicModel.fit(v, 5, batch_size=100, epochs=1).save()
+    tm = TopicModel.load(bundle)
+    assert tm.matches(v, 5)
+    assert not tm.matches(v, 5, alpha_W=0.1)
+    v.partial_update(make_texts(3, 3), make_docs(3, start=2000))
+    assert not tm.matches(v, 5)
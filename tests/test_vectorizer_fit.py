@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from sutta_nlp.base import Vectorizer
+from sutta_nlp.local_settings import settings
+
+# synthetic corpus: no Postgres needed. Zipf-ish word draws so min_df/max_df and
+# max_features all cut something, plus accents for strip_accents and stop words
+rng = np.random.RandomState(3)
+WORDS = [f"word{i}" for i in range(300)] + ["the", "and", "of", "Sāriputta", "Sariputta", "bhikkhū"]
+P = 1.0 / np.arange(1, len(WORDS) + 1)
+P = rng.permutation(P / P.sum())
+TEXTS = [" ".join(rng.choice(WORDS, rng.randint(5, 80), p=P)) for _ in range(400)]
+
+TFIDF = settings["TFIDF"]
+PARAMS = {
+    "repo": TFIDF,
+    "max_features": dict(TFIDF, max_features=150),
+    "binary": dict(TFIDF, binary=True),
+    "no_idf": dict(TFIDF, use_idf=False),
+    "no_norm": dict(TFIDF, norm=None),
+    "no_smooth_idf": dict(TFIDF, smooth_idf=False),
+}
+
+
+def assert_same_fit(v: Vectorizer, X, sk: TfidfVectorizer, X_sk):
+    assert v._sk.vocabulary_ == sk.vocabulary_
+    if sk.use_idf:
+        assert v._sk.idf_.dtype == sk.idf_.dtype
+        assert np.array_equal(v._sk.idf_, sk.idf_)
+    X, X_sk = X.tocsr().sorted_indices(), X_sk.tocsr().sorted_indices()
+    assert X.dtype == X_sk.dtype and X.shape == X_sk.shape
+    assert np.array_equal(X.indptr, X_sk.indptr)
+    assert np.array_equal(X.indices, X_sk.indices)
+    assert np.array_equal(X.data, X_sk.data)   # bit for bit, not approx
+
+
+@pytest.mark.parametrize("chunk_size", [64, 5000])
+@pytest.mark.parametrize("name", sorted(PARAMS))
+def test_streaming_fit_matches_sklearn(name, chunk_size):
+    params = PARAMS[name]
+    sk = TfidfVectorizer(**params)
+    X_sk = sk.fit_transform(TEXTS)
+
+    v = Vectorizer(**params)
+    X = v.fit_transform(TEXTS, streaming=True, chunk_size=chunk_size)
+    assert_same_fit(v, X, sk, X_sk)
+    assert np.array_equal(v.document_frequencies(), np.bincount(X_sk.indices, minlength=X_sk.shape[1]))
+
+
+PRUNING = {
+    "repo": TFIDF,   # min_df=10, max_df=0.85
+    "tight": dict(TFIDF, ngram_range=(1, 1), min_df=3, max_df=0.3),
+    "counts": dict(TFIDF, min_df=0.02, max_df=40),   # float min_df, int max_df
+    "max_features": dict(TFIDF, max_features=150),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PRUNING))
+def test_parallel_fit_matches_serial(name):
+    params = PRUNING[name]
+    serial = Vectorizer(**params)
+    X1 = serial.fit_transform(TEXTS, n_jobs=1)
+
+    # small chunks: many per-chunk vocabularies merged before min_df/max_df pruning
+    parallel = Vectorizer(**params)
+    X2 = parallel.fit_transform(TEXTS, n_jobs=2, chunk_size=16)
+    assert_same_fit(parallel, X2, serial._sk, X1)
+
+    full = TfidfVectorizer(**dict(params, min_df=1, max_df=1.0, max_features=None)).fit(TEXTS)
+    assert len(parallel._sk.vocabulary_) < len(full.vocabulary_)   # pruning did cut terms
+
+    streamed = Vectorizer(**params)
+    X3 = streamed.fit_transform(TEXTS, streaming=True, n_jobs=2, chunk_size=16)
+    assert_same_fit(streamed, X3, serial._sk, X1)
@@ -0,0 +1,317 @@
+"""
+NMF topics over a Vectorizer bundle, persisted in the same bundle.
+
+TopicModel.fit streams X (memory-mapped from a format-2 bundle) through
+MiniBatchNMF.partial_fit, batch_size rows at a time for a few epochs, so a
+paragraph-level X never has to sit in memory as one block for the solver.
+The doc-topic matrix W, the topic-term matrix H, W's doc_ids and a table of
+each topic's top terms are written next to X (file names in
+settings["BUNDLE"], topics*); load() memory-maps them and reads the table,
+so looking at topics or at a topic's top docs needs neither a refit nor the
+fitted model itself.
+
+New paragraphs (e.g. appended with Vectorizer.partial_update) go through
+partial_fit: H takes one more mini-batch step and the new docs get W rows,
+appended; replace=True overwrites the row of a doc_id the model already has
+(only where doc_ids are unique -- not for paragraphs, which share their
+sutta's id). The vocabulary is the vectorizer's, so X_new must come from the
+same fitted Vectorizer.
+
+    python topic_model.py fit --bundle ati_para_run -k 200 --alpha-h 0.2 --l1-ratio 0.5
+    python topic_model.py show --bundle ati_para_run -n 15
+    python topic_model.py docs --bundle ati_para_run --topic 12 -k 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import MiniBatchNMF
+
+from base import Vectorizer, _replace_npy
+from local_settings import settings
+
+
+class TopicModel:
+    """W (docs x topics), H (topics x terms) and top terms of a MiniBatchNMF over a bundle's X."""
+
+    def __init__(self, W: np.ndarray, H: np.ndarray, doc_ids: np.ndarray, top_terms: List[List[Tuple[str, float]]],
+                 info: Dict[str, Any], *, model: Optional[MiniBatchNMF] = None, bundle_dir: Optional[Path] = None,
+                 terms: Optional[List[str]] = None):
+        self.W = W
+        self.H = H
+        self.doc_ids = doc_ids
+        self.top_terms_table = top_terms
+        self.info = info
+        self.bundle_dir = Path(bundle_dir) if bundle_dir else None
+        self._model = model
+        self._terms = terms
+
+    # ---------- fitting ----------
+    @classmethod
+    def fit(cls, v: Vectorizer, n_components: Optional[int] = None, *, batch_size: Optional[int] = None,
+            epochs: Optional[int] = None, **nmf_params) -> "TopicModel":
+        """
+        MiniBatchNMF over v's X, one partial_fit per batch_size rows, epochs
+        passes (the first in row order, later ones shuffled); W is then
+        computed batch by batch with the final H.
+        """
+        X = v._x_csr
+        assert X is not None, "No matrix: load the bundle with require_matrix=True"
+        cfg = settings["TOPICS"]
+        k = n_components or cfg["n_components"]
+        batch = max(batch_size or cfg["batch_size"], k)   # NNDSVD init needs >= k rows in the first batch
+        params = {"init": cfg["init"], "random_state": cfg["random_state"], **nmf_params}
+        model = MiniBatchNMF(n_components=k, batch_size=batch, **params)
+
+        t0 = time.perf_counter()
+        starts = np.arange(0, X.shape[0], batch)
+        rng = np.random.default_rng(params["random_state"])
+        for epoch in range(epochs or cfg["epochs"]):
+            for start in (starts if epoch == 0 else rng.permutation(starts)):
+                model.partial_fit(sparse.csr_matrix(X[start:start + batch]))
+        W = _transform_rows(model, X, batch)
+
+        n = X.shape[0]
+        doc_ids = np.asarray(v.doc_ids() if v.doc_index else np.arange(n), dtype=np.int64)
+        terms = v.feature_names()
+        info = {
+            "n_components": k, "batch_size": batch, "epochs": epochs or cfg["epochs"],
+            "params": _fit_params(nmf_params), "n_docs": n, "x_hash": v._x_hash(), "n_steps": int(model.n_steps_), "fit_seconds": round(time.perf_counter() - t0, 2),
+            "reconstruction_err": _reconstruction_err(X, W, model.components_, batch),
+            "fitted_at": datetime.now(tz=timezone.utc).isoformat(), "partial_fits": 0,
+        }
+        return cls(W, model.components_, doc_ids, _top_term_table(model.components_, terms, cfg["top_terms"]),
+                   info, model=model, bundle_dir=v.default_dir, terms=terms)
+
+    def matches(self, v: Vectorizer, n_components: Optional[int] = None, **nmf_params) -> bool:
+        """
+        Whether these topics are what fit(v, n_components, **nmf_params) would
+        give: same k and NMF params, fit on this very X (hash recorded at fit;
+        a partial_fit since then never matches).
+        """
+        return (self.info["n_components"] == (n_components or settings["TOPICS"]["n_components"])
+                and self.info["params"] == _fit_params(nmf_params)
+                and self.info.get("partial_fits", 0) == 0
+                and self.info["n_docs"] == v._x_csr.shape[0]
+                and self.info.get("x_hash") == v._x_hash())
+
+    def partial_fit(self, X_new, doc_ids: Sequence[int], *, replace: bool = False) -> "TopicModel":
+        """
+        One more mini-batch step on H from X_new (rows from the bundle's
+        Vectorizer, e.g. v.transform(new_texts)), then W rows for those docs,
+        appended. Rows of other docs keep the W they were given.
+
+        replace=True instead overwrites the W row of a doc_id the model
+        already has (new doc_ids are still appended). doc_ids must then be
+        unique in the model: a paragraph bundle, where doc_id is the sutta
+        id of every paragraph, raises ValueError.
+        """
+        if X_new.shape[0] != len(doc_ids):
+            raise ValueError("Pass one doc_id per row of X_new")
+        ids = np.array(self.doc_ids, dtype=np.int64)
+        new_ids = np.asarray(doc_ids, dtype=np.int64)
+        existing = np.full(len(new_ids), -1, dtype=np.int64)
+        if replace:
+            counts = Counter(ids.tolist())
+            if len(set(new_ids.tolist())) < len(new_ids) or any(counts[d] > 1 for d in new_ids.tolist()):
+                raise ValueError("replace=True needs doc_ids that identify one W row; these repeat")
+            row_of = {d: i for i, d in enumerate(ids.tolist())}
+            existing[:] = [row_of.get(d, -1) for d in new_ids.tolist()]
+        model = self.model
+        X_new = sparse.csr_matrix(X_new)
+        model.partial_fit(X_new)
+        W_new = _transform_rows(model, X_new, self.info["batch_size"])
+
+        W = np.array(self.W)   # writable copy; the loaded W is a read-only mmap
+        old = existing >= 0
+        W[existing[old]] = W_new[old]
+        self.W = np.vstack([W, W_new[~old]])
+        self.doc_ids = np.concatenate([ids, new_ids[~old]])
+        self.H = model.components_
+        self.top_terms_table = _top_term_table(self.H, self.terms, settings["TOPICS"]["top_terms"])
+        self.info.update(n_docs=int(self.W.shape[0]), n_steps=int(model.n_steps_),
+                         partial_fits=self.info.get("partial_fits", 0) + 1,
+                         updated_at=datetime.now(tz=timezone.utc).isoformat())
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        """Topic weights of new rows, H fixed."""
+        return _transform_rows(self.model, sparse.csr_matrix(X), self.info["batch_size"])
+
+    # ---------- inspection (no model needed) ----------
+    def top_terms(self, j: int, n: int = 12) -> List[Tuple[str, float]]:
+        """[(term, weight), ...] for topic j, descending; from the saved table when it is long enough."""
+        if n <= len(self.top_terms_table[j]):
+            return [tuple(tw) for tw in self.top_terms_table[j][:n]]
+        return _top_term_table(self.H[j:j + 1], self.terms, n)[0]
+
+    def top_docs(self, j: int, k: int = 5, docs: Optional[Sequence[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        [{doc_id, weight}, ...] for topic j, descending. With docs (a
+        Vectorizer's doc index) each record is that doc's, plus weight.
+        """
+        col = np.asarray(self.W[:, j])
+        k = min(k, col.size)
+        idx = np.argpartition(-col, k - 1)[:k]
+        idx = idx[np.argsort(-col[idx], kind="stable")]
+        by_id = None
+        if docs is not None:
+            by_id = {int(r["doc_id"]): r for r in docs}
+        out = []
+        for i in idx:
+            doc_id = int(self.doc_ids[i])
+            rec = dict(by_id[doc_id]) if by_id is not None and doc_id in by_id else {"doc_id": doc_id}
+            out.append({**rec, "weight": float(col[i])})
+        return out
+
+    def show_top_terms(self, n: int = 15) -> None:
+        for j in range(self.H.shape[0]):
+            print(f"Topic {j:02d}:")
+            print("  " + ", ".join(f"{t} ({w:.3f})" for t, w in self.top_terms(j, n)))
+            print()
+
+    @property
+    def model(self) -> MiniBatchNMF:
+        if self._model is None:
+            assert self.bundle_dir is not None, "No fitted model: fit() or load() one"
+            self._model = joblib.load(self.bundle_dir / settings["BUNDLE"]["topics_model"])
+        return self._model
+
+    @property
+    def terms(self) -> List[str]:
+        if self._terms is None:
+            assert self.bundle_dir is not None, "No vocabulary: fit() or load() from a bundle"
+            self._terms = Vectorizer.load(self.bundle_dir, strict=True).feature_names()
+        return self._terms
+
+    # ---------- persistence ----------
+    def save(self, bundle_dir: Optional[Path] = None) -> Path:
+        """Write the model, W, H, doc_ids and topics.json into the bundle dir (arrays renamed into place)."""
+        names = settings["BUNDLE"]
+        out = Path(bundle_dir or self.bundle_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self.model, out / names["topics_model"])
+        _replace_npy(out / names["topics_W"], self.W)
+        _replace_npy(out / names["topics_H"], self.H)
+        _replace_npy(out / names["topics_doc_ids"], self.doc_ids)
+        (out / names["topics"]).write_text(json.dumps(
+            {**self.info, "top_terms": self.top_terms_table}, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.bundle_dir = out
+        return out
+
+    @classmethod
+    def load(cls, bundle_dir: Path, *, mmap: bool = True) -> "TopicModel":
+        """W, H and doc_ids memory-mapped, the top-term table from topics.json; the model loads on first use."""
+        names = settings["BUNDLE"]
+        bundle_dir = Path(bundle_dir)
+        meta = json.loads((bundle_dir / names["topics"]).read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        W, H, doc_ids = (np.load(bundle_dir / names[key], mmap_mode=mode)
+                         for key in ("topics_W", "topics_H", "topics_doc_ids"))
+        top_terms = meta.pop("top_terms")
+        return cls(W, H, doc_ids, top_terms, meta, bundle_dir=bundle_dir)
+
+    @staticmethod
+    def exists(bundle_dir: Path) -> bool:
+        return (Path(bundle_dir) / settings["BUNDLE"]["topics"]).exists()
+
+
+def _fit_params(nmf_params: Dict[str, Any]) -> Dict[str, Any]:
+    """MiniBatchNMF params of a fit: settings["TOPICS"] defaults under the caller's (JSON-safe for topics.json)."""
+    cfg = settings["TOPICS"]
+    params = {"init": cfg["init"], "random_state": cfg["random_state"], **nmf_params}
+    return {key: val for key, val in params.items() if isinstance(val, (int, float, str, type(None)))}
+
+
+def _transform_rows(model: MiniBatchNMF, X, batch: int) -> np.ndarray:
+    """model.transform over X, batch rows at a time."""
+    blocks = [model.transform(sparse.csr_matrix(X[start:start + batch])) for start in range(0, X.shape[0], batch)]
+    if not blocks:
+        return np.empty((0, model.n_components_), dtype=model.components_.dtype)
+    return np.vstack(blocks)
+
+
+def _reconstruction_err(X, W: np.ndarray, H: np.ndarray, batch: int) -> float:
+    """Frobenius norm of X - WH, accumulated batch by batch (never densifies X)."""
+    sq = 0.0
+    HHt = H @ H.T
+    for start in range(0, X.shape[0], batch):
+        Xb = sparse.csr_matrix(X[start:start + batch])
+        Wb = W[start:start + batch]
+        # ||X - WH||^2 = ||X||^2 - 2 <X, WH> + ||WH||^2
+        sq += Xb.multiply(Xb).sum() - 2.0 * np.sum((Xb @ H.T) * Wb) + np.sum((Wb @ HHt) * Wb)
+    return round(float(np.sqrt(max(sq, 0.0))), 6)
+
+
+def _top_term_table(H: np.ndarray, terms: List[str], n: int) -> List[List[Tuple[str, float]]]:
+    table = []
+    for row in np.asarray(H):
+        n_row = min(n, row.size)
+        idx = np.argpartition(row, -n_row)[-n_row:]
+        idx = idx[np.argsort(row[idx])[::-1]]
+        table.append([(terms[i], round(float(row[i]), 6)) for i in idx])
+    return table
+
+
+# ---------- CLI ----------
+def fit_main(args) -> None:
+    v = Vectorizer.load(Path(args.bundle), strict=True, require_matrix=True)
+    nmf_params = {key: val for key, val in (("alpha_W", args.alpha_w), ("alpha_H", args.alpha_h),
+                                            ("l1_ratio", args.l1_ratio)) if val is not None}
+    tm = TopicModel.fit(v, args.k, batch_size=args.batch_size, epochs=args.epochs, **nmf_params)
+    tm.save(Path(args.bundle))
+    print(f"{tm.info['n_components']} topics over {tm.info['n_docs']} docs in {tm.info['fit_seconds']}s "
+          f"(reconstruction error {tm.info['reconstruction_err']}) -> {args.bundle}")
+
+
+def show_main(args) -> None:
+    TopicModel.load(Path(args.bundle)).show_top_terms(args.n)
+
+
+def docs_main(args) -> None:
+    tm = TopicModel.load(Path(args.bundle))
+    v = Vectorizer.load(Path(args.bundle), strict=False, require_index=True)
+    print(f"Topic {args.topic:02d}:", [t for t, _ in tm.top_terms(args.topic, 12)])
+    for row in tm.top_docs(args.topic, args.k, docs=v.get_doc_index()):
+        print(f"{row.get('identifier', row['doc_id'])!s:<22} {str(row.get('title', ''))[:48]:48}  w={row['weight']:.3f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="MiniBatchNMF topics over a Vectorizer bundle.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("fit", help="Fit topics over the bundle's X and save them into the bundle")
+    p.add_argument("--bundle", required=True)
+    p.add_argument("-k", type=int, default=None, help="Topics (default settings TOPICS n_components)")
+    p.add_argument("--batch-size", type=int, default=None)
+    p.add_argument("--epochs", type=int, default=None)
+    p.add_argument("--alpha-w", type=float, default=None)
+    p.add_argument("--alpha-h", type=float, default=None)
+    p.add_argument("--l1-ratio", type=float, default=None)
+    p.set_defaults(func=fit_main)
+
+    p = sub.add_parser("show", help="Top terms of every topic")
+    p.add_argument("--bundle", required=True)
+    p.add_argument("-n", type=int, default=15)
+    p.set_defaults(func=show_main)
+
+    p = sub.add_parser("docs", help="Top docs of one topic")
+    p.add_argument("--bundle", required=True)
+    p.add_argument("--topic", type=int, required=True)
+    p.add_argument("-k", type=int, default=5)
+    p.set_defaults(func=docs_main)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
@@ -0,0 +1,98 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Sequence
+
+logger = logging.getLogger("sutta_nlp.web.api")
+
+
+class MicroBatcher:
+    """
+    Collect single-item calls from many request threads and hand them to
+    `handler` in batches. A batch is dispatched when it reaches
+    `max_batch_size` or when the oldest item has waited `max_wait_ms`,
+    whichever comes first, so the added latency per request is bounded.
+
+    `handler(items) -> results` must return one result per item, in order.
+    """
+
+    def __init__(self, handler: Callable[[Sequence[Any]], Sequence[Any]], *,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, name: str = "micro-batcher"):
+        self.handler = handler
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item, timeout: float | None = None):
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # threads do not survive fork(); a forked worker starts its own
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch) -> None:
+        live = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            results = list(self.handler([item for item, _ in live]))
+            if len(results) != len(live):
+                raise RuntimeError(f"{self.name}: handler returned {len(results)} results for {len(live)} items")
+        except Exception as exc:
+            logger.exception("%s: batch of %d failed", self.name, len(live))
+            for _, fut in live:
+                fut.set_exception(exc)
+            return
+        self._batches += 1
+        self._items += len(live)
+        for (_, fut), result in zip(live, results):
+            fut.set_result(result)
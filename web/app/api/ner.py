@@ -1,44 +1,284 @@
 import logging
+import os
+import re
+import threading
+import time
 from pathlib import Path
 
 import spacy
 import unicodedata
 
+from .batcher import MicroBatcher
+from .ner_cache import cache_from_env, model_fingerprint, model_key
+
 logger = logging.getLogger("sutta_nlp.web.api")
 
+REPO_ROOT = Path(__file__).resolve().parents[3]  # api -> app -> web -> <repo root>
+DIST_DIR = REPO_ROOT / "dist"
+
+DEFAULT_MODEL = os.environ.get("NER_MODEL", "en_sutta_ner")
+# reload() only takes DEFAULT_MODEL, a dist/ version, or a model directory under here
+MODELS_DIR = Path(os.environ.get("NER_MODELS_DIR", DIST_DIR)).resolve()
+# the spec last passed to reload(), shared by every worker (see NerModelHolder.follow).
+# Runtime state, so it lives in the work dir rather than dist/, which releases replace
+MODEL_FILE = Path(os.environ.get("NER_MODEL_FILE", REPO_ROOT / "ne-data" / "work" / "ner_serving_model"))
+MODEL_CHECK_SECONDS = float(os.environ.get("NER_MODEL_CHECK_SECONDS", "2"))
+# the installed package must match this; dist/ versions loaded by reload() are taken as asked
+EXPECTED_VERSION = os.environ.get("NER_EXPECTED_VERSION", "1.2.3")
+# run_ner only reads doc.ents, so skip the span_ruler (the "ents-only" profile in
+# ne-data/scripts/local_settings.py); NER_EXCLUDE="" loads every pipe
+EXCLUDE = [name.strip() for name in os.environ.get("NER_EXCLUDE", "span_ruler").split(",") if name.strip()]
+# micro-batching: concurrent requests are grouped and run through nlp.pipe together
+BATCHING = os.environ.get("NER_BATCHING", "1") != "0"
+BATCH_SIZE = int(os.environ.get("NER_BATCH_SIZE", "32"))
+BATCH_WAIT_MS = float(os.environ.get("NER_BATCH_WAIT_MS", "5"))
+REQUEST_TIMEOUT = float(os.environ.get("NER_REQUEST_TIMEOUT", "30"))
+# prediction cache: in-process LRU + ner_prediction_cache table (see ner_cache.py)
+CACHING = os.environ.get("NER_CACHE", "1") != "0"
+WARMUP_TEXT = "Then Venerable Sāriputta went to Sāvatthī and stayed at Jeta's Grove."
+
+_VERSION_RE = re.compile(r"^\d+\.\d+\.\d+$")
+
+
+def resolve_model_spec(spec: str | None) -> str:
+    """
+    Map a model spec to something spacy.load() accepts.
+      None / DEFAULT_MODEL   -> the installed package (or whatever NER_MODEL names)
+      "1.2.4"                -> dist/en_sutta_ner-1.2.4/en_sutta_ner/en_sutta_ner-1.2.4
+      a path in MODELS_DIR   -> that path
+    Anything else raises ValueError: specs arrive over HTTP, and spacy.load()
+    runs code from whatever directory it is given.
+    """
+    spec = (spec or DEFAULT_MODEL).strip()
+    if spec == DEFAULT_MODEL:
+        return str(Path(spec).resolve()) if Path(spec).exists() else spec
+    if _VERSION_RE.match(spec):
+        path = DIST_DIR / f"en_sutta_ner-{spec}" / "en_sutta_ner" / f"en_sutta_ner-{spec}"
+        if not path.exists():
+            raise FileNotFoundError(f"No packaged model for version {spec} at {path}")
+        return str(path)
+    path = Path(spec).resolve()
+    if not path.is_relative_to(MODELS_DIR):
+        raise ValueError(f"Model {spec!r} is not {DEFAULT_MODEL}, a version in {DIST_DIR} or a path under {MODELS_DIR}")
+    if not path.is_dir():
+        raise FileNotFoundError(f"No model directory at {path}")
+    return str(path)
+
 
-def _load_nlp_model():
-    nlp = spacy.load("en_sutta_ner")
-    # using en_suttaq_ner 1.1.3
-    # pip freeze | grep sutta        
+def available_versions() -> list[str]:
+    """Versions packaged under dist/, oldest first."""
+    versions = []
+    for path in DIST_DIR.glob("en_sutta_ner-*"):
+        version = path.name.split("-", 1)[1]
+        if _VERSION_RE.match(version) and (path / "en_sutta_ner" / path.name).exists():
+            versions.append(version)
+    return sorted(versions, key=lambda v: tuple(int(x) for x in v.split(".")))
+
+
+def _load_nlp_model(spec: str | None = None):
+    source = resolve_model_spec(spec)
+    nlp = spacy.load(source, exclude=EXCLUDE)
+    # pip freeze | grep sutta
     # en_sutta_ner @ file:///Users/alee/sutta_nlp/dist/en_sutta_ner-1.1.3/dist/en_sutta_ner-1.1.3-py3-none-any.whl#sha256=3fba3db3b4062fd5cf1e66dea79a83b2d18f12a4d0145512d0f3a8933134b517
-    # ((venv) ) alee@Mac sutta_nlp % pip show en_sutta_ner          
-    # Name: en_sutta_ner
-    # Version: 1.1.3
-    # Summary: 
-    # Home-page: 
-    # Author: 
-    # Author-email: 
-    # License: 
-    # Location: /Users/alee/sutta_nlp/venv/lib/python3.12/site-packages
-    # Requires: spacy
-    # Required-by: 
-    assert nlp.meta.get("version") == "1.2.3", "Wrong en_sutta_ner version installed!"
-    return nlp
+    if source == "en_sutta_ner" and EXPECTED_VERSION:
+        assert nlp.meta.get("version") == EXPECTED_VERSION, "Wrong en_sutta_ner version installed!"
+    return nlp, source
+
+
+class NerModelHolder:
+    """
+    One spaCy pipeline per worker process.
+
+    Requests grab the current pipeline with get() and keep that reference for
+    the whole call, so reload() can swap in a new model without disturbing
+    requests that are already running on the old one. Loading happens outside
+    the swap lock; only the pointer change is serialized.
+
+    Under gunicorn every worker has its own holder, so reload() also writes the
+    spec to MODEL_FILE; follow() (called per request, at most every
+    MODEL_CHECK_SECONDS) reloads any worker whose model is older than the file.
+    The file also survives restarts: a new holder starts on the spec it names.
+    """
+
+    def __init__(self, spec: str | None = None):
+        self._seen = _model_file_stamp()
+        self._spec = spec or _read_model_file()
+        self._checked = time.monotonic()
+        self._nlp = None
+        self._info: dict = {}
+        self._swap_lock = threading.Lock()
+        self._load_lock = threading.Lock()   # one load at a time
+
+    def get(self):
+        nlp = self._nlp
+        if nlp is None:
+            with self._load_lock:
+                if self._nlp is None:
+                    self._install(*self._load(self._spec))
+                nlp = self._nlp
+        return nlp
+
+    def warmup(self) -> dict:
+        """Load (if needed) and push one text through so the first real request is not slow."""
+        self.get()(WARMUP_TEXT)
+        return self.info()
+
+    def reload(self, spec: str | None = None, *, publish: bool = True) -> dict:
+        """
+        Load `spec`, warm it, then swap it in. The old model stays live until the swap.
+        With publish, record the spec in MODEL_FILE so the other workers follow.
+        """
+        spec = (spec or DEFAULT_MODEL).strip()
+        with self._load_lock:
+            nlp, info = self._load(spec)
+            nlp(WARMUP_TEXT)
+            self._install(nlp, info)
+            if publish:
+                _write_model_file(spec)
+                self._seen = _model_file_stamp()
+        logger.info("NER model swapped in: %s %s (%s)", info["name"], info["version"], info["source"])
+        return self.info()
+
+    def follow(self) -> None:
+        """Reload if another worker has published a new spec since this one last looked."""
+        now = time.monotonic()
+        if now - self._checked < MODEL_CHECK_SECONDS:
+            return
+        self._checked = now
+        stamp = _model_file_stamp()
+        if stamp == self._seen:
+            return
+        self._seen = stamp   # claim it, so other threads keep serving while this one loads
+        spec = _read_model_file()
+        if spec is None:
+            return
+        try:
+            self.reload(spec, publish=False)
+        except Exception:
+            logger.exception("NER model %s from %s failed to load; previous model still serving", spec, MODEL_FILE)
+
+    def current(self):
+        """(nlp, cache key) for the serving model, read together so they cannot straddle a swap."""
+        self.get()
+        with self._swap_lock:
+            return self._nlp, self._info["cache_key"]
+
+    def info(self) -> dict:
+        with self._swap_lock:
+            info = dict(self._info, loaded=self._nlp is not None)
+        # loaded by a parent (gunicorn preload_app) and shared copy-on-write with it
+        info["preloaded"] = bool(info.get("pid")) and info["pid"] != os.getpid()
+        return info
+
+    def _load(self, spec):
+        started = time.perf_counter()
+        nlp, source = _load_nlp_model(spec)
+        fingerprint = model_fingerprint(nlp)
+        info = {
+            "name": nlp.meta.get("name"),
+            "version": nlp.meta.get("version"),
+            "fingerprint": fingerprint,
+            "cache_key": model_key(nlp, fingerprint),
+            "source": source,
+            "pipeline": list(nlp.pipe_names),
+            "load_seconds": round(time.perf_counter() - started, 3),
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "pid": os.getpid(),
+        }
+        return nlp, info
+
+    def _install(self, nlp, info):
+        with self._swap_lock:
+            self._nlp = nlp
+            self._info = info
+            self._spec = info["source"]
+
+
+def _model_file_stamp():
+    try:
+        st = MODEL_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_model_file() -> str | None:
+    try:
+        return MODEL_FILE.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_model_file(spec: str) -> None:
+    MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MODEL_FILE.with_name(f"{MODEL_FILE.name}.{os.getpid()}.tmp")
+    tmp.write_text(spec + "\n", encoding="utf-8")
+    os.replace(tmp, MODEL_FILE)
+
+
+MODEL = NerModelHolder()
+
+
+def warmup_ner_model() -> dict:
+    info = MODEL.warmup()
+    logger.info("NER model warm: %s %s in %.2fs", info.get("name"), info.get("version"), info.get("load_seconds", 0.0))
+    return info
+
+
+def reload_ner_model(spec: str | None = None) -> dict:
+    return MODEL.reload(spec)
+
+
+def ner_model_info() -> dict:
+    return MODEL.info()
+
+
+def _doc_to_payload(doc):
+    return {
+        "text": doc.text,
+        "spans": [
+            {
+                "start": ent.start_char,
+                "end": ent.end_char,
+                "label": ent.label_,
+                "text": ent.text,
+            }
+            for ent in doc.ents
+        ],
+    }
+
+
+def _run_ner_batch(texts):
+    """Returns (payload, model key) per text so results are cached under the model that made them."""
+    nlp, key = MODEL.current()  # one model for the whole batch, even if a reload lands mid-way
+    return [(_doc_to_payload(doc), key) for doc in nlp.pipe(texts, batch_size=BATCH_SIZE)]
+
+
+BATCHER = MicroBatcher(_run_ner_batch, max_batch_size=BATCH_SIZE, max_wait_ms=BATCH_WAIT_MS, name="ner-batcher")
+CACHE = cache_from_env()
+
+
+def ner_batcher_stats() -> dict:
+    return BATCHER.stats()
+
+
+def ner_cache_stats() -> dict:
+    return CACHE.stats() if CACHING else {"enabled": False}
 
 
 def run_ner(intext):
-    nlp = _load_nlp_model()  # want the LATEST model
+    MODEL.follow()
     text = unicodedata.normalize("NFC", intext.strip())
-    doc = nlp(text)
-    spans = [
-        {
-            "start": ent.start_char,
-            "end": ent.end_char,
-            "label": ent.label_,
-            "text": ent.text,
-        }
-        for ent in doc.ents
-    ]
-    logger.debug("NER spans=%d text_length=%d", len(spans), len(text))
-    return {"text": text, "spans": spans}
+    if CACHING:
+        spans = CACHE.get(text, MODEL.current()[1])
+        if spans is not None:
+            logger.debug("NER cache hit spans=%d text_length=%d", len(spans), len(text))
+            return {"text": text, "spans": spans}
+    if BATCHING:
+        result, key = BATCHER(text, timeout=REQUEST_TIMEOUT)
+    else:
+        result, key = _run_ner_batch([text])[0]
+    if CACHING:
+        CACHE.put(text, key, result["spans"])
+    logger.debug("NER spans=%d text_length=%d", len(result["spans"]), len(text))
+    return result
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import psycopg
+
+from ..db import db
+
+logger = logging.getLogger("sutta_nlp.web.api")
+
+
+# components whose output ends up in doc.ents (span_ruler writes doc.spans, not ents)
+ENTS_COMPONENTS = ("ner", "entity_ruler", "norp_head_ruler")
+
+
+def text_hash(text: str) -> str:
+    """md5 of the NFC form, so composed/decomposed diacritics share an entry."""
+    return hashlib.md5(unicodedata.normalize("NFC", text).encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(nlp) -> str:
+    """
+    Hash of everything that decides doc.ents: the tokenizer plus the
+    ents-writing components. meta.json (version, description, scores) and
+    span_ruler are left out, so re-packaging the same weights is free.
+    """
+    h = hashlib.sha1()
+    h.update(nlp.tokenizer.to_bytes(exclude=["vocab"]))
+    for name in ENTS_COMPONENTS:
+        if name in nlp.pipe_names:
+            h.update(name.encode("utf-8"))
+            h.update(nlp.get_pipe(name).to_bytes(exclude=["vocab"]))
+    return h.hexdigest()
+
+
+def model_key(nlp, fingerprint: str | None = None) -> str:
+    """Cache key for a pipeline: "<meta version>+<fingerprint>". Every dev build is 0.0.0."""
+    return f"{nlp.meta.get('version') or ''}+{fingerprint or model_fingerprint(nlp)}"
+
+
+class PredictionCache:
+    """
+    Two-level cache for NER spans keyed on (text_hash, model_key).
+
+    Level 1 is a bounded in-process LRU; level 2 is the ner_prediction_cache
+    table, shared by every worker and by the offline scripts. The model key
+    (see model_key) is part of the key, so a new model never sees old spans,
+    even a retrained one that kept its meta version; the LRU is also dropped
+    when the serving model changes to free the memory.
+    """
+
+    def __init__(self, maxsize: int = 4096, *, persistent: bool = True, dsn: str | None = None):
+        self.maxsize = max(0, int(maxsize))
+        self.persistent = persistent
+        self.dsn = dsn
+        self._lru: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_key: str | None = None
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, text: str, model_key: str):
+        key = (text_hash(text), model_key)
+        with self._lock:
+            self._check_model(model_key)
+            spans = self._lru.get(key)
+            if spans is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return spans
+        spans = self._db_get(*key)
+        with self._lock:
+            if spans is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, spans)
+        return spans
+
+    def put(self, text: str, model_key: str, spans: list) -> None:
+        key = (text_hash(text), model_key)
+        with self._lock:
+            self._check_model(model_key)
+            self._remember(key, spans)
+        self._db_put(*key, spans)
+
+    def get_many(self, texts: list[str], model_key: str, conn) -> list:
+        """
+        Spans (or None) for each text, from one DB query on `conn`. Offline
+        scripts use this instead of a get() and a new connection per row.
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        if self.persistent and hashes:
+            try:
+                found = db.fetch_cached_predictions(conn, hashes, model_key)
+            except psycopg.Error:
+                logger.warning("NER cache lookup failed; continuing without the DB tier", exc_info=True)
+                conn.rollback()
+        spans = [found.get(h) for h in hashes]
+        hits = sum(s is not None for s in spans)
+        with self._lock:
+            self.db_hits += hits
+            self.misses += len(spans) - hits
+        return spans
+
+    def put_many(self, items: list[tuple[str, list]], model_key: str, conn) -> None:
+        """Store (text, spans) pairs with one executemany on `conn`, and commit."""
+        if not self.persistent or not items:
+            return
+        try:
+            db.save_cached_predictions(conn, model_key, [(text_hash(text), spans) for text, spans in items])
+            conn.commit()
+        except psycopg.Error:
+            logger.warning("NER cache write failed; continuing without the DB tier", exc_info=True)
+            conn.rollback()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "persistent": self.persistent,
+            "model_key": self._model_key,
+        }
+
+    # ---- internals (LRU helpers expect self._lock held)
+    def _check_model(self, model_key: str) -> None:
+        if model_key != self._model_key:
+            self._lru.clear()
+            self._model_key = model_key
+
+    def _remember(self, key, spans) -> None:
+        if not self.maxsize:
+            return
+        self._lru[key] = spans
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _db_get(self, hash_value: str, model_key: str):
+        if not self.persistent:
+            return None
+        try:
+            return db.fetch_cached_prediction(hash_value, model_key, dsn=self.dsn)
+        except psycopg.Error:
+            logger.warning("NER cache lookup failed; continuing without the DB tier", exc_info=True)
+            return None
+
+    def _db_put(self, hash_value: str, model_key: str, spans: list) -> None:
+        if not self.persistent:
+            return
+        try:
+            db.save_cached_prediction(hash_value, model_key, spans, dsn=self.dsn)
+        except psycopg.Error:
+            logger.warning("NER cache write failed; continuing without the DB tier", exc_info=True)
+
+
+def cache_from_env() -> PredictionCache:
+    return PredictionCache(
+        maxsize=int(os.environ.get("NER_CACHE_SIZE", "4096")),
+        persistent=os.environ.get("NER_CACHE_DB", "1") != "0",
+        dsn=os.environ.get("PG_DSN") or None,
+    )
@@ -0,0 +1,97 @@
+import importlib.util
+import logging
+import os
+import sys
+import threading
+from functools import partial
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[3]  # api -> app -> web -> <repo root>
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+
+from search_index import DEFAULT_INDEX_DIR, VerseIndex  # noqa: E402
+from base import Vectorizer  # noqa: E402
+
+ROOT_SETTINGS_MODULE = "sutta_nlp_root_settings"
+
+
+def _load_root_settings() -> dict:
+    """
+    The repo-root local_settings.py, under a name of its own: a plain
+    `import local_settings` can resolve to web/app/local_settings.py (DB only).
+    The indexes below get it passed in explicitly (config=).
+    """
+    module = sys.modules.get(ROOT_SETTINGS_MODULE)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(ROOT_SETTINGS_MODULE, REPO_ROOT / "local_settings.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[ROOT_SETTINGS_MODULE] = module
+    return module.settings
+
+
+settings = _load_root_settings()
+
+logger = logging.getLogger("sutta_nlp.web.api")
+
+INDEX_DIR = Path(os.environ.get("VERSE_INDEX_DIR", str(DEFAULT_INDEX_DIR)))
+MAX_K = int(os.environ.get("VERSE_SEARCH_MAX_K", "200"))
+# TF-IDF bundle with an LSA ANN index (Vectorizer.build_ann + save) for "more like this"
+SIMILAR_DIR = Path(os.environ.get("SIMILAR_BUNDLE_DIR", str(REPO_ROOT / "tfidf_run")))
+
+
+class BundleHolder:
+    """
+    Lazily opens a memory-mapped bundle and re-opens it when a rebuild has
+    swapped new files into its directory (noticed by the manifest mtime).
+    """
+
+    def __init__(self, index_dir: Path, *, loader=partial(VerseIndex.load, config=settings),
+                 manifest: str | None = None):
+        self.index_dir = Path(index_dir)
+        self.loader = loader
+        self.manifest = manifest or settings["SEARCH_BUNDLE"]["manifest"]
+        self._index = None
+        self._mtime: float | None = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        manifest = self.index_dir / self.manifest
+        mtime = manifest.stat().st_mtime   # FileNotFoundError if nothing has been built
+        index = self._index
+        if index is not None and mtime == self._mtime:
+            return index
+        with self._lock:
+            if self._index is None or mtime != self._mtime:
+                self._index = self.loader(self.index_dir)
+                self._mtime = mtime
+                logger.info("Bundle loaded from %s: %d docs", self.index_dir,
+                            len(self._index.doc_index))
+            return self._index
+
+
+INDEX = BundleHolder(INDEX_DIR)
+SIMILAR = BundleHolder(SIMILAR_DIR, loader=partial(Vectorizer.load, config=settings),
+                       manifest=settings["BUNDLE"]["manifest"])
+
+
+def search_verses(query: str, k: int = 20, *, exact: bool = False, mode: str = "auto", window: int = 0) -> dict:
+    """
+    BM25 by default; a "quoted phrase" or `a NEAR/k b` (or mode=phrase|near)
+    returns ranked matches with render_highlighted-ready spans.
+    """
+    index = INDEX.get()
+    k = max(1, min(int(k), MAX_K))
+    mode, results = index.query(query, k=k, exact=exact, mode=mode, window=max(0, int(window)))
+    return {"mode": mode, "results": results, "n_docs": index.n_docs}
+
+
+def similar_docs(*, doc_id: int | None = None, text: str | None = None, k: int = 10) -> dict:
+    """More like this: LSA nearest neighbours of a bundle doc, or of free text."""
+    v = SIMILAR.get()
+    if v._ann is None:
+        raise FileNotFoundError(f"No ANN index in {SIMILAR_DIR}")
+    k = max(1, min(int(k), MAX_K))
+    return {"results": v.more_like_this(doc_id=doc_id, text=text, k=k), "n_docs": len(v.doc_index)}
@@ -1,14 +1,24 @@
+import hmac
 import json
 import logging
 import os
 import re
+import time
 from flask import Flask, render_template, abort, request, jsonify, url_for
 from neo4j import GraphDatabase
 from neo4j.exceptions import Neo4jError
 import psycopg
 from psycopg.rows import dict_row
 from .models.models import CandidateDoc, TrainingDoc, SuttaVerse
-from .api.ner import run_ner
+from .api.ner import (
+    run_ner,
+    reload_ner_model,
+    ner_model_info,
+    ner_batcher_stats,
+    ner_cache_stats,
+    available_versions,
+)
+from .api.search import search_verses, similar_docs
 from .render import render_highlighted
 from pydantic import ValidationError
 from .db import db
@@ -894,9 +904,94 @@ def predict_page():
     logger.debug("Predict payload spans=%d meta=%s", len(payload.get("spans", [])), bool(meta))
 
     if request.is_json:
-        return jsonify({"ok": True, **payload})
+        response = jsonify({"ok": True, **payload})
+    else:
+        response = app.make_response(render_template("predict.html", initial_doc=payload))
+    response.headers["X-NER-Model-Version"] = str(ner_model_info().get("version") or "")
+    return response
+
+
+@app.get("/api/ner/model")
+def ner_model():
+    return jsonify({
+        "ok": True,
+        "model": ner_model_info(),
+        "available": available_versions(),
+        "batching": ner_batcher_stats(),
+        "cache": ner_cache_stats(),
+    })
 
-    return render_template("predict.html", initial_doc=payload)
+
+def _admin_request() -> bool:
+    # NER_ADMIN_TOKEN set: require it in X-Admin-Token. Unset: direct loopback callers only
+    # (anything that came through a proxy carries X-Forwarded-For).
+    token = os.environ.get("NER_ADMIN_TOKEN")
+    if token:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+    return request.remote_addr in ("127.0.0.1", "::1") and "X-Forwarded-For" not in request.headers
+
+
+@app.post("/api/ner/reload")
+def ner_model_reload():
+    if not _admin_request():
+        return jsonify({"ok": False, "message": "forbidden"}), 403
+    data = request.get_json(force=True, silent=True) or {}
+    spec = (data.get("model") or data.get("version") or "").strip() or None
+    try:
+        info = reload_ner_model(spec)
+    except (ValueError, FileNotFoundError, OSError) as e:
+        return jsonify({"ok": False, "message": str(e)}), 400
+    except Exception:
+        logger.exception("NER model reload failed for %s", spec)
+        return jsonify({"ok": False, "message": "Model reload failed; previous model still serving."}), 500
+    return jsonify({"ok": True, "model": info})
+
+
+@app.get("/api/search")
+def verse_search_api():
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"ok": False, "message": "q required"}), 400
+    k = request.args.get("k", default=20, type=int)
+    exact = request.args.get("exact", "0").lower() in ("1", "true", "yes")
+    mode = request.args.get("mode", "auto")
+    if mode not in ("auto", "bm25", "phrase", "near"):
+        return jsonify({"ok": False, "message": "mode must be auto, bm25, phrase or near"}), 400
+    window = request.args.get("window", default=0, type=int)
+    started = time.perf_counter()
+    try:
+        found = search_verses(query, k=k, exact=exact, mode=mode, window=window)
+    except FileNotFoundError:
+        logger.warning("Verse search index missing; build it with search_index.py build")
+        return jsonify({"ok": False, "message": "Search index not built."}), 503
+    return jsonify({
+        "ok": True,
+        "query": query,
+        "took_ms": round(1000.0 * (time.perf_counter() - started), 2),
+        **found,
+    })
+
+
+@app.get("/api/similar")
+def similar_docs_api():
+    doc_id = request.args.get("doc_id", type=int)
+    text = (request.args.get("q") or "").strip() or None
+    if (doc_id is None) == (text is None):
+        return jsonify({"ok": False, "message": "pass exactly one of doc_id or q"}), 400
+    k = request.args.get("k", default=10, type=int)
+    started = time.perf_counter()
+    try:
+        found = similar_docs(doc_id=doc_id, text=text, k=k)
+    except KeyError as e:
+        return jsonify({"ok": False, "message": str(e)}), 404
+    except FileNotFoundError:
+        logger.warning("Similarity bundle missing; build one with Vectorizer.build_ann() + save()")
+        return jsonify({"ok": False, "message": "Similarity index not built."}), 503
+    return jsonify({
+        "ok": True,
+        "took_ms": round(1000.0 * (time.perf_counter() - started), 2),
+        **found,
+    })
 
 
 @app.post("/api/training")
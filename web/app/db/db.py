@@ -341,6 +341,60 @@ def save_training_record(record: Dict[str, Any], *, dsn: str | None = None):
             raise
 
 
+NER_CACHE_FETCH_SQL = """
+    SELECT spans
+    FROM ner_prediction_cache
+    WHERE text_hash = %(text_hash)s
+      AND model_key = %(model_key)s
+"""
+
+NER_CACHE_SAVE_SQL = """
+    INSERT INTO ner_prediction_cache (text_hash, model_key, spans)
+    VALUES (%(text_hash)s, %(model_key)s, %(spans)s)
+    ON CONFLICT (text_hash, model_key) DO NOTHING
+"""
+
+NER_CACHE_FETCH_MANY_SQL = """
+    SELECT text_hash, spans
+    FROM ner_prediction_cache
+    WHERE text_hash = ANY(%(text_hashes)s)
+      AND model_key = %(model_key)s
+"""
+
+
+def fetch_cached_prediction(text_hash: str, model_key: str, *, dsn: str | None = None):
+    row = fetch_one(
+        NER_CACHE_FETCH_SQL,
+        {"text_hash": text_hash, "model_key": model_key},
+        dsn=dsn,
+    )
+    return row["spans"] if row else None
+
+
+def save_cached_prediction(text_hash: str, model_key: str, spans: list, *, dsn: str | None = None):
+    return execute(
+        NER_CACHE_SAVE_SQL,
+        {"text_hash": text_hash, "model_key": model_key, "spans": Json(spans)},
+        dsn=dsn,
+    )
+
+
+def fetch_cached_predictions(conn, text_hashes: Sequence[str], model_key: str) -> dict[str, list]:
+    """One round trip on an open connection: {text_hash: spans} for the hashes that are cached."""
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(NER_CACHE_FETCH_MANY_SQL, {"text_hashes": list(text_hashes), "model_key": model_key})
+        return {row["text_hash"]: row["spans"] for row in cur.fetchall()}
+
+
+def save_cached_predictions(conn, model_key: str, items: Iterable[tuple[str, list]]) -> None:
+    """executemany of (text_hash, spans) pairs on an open connection; the caller commits."""
+    with conn.cursor() as cur:
+        cur.executemany(
+            NER_CACHE_SAVE_SQL,
+            [{"text_hash": h, "model_key": model_key, "spans": Json(spans)} for h, spans in items],
+        )
+
+
 FACET_SQL = """
     SELECT
         v.identifier,
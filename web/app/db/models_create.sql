@@ -50,4 +50,15 @@ CREATE INDEX IF NOT EXISTS idx_gold_text_hash       ON gold_training(text_hash);
 CREATE INDEX IF NOT EXISTS idx_gold_spans_gin ON gold_training USING GIN (spans);
 
 
-
+-- NER output cache: md5 of the NFC text + "<meta version>+<model fingerprint>"
+-- (ner_cache.model_key). A new or retrained model simply misses; rows for old
+-- models can be pruned with
+-- DELETE FROM ner_prediction_cache WHERE model_key <> '<current>';
+-- Tables created with the old model_version column: sql/ner_prediction_cache_model_key.sql
+CREATE TABLE IF NOT EXISTS ner_prediction_cache (
+  text_hash      text NOT NULL,
+  model_key      text NOT NULL,
+  spans          jsonb NOT NULL,
+  created_at     timestamptz DEFAULT now(),
+  PRIMARY KEY (text_hash, model_key)
+);
@@ -7,6 +7,8 @@ PALETTE = {
     "NORP":   "#fde68a",  # yellow
     "EVENT":  "#fca5a5",  # red-ish
     "UNIT":   "#e9d5ff",  # lavender
+    "PHRASE": "#fef08a",  # search hits (search_index.py phrase / NEAR)
+    "NEAR":   "#fed7aa",
 }
 
 def _as_span_dict(s):
@@ -27,7 +29,9 @@ def render_highlighted(text: str, spans: list[dict]) -> str:
     out = []
     i = 0
     for sp in s:
-        a, b, lab = sp["start"], sp["end"], sp["label"]
+        a, b, lab = max(sp["start"], i), sp["end"], sp["label"]
+        if b <= a:   # overlaps the previous span entirely: its text is already out
+            continue
         if a > i:
             out.append(html.escape(text[i:a]))
         piece = html.escape(text[a:b])
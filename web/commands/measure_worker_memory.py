@@ -0,0 +1,117 @@
+"""
+Memory per gunicorn worker, split into shared and private pages.
+
+Reads /proc/<pid>/smaps_rollup (Linux) for the master and each of its
+workers. The number that matters for "how many workers fit on this box" is
+Private (USS): what one more worker costs. Pss splits shared pages evenly
+between the processes that map them, so summing Pss gives the real total.
+
+    gunicorn -c web/gunicorn.conf.py web.wsgi:app                 # preload (default)
+    python web/commands/measure_worker_memory.py --pidfile /tmp/web.pid --warm 200
+
+    NER_PRELOAD=0 gunicorn -c web/gunicorn.conf.py web.wsgi:app   # compare
+    python web/commands/measure_worker_memory.py --pid <master pid> --warm 200
+
+--warm POSTs that many texts to /predict first, so pages touched while
+serving (copy-on-write faults) are counted too.
+"""
+import argparse
+import json
+import sys
+import urllib.request
+from pathlib import Path
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+WARM_TEXTS = [
+    "Then Venerable Sāriputta went to Sāvatthī and stayed at Jeta's Grove.",
+    "King Pasenadi of Kosala approached the Blessed One and bowed down.",
+    "At one time the Buddha was staying near Rājagaha, on the Vulture's Peak.",
+    "Then the brahmin Jāṇussoṇi went up to the Buddha and exchanged greetings with him.",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Shared vs private memory for a gunicorn master and its workers.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--pid", type=int, help="gunicorn master pid")
+    target.add_argument("--pidfile", help="gunicorn pidfile (WEB_PIDFILE)")
+    parser.add_argument("--warm", type=int, default=0, help="POST this many texts to --url before measuring")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/predict")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object instead of a table")
+    return parser.parse_args()
+
+
+def read_rollup(pid: int) -> dict:
+    """smaps_rollup fields in kB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in FIELDS:
+                values[key] = int(rest.split()[0])
+    values["Shared"] = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    values["Private"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values
+
+
+def child_pids(pid: int) -> list[int]:
+    children = []
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        text = (task / "children").read_text().split()
+        children.extend(int(c) for c in text)
+    return sorted(children)
+
+
+def warm(url: str, n: int) -> None:
+    for i in range(n):
+        body = json.dumps({"text": WARM_TEXTS[i % len(WARM_TEXTS)] + f" ({i})"}).encode("utf-8")
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+
+
+def measure(master: int) -> dict:
+    workers = child_pids(master)
+    rows = [{"pid": master, "role": "master", **read_rollup(master)}]
+    rows += [{"pid": pid, "role": "worker", **read_rollup(pid)} for pid in workers]
+    worker_rows = [row for row in rows if row["role"] == "worker"]
+    n = max(len(worker_rows), 1)
+    return {
+        "master": master,
+        "workers": len(worker_rows),
+        "processes": rows,
+        "total_pss_kb": sum(row["Pss"] for row in rows),
+        "mean_worker_private_kb": round(sum(row["Private"] for row in worker_rows) / n),
+        "mean_worker_shared_kb": round(sum(row["Shared"] for row in worker_rows) / n),
+    }
+
+
+def print_report(report: dict) -> None:
+    mb = lambda kb: f"{kb / 1024:>9.1f}"
+    print(f"{'pid':>8} {'role':<7}" + "".join(f"{name + ' MB':>12}" for name in ("Rss", "Pss", "Shared", "Private")))
+    for row in report["processes"]:
+        print(f"{row['pid']:>8} {row['role']:<7}" + "".join(f"   {mb(row[name])}" for name in ("Rss", "Pss", "Shared", "Private")))
+    print(f"\n{report['workers']} workers, total Pss {report['total_pss_kb'] / 1024:.1f} MB")
+    print(f"per worker: {report['mean_worker_private_kb'] / 1024:.1f} MB private (cost of one more worker), "
+          f"{report['mean_worker_shared_kb'] / 1024:.1f} MB shared")
+
+
+def main():
+    args = parse_args()
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("Needs Linux /proc/<pid>/smaps_rollup (kernel 4.14+).")
+    master = args.pid or int(Path(args.pidfile).read_text().strip())
+    if args.warm:
+        warm(args.url, args.warm)
+    report = measure(master)
+    if not report["workers"]:
+        sys.exit(f"pid {master} has no child processes; is it the gunicorn master?")
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+gunicorn settings for the web app.
+
+    gunicorn -c web/gunicorn.conf.py web.wsgi:app
+
+preload_app is on by default: the app is imported once in the master,
+on_starting loads and warms en_sutta_ner there (entity-ruler patterns
+included), and every worker is forked from it. Workers then share the model's
+read-only pages copy-on-write instead of each holding a private copy. Measure
+the effect with web/commands/measure_worker_memory.py.
+
+NER_PRELOAD=0 goes back to one model load per worker, in post_fork. Use that
+with --reload, because a preloaded master never re-imports the app. The same applies to a new
+model: with preload, HUP re-forks from the old master image, so roll a new model
+with USR2 + QUIT (or a restart) rather than HUP.
+
+POST /api/ner/reload swaps the model in the worker that took the request and
+writes the spec to NER_MODEL_FILE (default ne-data/work/ner_serving_model, kept
+out of dist/ so a new release doesn't wipe it); the other workers see the file
+change within NER_MODEL_CHECK_SECONDS and load it themselves. Each worker then
+holds a private copy of the new model until the next restart, which preloads
+it in the master again.
+
+The warmup lives here, not in the app module: importing web.app.app (tests,
+flask shell, scripts) never loads the model. NER_WARMUP=0 skips it, and the
+model then loads on the first request.
+"""
+import gc
+import os
+
+bind = os.environ.get("WEB_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("WEB_WORKERS", "4"))
+# request threads are what give the NER micro-batcher something to batch
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))
+timeout = int(os.environ.get("WEB_TIMEOUT", "60"))
+pidfile = os.environ.get("WEB_PIDFILE") or None
+preload_app = os.environ.get("NER_PRELOAD", "1") != "0"
+
+if preload_app:
+    # No cyclic GC in the master while the model loads, so freed objects don't
+    # leave holes in pages that get shared. pre_fork freezes what survived.
+    gc.disable()
+
+
+def _warmup_ner(log):
+    if os.environ.get("NER_WARMUP", "1") == "0":
+        return
+    from web.app.api.ner import warmup_ner_model
+
+    try:
+        warmup_ner_model()
+    except Exception:
+        log.exception("NER warmup failed; model will load on first request")
+
+
+def on_starting(server):
+    if preload_app:
+        # once, in the master, before any worker is forked
+        _warmup_ner(server.log)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from web.app.api.ner import ner_model_info
+
+    info = ner_model_info()
+    if info.get("loaded"):
+        server.log.info("NER model %s %s preloaded in master (pid %s)",
+                        info.get("name"), info.get("version"), info.get("pid"))
+    else:
+        server.log.warning("preload_app is on but the NER model is not loaded "
+                           "(NER_WARMUP=0?); each worker will load its own copy")
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Move everything allocated so far into the permanent generation. A
+        # worker's collections then never write gc bookkeeping into the shared
+        # model objects, and those pages stay shared.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+    else:
+        _warmup_ner(worker.log)
+    # nothing else to reset: the NER micro-batcher starts its own thread on
+    # first use in each worker, and DB/neo4j connections are opened per request
@@ -0,0 +1,6 @@
+"""
+gunicorn entrypoint:
+
+    gunicorn -c web/gunicorn.conf.py web.wsgi:app
+"""
+from web.app.app import app  # noqa: F401